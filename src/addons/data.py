@@ -1,14 +1,117 @@
 # -*- coding: utf-8 -*-
 """
 Module pour le chargement des données.
+
+Une base de données caractéristiques est stockée en deux fichiers :
+
+* `{method}_db.parquet` : table des labels (`color`, `style`) ;
+* `{method}_db.npy` : bloc contigu des vecteurs caractéristiques, chargé en projection mémoire. Les vecteurs sont
+  stockés en `float32`, ou en `uint8` pour les descripteurs binaires compactés.
+
+Les anciennes bases, dont les vecteurs sont stockés dans une colonne `feature` du fichier parquet, restent lisibles.
+
+Pendant sa construction, une base est écrite par segments dans le répertoire `{method}_db.parts`, puis assemblée.
+
+Une base en service évolue par segments ajoutés dans le répertoire `{method}_db.segments`, qui contient aussi la liste
+des identifiants supprimés (`tombstones.npy`). Les identifiants des images sont alors stockés dans une colonne `id`.
 """
-from typing import Mapping
+import json
+import os
+import shutil
+from os.path import exists, join, splitext
+from typing import List, Mapping, Optional, Sequence, Tuple
 
+import numpy as np
 import polars as pl
-from numpy import asarray, ndarray
+from numpy import ndarray
+
+
+def features_path(data_path: str) -> str:
+    """
+    Chemin du bloc des vecteurs caractéristiques associé à une base de données.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels.
+
+    Returns
+    -------
+    str
+        Chemin du fichier `.npy` des vecteurs caractéristiques.
+    """
+    return f"{splitext(data_path)[0]}.npy"
+
+
+def _stored(features: ndarray) -> ndarray:
+    """
+    Conversion des vecteurs caractéristiques dans leur format de stockage.
+
+    Parameters
+    ----------
+    features : ndarray
+        Matrice des vecteurs caractéristiques.
+
+    Returns
+    -------
+    ndarray
+        Matrice contiguë de `float32`, ou de `uint8` pour les descripteurs binaires.
+    """
+    return np.ascontiguousarray(features, dtype=np.uint8 if features.dtype == np.uint8 else np.float32)
+
+
+def _save_array(path: str, array: ndarray):
+    """
+    Enregistrement atomique d'un tableau : une projection en mémoire de l'ancien fichier reste valide.
+
+    Parameters
+    ----------
+    path : str
+        Chemin du fichier `.npy`.
+    array : ndarray
+        Tableau à enregistrer.
+    """
+    with open(f"{path}.tmp", "wb") as file:
+        np.save(file, array)
+    os.replace(f"{path}.tmp", path)
 
 
-def load_database(data_path: str) -> Mapping[str, ndarray]:
+def save_database(
+    data_path: str,
+    features: ndarray,
+    colors: Sequence[str],
+    styles: Sequence[str],
+    ids: Optional[Sequence[int]] = None,
+):
+    """
+    Enregistrement d'une base de données caractéristiques.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels.
+    features : ndarray
+        Matrice des vecteurs caractéristiques. Les descripteurs binaires en `uint8` sont conservés tels quels.
+    colors : Sequence[str]
+        Couleurs des images.
+    styles : Sequence[str]
+        Styles des images.
+    ids : Sequence[int], default: None
+        Identifiants des images. Par défaut, les indices des lignes.
+    """
+    features = _stored(features)
+    if features.shape[0] != len(colors) or features.shape[0] != len(styles):
+        raise ValueError("Les vecteurs caractéristiques et les labels n'ont pas la même taille.")
+
+    _save_array(features_path(data_path), features)
+    labels = {"color": list(colors), "style": list(styles)}
+    if ids is not None:
+        labels["id"] = np.asarray(ids, dtype=np.int64)
+    pl.DataFrame(labels).write_parquet(f"{data_path}.tmp")
+    os.replace(f"{data_path}.tmp", data_path)
+
+
+def load_database(data_path: str, mmap: bool = True) -> Mapping[str, ndarray]:
     """
     Changement des données caractéristiques des images.
 
@@ -16,15 +119,262 @@ def load_database(data_path: str) -> Mapping[str, ndarray]:
     ----------
     data_path : str
         Chemin des données à charger.
+    mmap : bool, default: True
+        Projection en mémoire des vecteurs caractéristiques plutôt que lecture complète. Les pages sont alors
+        partagées entre les processus qui chargent la même base.
 
     Returns
     -------
     Mapping[str, ndarray]
         Dictionnaires des données et des labels.
     """
-    data = pl.read_parquet(data_path)
-    return {
-        "features": asarray(data.select(pl.col("feature")).to_series().to_list()),
-        "colors": asarray(data.select(pl.col("color")).to_series().to_list()),
-        "styles": asarray(data.select(pl.col("style")).to_series().to_list()),
+    columns = [column for column in ("color", "style", "id") if column in pl.read_parquet_schema(data_path)]
+    data = pl.read_parquet(data_path, columns=columns)
+    if exists(features_path(data_path)):
+        features = np.load(features_path(data_path), mmap_mode="r" if mmap else None)
+    else:
+        # ##: Legacy database, features stored as a list column.
+        column = pl.read_parquet(data_path, columns=["feature"]).get_column("feature")
+        width = column.list.len().max() or 0
+        features = column.cast(pl.Array(pl.Float32, width)).to_numpy()
+
+    database = {
+        "features": features,
+        "colors": data.get_column("color").to_numpy().astype(str),
+        "styles": data.get_column("style").to_numpy().astype(str),
     }
+    if "id" in data.columns:
+        database["ids"] = data.get_column("id").to_numpy().astype(np.int64)
+    return database
+
+
+def segments_path(data_path: str) -> str:
+    """
+    Répertoire des segments ajoutés à une base de données en service.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels.
+
+    Returns
+    -------
+    str
+        Chemin du répertoire `{method}_db.segments`.
+    """
+    return f"{splitext(data_path)[0]}.segments"
+
+
+def save_segment(data_path: str, features: ndarray, colors: Sequence[str], styles: Sequence[str], ids: ndarray):
+    """
+    Enregistrement d'un segment ajouté à une base de données, nommé d'après son premier identifiant.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels de la base.
+    features : ndarray
+        Matrice des vecteurs caractéristiques du segment.
+    colors : Sequence[str]
+        Couleurs des images.
+    styles : Sequence[str]
+        Styles des images.
+    ids : ndarray
+        Identifiants croissants des images.
+    """
+    os.makedirs(segments_path(data_path), exist_ok=True)
+    save_database(join(segments_path(data_path), f"{ids[0]:012d}.parquet"), features, colors, styles, ids)
+
+
+def save_tombstones(data_path: str, removed: ndarray):
+    """
+    Enregistrement des identifiants supprimés d'une base de données.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels de la base.
+    removed : ndarray
+        Identifiants supprimés.
+    """
+    os.makedirs(segments_path(data_path), exist_ok=True)
+    _save_array(join(segments_path(data_path), "tombstones.npy"), np.asarray(removed, dtype=np.int64))
+
+
+def load_segments(data_path: str) -> Tuple[List[Mapping[str, ndarray]], ndarray]:
+    """
+    Chargement des segments et des identifiants supprimés d'une base de données.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels de la base.
+
+    Returns
+    -------
+    Tuple[List[Mapping[str, ndarray]], ndarray]
+        Segments, dans l'ordre de leurs identifiants, et identifiants supprimés.
+    """
+    directory = segments_path(data_path)
+    if not exists(directory):
+        return [], np.empty(0, dtype=np.int64)
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+    segments = [load_database(join(directory, name)) for name in names]
+    tombstones = join(directory, "tombstones.npy")
+    removed = np.load(tombstones) if exists(tombstones) else np.empty(0, dtype=np.int64)
+    return segments, removed
+
+
+def remove_segments(data_path: str, ids: Sequence[int]):
+    """
+    Suppression des segments d'une base de données, une fois fusionnés.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la table des labels de la base.
+    ids : Sequence[int]
+        Premiers identifiants des segments à supprimer.
+    """
+    for first in ids:
+        segment = join(segments_path(data_path), f"{first:012d}.parquet")
+        for path in (segment, features_path(segment)):
+            if exists(path):
+                os.remove(path)
+
+
+class DatabaseWriter:
+    """
+    Écriture incrémentale et reprenable d'une base de données caractéristiques.
+
+    Les images sont traitées par blocs de taille fixe. Chaque bloc est écrit dans un segment dès qu'il est terminé ;
+    un segment dont la table des labels existe est considéré comme fini, ce qui permet de reprendre une construction
+    interrompue. La base finale est assemblée segment par segment, sans charger l'ensemble des vecteurs en mémoire.
+
+    Attributes
+    ----------
+    data_path : str
+        Chemin de la table des labels de la base finale.
+    chunk_size : int
+        Nombre d'images par bloc.
+    total : int
+        Nombre total d'images.
+
+    Methods
+    -------
+    pending()
+        Liste des blocs restant à traiter.
+    write(chunk: int, features: ndarray, colors: Sequence[str], styles: Sequence[str])
+        Écriture d'un bloc terminé.
+    finalize()
+        Assemblage des segments en une base de données.
+    """
+
+    def __init__(self, data_path: str, chunk_size: int, total: int):
+        self.data_path, self.chunk_size, self.total = data_path, chunk_size, total
+        self.directory = f"{splitext(data_path)[0]}.parts"
+        os.makedirs(self.directory, exist_ok=True)
+
+        # ##: A restarted build must split the images the same way.
+        manifest_path, manifest = join(self.directory, "manifest.json"), {"chunk_size": chunk_size, "total": total}
+        if exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as file:
+                if json.load(file) != manifest:
+                    raise ValueError(f"Une construction incompatible existe déjà dans {self.directory}.")
+        else:
+            with open(manifest_path, "w", encoding="utf-8") as file:
+                json.dump(manifest, file)
+
+    @property
+    def chunks(self) -> int:
+        """
+        Nombre de blocs.
+
+        Returns
+        -------
+        int
+            Nombre de blocs nécessaires pour traiter toutes les images.
+        """
+        return -(-self.total // self.chunk_size)
+
+    def _segment(self, chunk: int) -> str:
+        """
+        Chemin, sans extension, du segment d'un bloc.
+
+        Parameters
+        ----------
+        chunk : int
+            Indice du bloc.
+
+        Returns
+        -------
+        str
+            Chemin du segment.
+        """
+        return join(self.directory, f"part-{chunk:05d}")
+
+    def pending(self) -> List[int]:
+        """
+        Liste des blocs restant à traiter.
+
+        Returns
+        -------
+        List[int]
+            Indices des blocs dont le segment n'est pas terminé.
+        """
+        return [chunk for chunk in range(self.chunks) if not exists(f"{self._segment(chunk)}.parquet")]
+
+    def write(self, chunk: int, features: ndarray, colors: Sequence[str], styles: Sequence[str]):
+        """
+        Écriture d'un bloc terminé. La table des labels est écrite en dernier et marque la fin du segment.
+
+        Parameters
+        ----------
+        chunk : int
+            Indice du bloc.
+        features : ndarray
+            Matrice des vecteurs caractéristiques du bloc.
+        colors : Sequence[str]
+            Couleurs des images du bloc.
+        styles : Sequence[str]
+            Styles des images du bloc.
+        """
+        segment = self._segment(chunk)
+        with open(f"{segment}.npy.tmp", "wb") as file:
+            np.save(file, _stored(features))
+        os.replace(f"{segment}.npy.tmp", f"{segment}.npy")
+
+        labels = pl.DataFrame(
+            {"color": list(colors), "style": list(styles)}, schema={"color": pl.String, "style": pl.String}
+        )
+        labels.write_parquet(f"{segment}.parquet.tmp")
+        os.replace(f"{segment}.parquet.tmp", f"{segment}.parquet")
+
+    def finalize(self):
+        """
+        Assemblage des segments en une base de données, puis suppression des segments.
+        """
+        if self.pending():
+            raise RuntimeError("Tous les blocs n'ont pas été traités.")
+
+        segments = [self._segment(chunk) for chunk in range(self.chunks)]
+        parts = [np.load(f"{segment}.npy", mmap_mode="r") for segment in segments]
+        filled = [part for part in parts if part.shape[0]]
+        if not filled:
+            raise ValueError("Aucun vecteur caractéristique n'a été extrait.")
+
+        # ##: Stream every segment into the final block.
+        shape = (sum(part.shape[0] for part in filled), filled[0].shape[1])
+        features = np.lib.format.open_memmap(f"{features_path(self.data_path)}.tmp", "w+", filled[0].dtype, shape)
+        start = 0
+        for part in filled:
+            features[start : start + part.shape[0]] = part
+            start += part.shape[0]
+        features.flush()
+        del features, parts, filled
+        os.replace(f"{features_path(self.data_path)}.tmp", features_path(self.data_path))
+
+        labels = pl.concat([pl.read_parquet(f"{segment}.parquet") for segment in segments])
+        labels.write_parquet(f"{self.data_path}.tmp")
+        os.replace(f"{self.data_path}.tmp", self.data_path)
+        shutil.rmtree(self.directory)
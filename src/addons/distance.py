@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Fonctions de calcul des distances et de sélection des plus proches voisins.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+# ##: Number of set bits per word; lookup table on bytes for NumPy < 2.0.
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+    def popcount(words: ndarray) -> ndarray:
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(*words.shape, -1).sum(axis=-1)
+
+
+largests = {"cosine": True, "euclidean": False, "manhattan": False, "hamming": False}
+
+
+def as_matrix(features: ndarray) -> ndarray:
+    """
+    Conversion des données caractéristiques en matrice contiguë de `float32`.
+
+    Parameters
+    ----------
+    features : ndarray
+        Données caractéristiques.
+
+    Returns
+    -------
+    ndarray
+        Matrice contiguë de `float32`, sans copie si les données sont déjà dans ce format.
+    """
+    return np.ascontiguousarray(np.atleast_2d(features), dtype=np.float32)
+
+
+def as_packed(features: ndarray) -> ndarray:
+    """
+    Conversion de descripteurs binaires compactés en matrice contiguë de mots de 64 bits.
+
+    Parameters
+    ----------
+    features : ndarray
+        Descripteurs binaires compactés en octets `uint8`.
+
+    Returns
+    -------
+    ndarray
+        Matrice contiguë de `uint64`, complétée par des zéros si la largeur n'est pas un multiple de 8 octets.
+    """
+    features = np.ascontiguousarray(np.atleast_2d(features), dtype=np.uint8)
+    padding = -features.shape[1] % 8
+    if padding:
+        features = np.pad(features, ((0, 0), (0, padding)))
+    return features.view(np.uint64)
+
+
+def squared_norms(features: ndarray) -> ndarray:
+    """
+    Calcul du carré de la norme de chaque ligne.
+
+    Parameters
+    ----------
+    features : ndarray
+        Matrice des données caractéristiques.
+
+    Returns
+    -------
+    ndarray
+        Carré des normes, de taille `(n,)`.
+    """
+    return np.einsum("ij,ij->i", features, features)
+
+
+def normalize(features: ndarray) -> ndarray:
+    """
+    Normalisation L2 de chaque ligne. Les lignes nulles restent nulles.
+
+    Parameters
+    ----------
+    features : ndarray
+        Matrice des données caractéristiques.
+
+    Returns
+    -------
+    ndarray
+        Matrice des lignes normalisées.
+    """
+    norms = np.sqrt(squared_norms(features))
+    norms[norms == 0] = 1
+    return np.ascontiguousarray(features / norms[:, None], dtype=np.float32)
+
+
+def euclidean(queries: ndarray, features: ndarray, features_norms: ndarray) -> ndarray:
+    """
+    Distance euclidienne calculée avec un unique produit matriciel.
+
+    Parameters
+    ----------
+    queries : ndarray
+        Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+    features : ndarray
+        Matrice de la base, de taille `(n_base, dimension)`.
+    features_norms : ndarray
+        Carré des normes de la base, de taille `(n_base,)`.
+
+    Returns
+    -------
+    ndarray
+        Distances, de taille `(n_requêtes, n_base)`.
+    """
+    distances = queries @ features.T
+    distances *= -2
+    distances += squared_norms(queries)[:, None]
+    distances += features_norms[None, :]
+    np.maximum(distances, 0, out=distances)
+    return np.sqrt(distances, out=distances)
+
+
+def cosine(queries: ndarray, normalized: ndarray) -> ndarray:
+    """
+    Similarité cosinus calculée avec un unique produit matriciel.
+
+    Parameters
+    ----------
+    queries : ndarray
+        Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+    normalized : ndarray
+        Matrice de la base normalisée, de taille `(n_base, dimension)`.
+
+    Returns
+    -------
+    ndarray
+        Similarités, de taille `(n_requêtes, n_base)`.
+    """
+    return normalize(queries) @ normalized.T
+
+
+def manhattan(queries: ndarray, features: ndarray) -> ndarray:
+    """
+    Distance de Manhattan.
+
+    Parameters
+    ----------
+    queries : ndarray
+        Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+    features : ndarray
+        Matrice de la base, de taille `(n_base, dimension)`.
+
+    Returns
+    -------
+    ndarray
+        Distances, de taille `(n_requêtes, n_base)`.
+    """
+    # ##: Imported on first use, scikit-learn is slow to import.
+    # pylint: disable-next=import-outside-toplevel
+    from sklearn.metrics.pairwise import manhattan_distances
+
+    return manhattan_distances(queries, features).astype(np.float32, copy=False)
+
+
+def hamming(queries: ndarray, features: ndarray, chunk_size: int = 65536) -> ndarray:
+    """
+    Distance de Hamming entre descripteurs binaires, par OU exclusif et comptage des bits.
+
+    Parameters
+    ----------
+    queries : ndarray
+        Matrice des requêtes compactées, de taille `(n_requêtes, mots)` en `uint64`.
+    features : ndarray
+        Matrice de la base compactée, de taille `(n_base, mots)` en `uint64`.
+    chunk_size : int, default: 65536
+        Nombre de lignes de la base traitées à la fois.
+
+    Returns
+    -------
+    ndarray
+        Nombre de bits différents, de taille `(n_requêtes, n_base)`.
+    """
+    distances = np.empty((queries.shape[0], features.shape[0]), dtype=np.float32)
+    for start in range(0, features.shape[0], chunk_size):
+        chunk = features[start : start + chunk_size]
+        for row, query in enumerate(queries):
+            distances[row, start : start + chunk.shape[0]] = popcount(np.bitwise_xor(chunk, query)).sum(axis=1)
+    return distances
+
+
+def pairwise(queries: ndarray, features: ndarray, metric: str, features_norms: Optional[ndarray] = None) -> ndarray:
+    """
+    Calcul des scores entre les requêtes et un ensemble quelconque de vecteurs.
+
+    Parameters
+    ----------
+    queries : ndarray
+        Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+    features : ndarray
+        Matrice des vecteurs, de taille `(n, dimension)`.
+    metric : str
+        Nom de la métrique : `cosine`, `euclidean`, `manhattan` ou `hamming`.
+    features_norms : ndarray, default: None
+        Carré des normes des vecteurs, calculé si absent.
+
+    Returns
+    -------
+    ndarray
+        Scores, de taille `(n_requêtes, n)`. Pour `cosine`, il s'agit de similarités.
+    """
+    if metric == "manhattan":
+        return manhattan(queries, features)
+    if metric == "hamming":
+        return hamming(as_packed(queries), as_packed(features))
+
+    features_norms = squared_norms(features) if features_norms is None else features_norms
+    if metric == "euclidean":
+        return euclidean(queries, features, features_norms)
+    if metric == "cosine":
+        norms = np.sqrt(features_norms)
+        norms[norms == 0] = 1
+        return (normalize(queries) @ features.T) / norms[None, :]
+    raise ValueError(f"Métrique inconnue : {metric}.")
+
+
+def top_k(scores: ndarray, depth: int, largest: bool = False) -> ndarray:
+    """
+    Sélection des indices des `depth` meilleurs scores de chaque ligne, dans l'ordre.
+
+    Seuls les `depth` candidats retenus par `argpartition` sont triés.
+
+    Parameters
+    ----------
+    scores : ndarray
+        Matrice des scores, de taille `(n_requêtes, n_base)`.
+    depth : int
+        Nombre d'indices à retourner par ligne.
+    largest : bool, default: False
+        Sélectionne les scores les plus grands (similarités) plutôt que les plus petits (distances).
+
+    Returns
+    -------
+    ndarray
+        Indices, de taille `(n_requêtes, min(depth, n_base))`.
+    """
+    scores = np.atleast_2d(scores)
+    depth = min(depth, scores.shape[1])
+    if depth <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    keys = -scores if largest else scores
+    if depth < scores.shape[1]:
+        candidates = np.argpartition(keys, depth - 1, axis=1)[:, :depth]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(np.take_along_axis(keys, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def select(scores: ndarray, ids: ndarray, depth: int, largest: bool = False) -> Tuple[ndarray, ndarray]:
+    """
+    Sélection des `depth` meilleurs candidats d'une requête, complétés si besoin.
+
+    Parameters
+    ----------
+    scores : ndarray
+        Scores des candidats, de taille `(n_candidats,)`.
+    ids : ndarray
+        Identifiants des candidats dans la base, de taille `(n_candidats,)`.
+    depth : int
+        Nombre de résultats à retourner.
+    largest : bool, default: False
+        Sélectionne les scores les plus grands plutôt que les plus petits.
+
+    Returns
+    -------
+    Tuple[ndarray, ndarray]
+        Scores et identifiants de taille `(depth,)`. Les places vides ont l'identifiant `-1` et un score infini.
+    """
+    found_scores = np.full(depth, -np.inf if largest else np.inf, dtype=np.float32)
+    found_ids = np.full(depth, -1, dtype=np.int64)
+    if ids.size:
+        nearest = top_k(scores.reshape(1, -1), depth=depth, largest=largest)[0]
+        found_scores[: nearest.size] = scores[nearest]
+        found_ids[: nearest.size] = ids[nearest]
+    return found_scores, found_ids
+
+
+def merge(
+    scores: Sequence[ndarray], ids: Sequence[ndarray], depth: int, largest: bool = False
+) -> Tuple[ndarray, ndarray]:
+    """
+    Fusion des meilleurs résultats de plusieurs parties de la base.
+
+    Parameters
+    ----------
+    scores : Sequence[ndarray]
+        Scores de chaque partie, de taille `(n_requêtes, k_partie)`.
+    ids : Sequence[ndarray]
+        Identifiants globaux de chaque partie, de même taille. Les places vides ont l'identifiant `-1`.
+    depth : int
+        Nombre de résultats à retourner par requête.
+    largest : bool, default: False
+        Sélectionne les scores les plus grands plutôt que les plus petits.
+
+    Returns
+    -------
+    Tuple[ndarray, ndarray]
+        Scores et identifiants de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant `-1`.
+    """
+    scores, ids = np.concatenate(scores, axis=1).astype(np.float32), np.concatenate(ids, axis=1)
+    scores[ids < 0] = -np.inf if largest else np.inf
+    found_scores = np.full((ids.shape[0], depth), -np.inf if largest else np.inf, dtype=np.float32)
+    found_ids = np.full((ids.shape[0], depth), -1, dtype=np.int64)
+    nearest = top_k(scores, depth=depth, largest=largest)
+    found_scores[:, : nearest.shape[1]] = np.take_along_axis(scores, nearest, axis=1)
+    found_ids[:, : nearest.shape[1]] = np.take_along_axis(ids, nearest, axis=1)
+    return found_scores, found_ids
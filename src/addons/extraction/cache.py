@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des données caractéristiques, adressé par le contenu des images.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from os.path import exists, join
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+from numpy import ndarray
+
+# ##: Marker of a key absent from the cache, `None` being a valid result.
+_MISSING = object()
+
+
+class CachedExtractor:
+    """
+    Cache placé devant un extracteur de données caractéristiques.
+
+    La clé d'une image est l'empreinte SHA-256 de son contenu et de l'identité de l'extracteur : sa classe et ses
+    paramètres (résolution, taille des vecteurs, ...). Une même image déposée sous un autre nom est donc retrouvée,
+    alors qu'un changement de configuration invalide le cache. Les résultats sont conservés dans un cache mémoire
+    LRU de taille bornée, et, si un répertoire est fourni, sur disque.
+
+    Attributes
+    ----------
+    extractor : Any
+        Extracteur dont les résultats sont mis en cache.
+    directory : str, default: None
+        Répertoire du cache sur disque. Par défaut, le cache est uniquement en mémoire.
+    capacity : int, default: 4096
+        Nombre maximal de vecteurs conservés en mémoire.
+
+    Methods
+    -------
+    preprocess(image_path: str)
+        Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
+    extract(image_path: str)
+        Extraction des données caractéristiques d'une image, depuis le cache si possible.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images, seules les absentes du cache sont calculées.
+    """
+
+    def __init__(self, extractor: Any, directory: Optional[str] = None, capacity: int = 4096):
+        self.extractor, self.directory, self.capacity = extractor, directory, capacity
+        self.memory: OrderedDict = OrderedDict()
+        self.hits = self.disk_hits = self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        # ##: Class and scalar parameters identify the extractor.
+        parameters = {
+            name: value
+            for name, value in sorted(vars(extractor).items())
+            if isinstance(value, (bool, int, float, str)) and not name.startswith("_")
+        }
+        self.identity = f"{type(extractor).__module__}.{type(extractor).__qualname__}{parameters}"
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """
+        Statistiques d'utilisation du cache.
+
+        Returns
+        -------
+        Dict[str, float]
+            Nombre de succès en mémoire et sur disque, nombre d'échecs et taux de succès.
+        """
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+        }
+
+    def key(self, image_path: str) -> str:
+        """
+        Clé d'une image dans le cache.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        str
+            Empreinte SHA-256 de l'identité de l'extracteur et du contenu de l'image.
+        """
+        digest = hashlib.sha256(self.identity.encode("utf-8"))
+        with open(image_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        """
+        Chemin du fichier d'une clé dans le cache sur disque.
+
+        Parameters
+        ----------
+        key : str
+            Clé de l'image.
+
+        Returns
+        -------
+        str
+            Chemin du fichier `.npy`.
+        """
+        return join(self.directory, key[:2], f"{key}.npy")
+
+    def _remember(self, key: str, feature: Optional[ndarray]):
+        """
+        Ajout d'un résultat au cache mémoire, en évinçant le moins récemment utilisé si besoin.
+
+        Parameters
+        ----------
+        key : str
+            Clé de l'image.
+        feature : ndarray
+            Données caractéristiques de l'image, ou `None`.
+        """
+        self.memory[key] = feature
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Any:
+        """
+        Recherche d'une clé en mémoire, puis sur disque.
+
+        Parameters
+        ----------
+        key : str
+            Clé de l'image.
+
+        Returns
+        -------
+        Any
+            Données caractéristiques de l'image, `None` si l'extraction n'a rien donné, ou `_MISSING` si la clé est
+            absente du cache.
+        """
+        if key in self.memory:
+            self.hits += 1
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is not None and exists(self._path(key)):
+            self.disk_hits += 1
+            feature = np.load(self._path(key))
+            # ##: An empty array records an image without features.
+            feature = feature if feature.size else None
+            self._remember(key, feature)
+            return feature
+        self.misses += 1
+        return _MISSING
+
+    def _store(self, key: str, feature: Optional[ndarray]):
+        """
+        Enregistrement d'un résultat en mémoire et sur disque.
+
+        Parameters
+        ----------
+        key : str
+            Clé de l'image.
+        feature : ndarray
+            Données caractéristiques de l'image, ou `None`.
+        """
+        self._remember(key, feature)
+        if self.directory is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.tmp", "wb") as file:
+                np.save(file, np.empty(0, dtype=np.float32) if feature is None else feature)
+            os.replace(f"{path}.tmp", path)
+
+    def preprocess(self, image_path: str) -> Any:
+        """
+        Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        Any
+            L'image prête pour l'extraction des données caractéristiques.
+        """
+        return self.extractor.preprocess(image_path=image_path)
+
+    def extract(self, image_path: str) -> Optional[ndarray]:
+        """
+        Extraction des données caractéristiques d'une image, depuis le cache si possible.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        ndarray
+            Données caractéristiques de l'image.
+        """
+        key = self.key(image_path)
+        feature = self._lookup(key)
+        if feature is _MISSING:
+            feature = self.extractor.extract(image_path=image_path)
+            self._store(key, feature)
+        return feature
+
+    def extract_batch(self, image_paths: Iterable[str], batch_size: int = 32) -> Iterator[Optional[ndarray]]:
+        """
+        Extraction des données caractéristiques d'un ensemble d'images, seules les absentes du cache sont calculées.
+
+        Les images manquantes sont traitées par lots si l'extracteur le permet.
+
+        Parameters
+        ----------
+        image_paths : Iterable[str]
+            Chemins des images.
+        batch_size : int, default: 32
+            Nombre d'images par lot.
+
+        Yields
+        ------
+        ndarray
+            Données caractéristiques de chaque image, dans l'ordre des chemins.
+        """
+        image_paths = list(image_paths)
+        keys = [self.key(path) for path in image_paths]
+        features: Dict[str, Any] = {}
+        for key in keys:
+            if key in features:
+                self.hits += 1
+            else:
+                features[key] = self._lookup(key)
+
+        # ##: Only the misses go through the extractor, once per distinct content.
+        sources = dict(zip(keys, image_paths))
+        missing = [key for key, feature in features.items() if feature is _MISSING]
+        if hasattr(self.extractor, "extract_batch"):
+            found = self.extractor.extract_batch([sources[key] for key in missing], batch_size=batch_size)
+        else:
+            found = map(lambda key: self.extractor.extract(image_path=sources[key]), missing)
+        for key, feature in zip(missing, found):
+            self._store(key, feature)
+            features[key] = feature
+        yield from (features[key] for key in keys)
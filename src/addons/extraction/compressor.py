@@ -2,11 +2,15 @@
 """
 Ensemble de classe pour l'utilisation de réseaux de neurones pre-entraînés.
 """
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import numpy as np
 import tensorflow as tf
 from numpy import ndarray
 
+from src.addons.extraction.image import read_image
+from src.addons.profiling import profiled, profiler
+
 
 class Compressor:
     """
@@ -25,6 +29,10 @@ class Compressor:
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+    extract_images(images: Sequence[ndarray], batch_size: int = 32)
+        Extraction des données caractéristiques d'images déjà décodées.
     """
 
     extractor: Any
@@ -32,6 +40,109 @@ class Compressor:
 
     def __init__(self, height: int = 224, width: int = 224):
         self.height, self.width = height, width
+        self._inference: Optional[Callable] = None
+
+    def _read(self, image_path: bytes) -> Tuple[ndarray, bool]:
+        """
+        Lecture d'une image à la plus petite résolution couvrant la taille d'entrée du réseau.
+
+        Une erreur levée dans le pipeline `tf.data` interromprait tout le lot : une image illisible est remplacée par
+        une image noire, signalée comme invalide.
+
+        Parameters
+        ----------
+        image_path : bytes
+            Chemin de l'image.
+
+        Returns
+        -------
+        Tuple[ndarray, bool]
+            L'image décodée en RVB et la validité de la lecture.
+        """
+        image = read_image(np.asarray(image_path).item().decode(), target=(self.height, self.width))
+        if image is None:
+            return np.zeros((self.height, self.width, 3), dtype=np.uint8), False
+        return image, True
+
+    def _decode(self, image_path: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+        """
+        Lecture et décodage d'une image.
+
+        Parameters
+        ----------
+        image_path : tf.Tensor
+            Chemin de l'image.
+
+        Returns
+        -------
+        Tuple[tf.Tensor, tf.Tensor]
+            L'image décodée, les images en niveaux de gris étant étendues à trois canaux et les images CMJN
+            converties en RVB, et la validité de la lecture.
+        """
+        image, valid = tf.numpy_function(self._read, [image_path], [tf.uint8, tf.bool], stateful=False)
+        image.set_shape([None, None, 3])
+        valid.set_shape([])
+        return image, valid
+
+    def _resize(self, image: tf.Tensor) -> tf.Tensor:
+        """
+        Redimensionnement et pré-traitement d'une image décodée.
+
+        Parameters
+        ----------
+        image : tf.Tensor
+            L'image décodée.
+
+        Returns
+        -------
+        tf.Tensor
+            L'image pré-traitée, de taille `(height, width, 3)`.
+        """
+        image = tf.image.resize(image, [self.height, self.width])
+        return self.preprocessor(image) if self.preprocessor is not None else image
+
+    def _load(self, image_path: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+        """
+        Chargement et pré-traitement d'une image, sans dimension de lot.
+
+        Parameters
+        ----------
+        image_path : tf.Tensor
+            Chemin de l'image.
+
+        Returns
+        -------
+        Tuple[tf.Tensor, tf.Tensor]
+            L'image pré-traitée, de taille `(height, width, 3)`, et la validité de la lecture.
+        """
+        image, valid = self._decode(image_path)
+        return self._resize(image), valid
+
+    def _infer(self, images: tf.Tensor) -> ndarray:
+        """
+        Appel du réseau de neurones à travers une fonction compilée de signature fixe.
+
+        Contrairement à `predict`, la fonction n'est tracée qu'une seule fois et n'a pas de coût fixe par appel.
+
+        Parameters
+        ----------
+        images : tf.Tensor
+            Lot d'images pré-traitées, de taille `(n, height, width, 3)`.
+
+        Returns
+        -------
+        ndarray
+            Données caractéristiques des images, de taille `(n, dimension)`.
+        """
+        if self._inference is None:
+            self._inference = tf.function(
+                lambda batch: self.extractor(batch, training=False),
+                input_signature=[tf.TensorSpec(shape=(None, self.height, self.width, 3), dtype=tf.float32)],
+            )
+        with profiler.timer("inference", self):
+            features = self._inference(tf.cast(images, tf.float32)).numpy()
+        profiler.count("images", self, value=features.shape[0])
+        return features.reshape(features.shape[0], -1)
 
     def preprocess(self, image_path: str) -> tf.Tensor:
         """
@@ -46,18 +157,21 @@ class Compressor:
         -------
         tf.Tensor
             L'image prête pour l'extraction des données caractéristiques.
-        """
-        # ##: Load image.
-        image = tf.image.decode_jpeg(tf.io.read_file(image_path))
-        if len(tf.shape(image)) < 3:
-            image = tf.expand_dims(image, axis=-1)
-
-        # ##: Preprocessing.
-        image = tf.image.resize(image, [self.height, self.width])
-        image = self.preprocessor(image) if self.preprocessor is not None else image
 
+        Raises
+        ------
+        ValueError
+            Si l'image ne peut pas être lue.
+        """
+        with profiler.timer("decode", self):
+            image, valid = self._decode(tf.constant(image_path))
+        if not valid:
+            raise ValueError(f"Impossible de lire l'image {image_path}.")
+        with profiler.timer("resize", self):
+            image = self._resize(image)
         return tf.expand_dims(image, axis=0)
 
+    @profiled("extract")
     def extract(self, image_path: str) -> ndarray:
         """
         Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
@@ -72,7 +186,72 @@ class Compressor:
         ndarray
             Données caractéristiques de l'image.
         """
-        return self.extractor.predict(self.preprocess(image_path=image_path))[0].flatten()
+        return self._infer(self.preprocess(image_path=image_path))[0]
+
+    def extract_images(self, images: Sequence[ndarray], batch_size: int = 32) -> List[ndarray]:
+        """
+        Extraction des données caractéristiques d'images déjà décodées.
+
+        Parameters
+        ----------
+        images : Sequence[ndarray]
+            Images décodées en RVB, de tailles quelconques.
+        batch_size : int, default: 32
+            Nombre d'images par lot.
+
+        Returns
+        -------
+        List[ndarray]
+            Données caractéristiques de chaque image.
+        """
+        found = []
+        for start in range(0, len(images), batch_size):
+            with profiler.timer("resize", self):
+                batch = tf.stack(
+                    [self._resize(tf.convert_to_tensor(image)) for image in images[start : start + batch_size]]
+                )
+            found.extend(self._infer(batch))
+        return found
+
+    def extract_batch(self, image_paths: Iterable[str], batch_size: int = 32) -> Iterator[Optional[ndarray]]:
+        """
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+
+        La lecture, le décodage et le redimensionnement sont réalisés en parallèle par un pipeline `tf.data`, et le
+        lot suivant est préparé pendant l'inférence du lot courant.
+
+        Parameters
+        ----------
+        image_paths : Iterable[str]
+            Chemins des images.
+        batch_size : int, default: 32
+            Nombre d'images par lot.
+
+        Yields
+        ------
+        Optional[ndarray]
+            Données caractéristiques de chaque image, dans l'ordre des chemins, `None` pour une image illisible.
+        """
+        image_paths = list(image_paths)
+        if not image_paths:
+            return
+
+        dataset = (
+            tf.data.Dataset.from_tensor_slices(image_paths)
+            .map(self._load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+        # ##: Time spent waiting for the pipeline.
+        batches = iter(dataset)
+        while True:
+            with profiler.timer("load", self):
+                batch = next(batches, None)
+            if batch is None:
+                return
+            images, valid = batch
+            for feature, readable in zip(self._infer(images), valid.numpy()):
+                yield feature if readable else None
 
 
 class VGGCompressor(Compressor):
@@ -92,6 +271,10 @@ class VGGCompressor(Compressor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+    extract_images(images: Sequence[ndarray], batch_size: int = 32)
+        Extraction des données caractéristiques d'images déjà décodées.
     """
 
     def __init__(self, height: int = 224, width: int = 224):
@@ -118,6 +301,10 @@ class NasNetCompressor(Compressor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+    extract_images(images: Sequence[ndarray], batch_size: int = 32)
+        Extraction des données caractéristiques d'images déjà décodées.
     """
 
     def __init__(self, height: int = 331, width: int = 331):
@@ -144,6 +331,10 @@ class EfficientNetCompressor(Compressor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+    extract_images(images: Sequence[ndarray], batch_size: int = 32)
+        Extraction des données caractéristiques d'images déjà décodées.
     """
 
     def __init__(self, height: int = 600, width: int = 600):
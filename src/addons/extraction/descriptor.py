@@ -2,22 +2,34 @@
 """
 Ensemble de classe pour l'utilisation des descripteurs du module `OpenCV`.
 """
-from typing import Any, Optional
+from typing import Any, List, Optional, Sequence
 
 import cv2 as cv
-from numpy import array, concatenate, ndarray, zeros
+from numpy import array, concatenate, ndarray, uint8, zeros
+
+from src.addons.extraction.image import read_image, shrink
+from src.addons.profiling import profiled, profiler
 
 
 class Descriptor:
     """
     Interface pour l'utilisation des descripteurs du module `OpenCV`.
 
+    En mode binaire, les descripteurs binaires (ORB, AKAZE) sont conservés sous forme de bits compactés dans des
+    octets `uint8`, complétés par des zéros jusqu'à un multiple de 8 octets, afin d'être comparés avec la distance
+    de Hamming.
+
     Attributes
     ----------
     extractor : Any
         Object permettant l'extraction des données.
     vector_size : int
         Taille du vecteur des données caractéristiques.
+    binary : bool
+        Conservation des descripteurs binaires sous forme compactée.
+    image_size : int, default: 1024
+        Côté minimal des images lues : les grandes images JPEG sont décodées à résolution réduite tant que leur plus
+        petit côté reste supérieur à cette taille. `None` conserve la pleine résolution.
 
     Methods
     -------
@@ -25,12 +37,25 @@ class Descriptor:
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un descripteur afin d'extraire les données caractéristiques d'une image.
+    extract_images(images: Sequence[ndarray])
+        Extraction des données caractéristiques d'images déjà décodées.
+    describe(image_path: str)
+        Extraction des descripteurs de tous les points clés d'une image.
     """
 
     extractor: Any
 
-    def __init__(self, size: int = 32):
+    def __init__(self, size: int = 32, binary: bool = False, image_size: Optional[int] = 1024):
         self.vector_size = size
+        self.binary = binary
+        self.image_size = image_size
+
+    def _check_binary(self):
+        """
+        Vérification que le descripteur produit des descripteurs binaires si le mode binaire est demandé.
+        """
+        if self.binary and self.extractor.descriptorType() != cv.CV_8U:
+            raise ValueError(f"Le descripteur {type(self).__name__} ne produit pas de descripteurs binaires.")
 
     def preprocess(self, image_path: str) -> ndarray:
         """
@@ -44,10 +69,12 @@ class Descriptor:
         Returns
         -------
         ndarray
-            L'image prête pour l'extraction des données caractéristiques.
+            L'image en niveaux de gris, prête pour l'extraction des données caractéristiques.
         """
-        return cv.imread(image_path)
+        target = (self.image_size, self.image_size) if self.image_size is not None else None
+        return read_image(image_path, target=target, grayscale=True)
 
+    @profiled("extract")
     def extract(self, image_path: str) -> Optional[ndarray]:
         """
         Utilisation d'un descripteur afin d'extraire les données caractéristiques d'une image.
@@ -62,23 +89,89 @@ class Descriptor:
         ndarray
             Données caractéristiques de l'image.
         """
+        with profiler.timer("decode", self):
+            image = self.preprocess(image_path=image_path)
+        return self._compute(image)
+
+    def extract_images(self, images: Sequence[ndarray]) -> List[Optional[ndarray]]:
+        """
+        Extraction des données caractéristiques d'images déjà décodées.
+
+        Les images sont converties en niveaux de gris et réduites comme lors de leur lecture par `preprocess`.
+
+        Parameters
+        ----------
+        images : Sequence[ndarray]
+            Images décodées, en RVB ou en niveaux de gris.
+
+        Returns
+        -------
+        List[Optional[ndarray]]
+            Données caractéristiques de chaque image, ou `None` si aucun point clé n'est détecté.
+        """
+        target = (self.image_size, self.image_size) if self.image_size is not None else None
+        found = []
+        for image in images:
+            if image.ndim == 3:
+                image = cv.cvtColor(image, cv.COLOR_RGB2GRAY)
+            found.append(self._compute(shrink(image, target=target)))
+        return found
+
+    def _compute(self, image: ndarray) -> Optional[ndarray]:
+        """
+        Détection des points clés d'une image en niveaux de gris et calcul de ses données caractéristiques.
+
+        Parameters
+        ----------
+        image : ndarray
+            L'image en niveaux de gris.
+
+        Returns
+        -------
+        ndarray
+            Données caractéristiques de l'image, ou `None` si aucun point clé n'est détecté.
+        """
         # ##: Get image key points and keep the best.
-        image = self.preprocess(image_path=image_path)
-        kps = self.extractor.detect(image)
+        with profiler.timer("detect", self):
+            kps = self.extractor.detect(image)
         if not kps:
             return None
         kps = sorted(kps, key=lambda x: -x.response)[: self.vector_size]
 
         # ##: Computing descriptors vector
-        kps, dsc = self.extractor.compute(image, kps)
+        with profiler.timer("compute", self):
+            kps, dsc = self.extractor.compute(image, kps)
         dsc = dsc.flatten()
 
+        # ##: Packed bits, padded to whole 64-bit words.
+        if self.binary:
+            packed = zeros(-(-self.vector_size * self.extractor.descriptorSize() // 8) * 8, dtype=uint8)
+            packed[: dsc.size] = dsc
+            return packed
+
         # ##: Vector size adjustment.
         needed_size = self.vector_size * 64
         if dsc.size < needed_size:
             dsc = concatenate([dsc, zeros(needed_size - dsc.size)])
         return array(dsc)
 
+    def describe(self, image_path: str) -> Optional[ndarray]:
+        """
+        Extraction des descripteurs de tous les points clés d'une image, sans troncature ni concaténation.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        ndarray
+            Descripteurs, de taille `(n_points, taille_descripteur)`, ou `None` si aucun point n'est détecté.
+        """
+        _, dsc = self.extractor.detectAndCompute(self.preprocess(image_path=image_path), None)
+        return dsc if dsc is not None and len(dsc) else None
+
 
 class AKAZEDescriptor(Descriptor):
     """
@@ -90,6 +183,11 @@ class AKAZEDescriptor(Descriptor):
         Object permettant l'extraction des données.
     vector_size : int
         Taille du vecteur des données caractéristiques.
+    binary : bool
+        Conservation des descripteurs binaires sous forme compactée.
+    image_size : int, default: 1024
+        Côté minimal des images lues : les grandes images JPEG sont décodées à résolution réduite tant que leur plus
+        petit côté reste supérieur à cette taille. `None` conserve la pleine résolution.
 
     Methods
     -------
@@ -97,11 +195,16 @@ class AKAZEDescriptor(Descriptor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un descripteur afin d'extraire les données caractéristiques d'une image.
+    extract_images(images: Sequence[ndarray])
+        Extraction des données caractéristiques d'images déjà décodées.
+    describe(image_path: str)
+        Extraction des descripteurs de tous les points clés d'une image.
     """
 
-    def __init__(self, size: int = 32):
-        super().__init__(size=size)
+    def __init__(self, size: int = 32, binary: bool = False, image_size: Optional[int] = 1024):
+        super().__init__(size=size, binary=binary, image_size=image_size)
         self.extractor = cv.AKAZE_create()
+        self._check_binary()
 
 
 class ORBDescriptor(Descriptor):
@@ -114,6 +217,11 @@ class ORBDescriptor(Descriptor):
         Object permettant l'extraction des données.
     vector_size : int
         Taille du vecteur des données caractéristiques.
+    binary : bool
+        Conservation des descripteurs binaires sous forme compactée.
+    image_size : int, default: 1024
+        Côté minimal des images lues : les grandes images JPEG sont décodées à résolution réduite tant que leur plus
+        petit côté reste supérieur à cette taille. `None` conserve la pleine résolution.
 
     Methods
     -------
@@ -121,11 +229,16 @@ class ORBDescriptor(Descriptor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un descripteur afin d'extraire les données caractéristiques d'une image.
+    extract_images(images: Sequence[ndarray])
+        Extraction des données caractéristiques d'images déjà décodées.
+    describe(image_path: str)
+        Extraction des descripteurs de tous les points clés d'une image.
     """
 
-    def __init__(self, size: int = 32):
-        super().__init__(size=size)
+    def __init__(self, size: int = 32, binary: bool = False, image_size: Optional[int] = 1024):
+        super().__init__(size=size, binary=binary, image_size=image_size)
         self.extractor = cv.ORB_create()
+        self._check_binary()
 
 
 class SIFTDescriptor(Descriptor):
@@ -138,6 +251,11 @@ class SIFTDescriptor(Descriptor):
         Object permettant l'extraction des données.
     vector_size : int
         Taille du vecteur des données caractéristiques.
+    binary : bool
+        Conservation des descripteurs binaires sous forme compactée.
+    image_size : int, default: 1024
+        Côté minimal des images lues : les grandes images JPEG sont décodées à résolution réduite tant que leur plus
+        petit côté reste supérieur à cette taille. `None` conserve la pleine résolution.
 
     Methods
     -------
@@ -145,8 +263,13 @@ class SIFTDescriptor(Descriptor):
         Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
     extract(image_path: str)
         Utilisation d'un descripteur afin d'extraire les données caractéristiques d'une image.
+    extract_images(images: Sequence[ndarray])
+        Extraction des données caractéristiques d'images déjà décodées.
+    describe(image_path: str)
+        Extraction des descripteurs de tous les points clés d'une image.
     """
 
-    def __init__(self, size: int = 32):
-        super().__init__(size=size)
+    def __init__(self, size: int = 32, binary: bool = False, image_size: Optional[int] = 1024):
+        super().__init__(size=size, binary=binary, image_size=image_size)
         self.extractor = cv.SIFT_create()
+        self._check_binary()
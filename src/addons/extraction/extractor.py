@@ -1,23 +1,20 @@
 # -*- coding: utf-8 -*-
 """
 Classe générique pour l'extraction des données caractéristiques d'une image.
+
+Les extracteurs sont résolus à la demande : TensorFlow et OpenCV ne sont importés que lorsqu'un extracteur qui en a
+besoin est utilisé.
 """
-from typing import Any, Protocol, Union
+from typing import TYPE_CHECKING, Any, Protocol, Union
 
 from numpy import ndarray
-from tensorflow import Tensor
 
-from src.addons.extraction.compressor import (
-    EfficientNetCompressor,
-    NasNetCompressor,
-    VGGCompressor,
-)
-from src.addons.extraction.descriptor import (
-    AKAZEDescriptor,
-    ORBDescriptor,
-)
+from src.addons.registry import LazyRegistry
+
+if TYPE_CHECKING:
+    from tensorflow import Tensor
 
-Image = Union[ndarray, Tensor]
+Image = Union[ndarray, "Tensor"]
 
 
 class Extractor(Protocol):
@@ -70,10 +67,20 @@ class Extractor(Protocol):
         """
 
 
-extractors = {
-    "AKAZE": AKAZEDescriptor,
-    "ORB": ORBDescriptor,
-    "VGG": VGGCompressor,
-    "NasNet": NasNetCompressor,
-    "EfficientNet": EfficientNetCompressor,
-}
+extractors = LazyRegistry(
+    {
+        "AKAZE": "src.addons.extraction.descriptor:AKAZEDescriptor",
+        "ORB": "src.addons.extraction.descriptor:ORBDescriptor",
+        "VGG": "src.addons.extraction.compressor:VGGCompressor",
+        "NasNet": "src.addons.extraction.compressor:NasNetCompressor",
+        "EfficientNet": "src.addons.extraction.compressor:EfficientNetCompressor",
+    }
+)
+
+binary_extractors = LazyRegistry(
+    {
+        "AKAZE_binary": "src.addons.extraction.descriptor:AKAZEDescriptor",
+        "ORB_binary": "src.addons.extraction.descriptor:ORBDescriptor",
+    },
+    binary=True,
+)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture des images, commune aux descripteurs et aux réseaux de neurones.
+
+Les images JPEG sont décodées directement à résolution réduite (1/2, 1/4 ou 1/8) lorsque l'image réduite reste au
+moins aussi grande que la taille demandée : la réduction est réalisée par la transformée en cosinus discrète, ce
+qui évite de décoder puis de jeter la plupart des pixels des grandes photographies.
+
+Toutes les images sont converties de la même façon : les images en niveaux de gris sont étendues à trois canaux, les
+images CMJN sont converties en RVB, le canal alpha est ignoré et l'orientation EXIF est appliquée.
+"""
+import struct
+from typing import Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+from numpy import ndarray
+
+# ##: Decoding flags by reduction factor, in colour and in grayscale.
+_COLOR_FLAGS = {
+    1: cv.IMREAD_COLOR,
+    2: cv.IMREAD_REDUCED_COLOR_2,
+    4: cv.IMREAD_REDUCED_COLOR_4,
+    8: cv.IMREAD_REDUCED_COLOR_8,
+}
+_GRAY_FLAGS = {
+    1: cv.IMREAD_GRAYSCALE,
+    2: cv.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# ##: Start-of-frame markers, which hold the image size.
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Lecture de la taille d'une image JPEG dans son en-tête, sans la décoder.
+
+    Parameters
+    ----------
+    data : bytes
+        Contenu du fichier.
+
+    Returns
+    -------
+    Optional[Tuple[int, int]]
+        Hauteur et largeur de l'image, ou `None` s'il ne s'agit pas d'une image JPEG lisible.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker in _SOF_MARKERS:
+            if position + 9 > len(data):
+                return None
+            return struct.unpack(">HH", data[position + 5 : position + 9])
+        (length,) = struct.unpack(">H", data[position + 2 : position + 4])
+        position += 2 + length
+    return None
+
+
+def reduction(size: Tuple[int, int], target: Optional[Tuple[int, int]]) -> int:
+    """
+    Choix du facteur de réduction au décodage.
+
+    Parameters
+    ----------
+    size : Tuple[int, int]
+        Hauteur et largeur de l'image.
+    target : Optional[Tuple[int, int]]
+        Hauteur et largeur minimales de l'image décodée.
+
+    Returns
+    -------
+    int
+        Plus grand facteur parmi 1, 2, 4 et 8 qui conserve au moins la taille demandée, quelle que soit l'orientation
+        de l'image.
+    """
+    if target is None:
+        return 1
+    # ##: EXIF orientation may swap the sides: the shortest side must cover the largest target side.
+    needed, short = max(target), min(size)
+    for factor in (8, 4, 2):
+        if short // factor >= needed:
+            return factor
+    return 1
+
+
+def decode_image(
+    data: ndarray, target: Optional[Tuple[int, int]] = None, grayscale: bool = False
+) -> Optional[ndarray]:
+    """
+    Décodage d'une image, à résolution réduite si possible.
+
+    Parameters
+    ----------
+    data : ndarray
+        Contenu du fichier, en `uint8`.
+    target : Optional[Tuple[int, int]], default: None
+        Hauteur et largeur minimales de l'image décodée. Par défaut, l'image est décodée en pleine résolution.
+    grayscale : bool, default: False
+        Décodage en niveaux de gris.
+
+    Returns
+    -------
+    Optional[ndarray]
+        Image `uint8`, en RVB de taille `(hauteur, largeur, 3)` ou en niveaux de gris de taille `(hauteur, largeur)`,
+        ou `None` si l'image n'est pas lisible.
+    """
+    size = jpeg_size(data[:65536].tobytes())
+    factor = reduction(size, target) if size is not None else 1
+    image = cv.imdecode(data, (_GRAY_FLAGS if grayscale else _COLOR_FLAGS)[factor])
+    if image is None or grayscale:
+        return image
+    return cv.cvtColor(image, cv.COLOR_BGR2RGB)
+
+
+def read_image(
+    image_path: str, target: Optional[Tuple[int, int]] = None, grayscale: bool = False
+) -> Optional[ndarray]:
+    """
+    Lecture d'une image, à résolution réduite si possible.
+
+    Parameters
+    ----------
+    image_path : str
+        Chemin de l'image.
+    target : Optional[Tuple[int, int]], default: None
+        Hauteur et largeur minimales de l'image lue. Par défaut, l'image est lue en pleine résolution.
+    grayscale : bool, default: False
+        Lecture en niveaux de gris.
+
+    Returns
+    -------
+    Optional[ndarray]
+        Image `uint8`, en RVB de taille `(hauteur, largeur, 3)` ou en niveaux de gris de taille `(hauteur, largeur)`,
+        ou `None` si l'image n'est pas lisible.
+    """
+    try:
+        data = np.fromfile(image_path, dtype=np.uint8)
+    except OSError:
+        return None
+    return decode_image(data, target=target, grayscale=grayscale)
+
+
+def shrink(image: ndarray, target: Optional[Tuple[int, int]]) -> ndarray:
+    """
+    Réduction d'une image déjà décodée, avec le facteur qui aurait été choisi lors de son décodage.
+
+    Parameters
+    ----------
+    image : ndarray
+        Image décodée.
+    target : Optional[Tuple[int, int]]
+        Hauteur et largeur minimales de l'image réduite.
+
+    Returns
+    -------
+    ndarray
+        Image réduite, ou l'image d'origine si aucune réduction n'est possible.
+    """
+    factor = reduction(image.shape[:2], target)
+    if factor == 1:
+        return image
+    height, width = image.shape[:2]
+    return cv.resize(image, (-(-width // factor), -(-height // factor)), interpolation=cv.INTER_AREA)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Export des réseaux de neurones au format TensorFlow Lite et inférence optimisée sur processeur.
+
+Le modèle exporté contient le pré-traitement propre à chaque réseau : il reçoit les images redimensionnées, aux
+valeurs entre 0 et 255, et renvoie directement les données caractéristiques. L'interpréteur utilise XNNPACK pour les
+opérations en virgule flottante.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import tensorflow as tf
+from numpy import ndarray
+from tensorflow.python.framework.convert_to_constants import (  # pylint: disable=no-name-in-module
+    convert_variables_to_constants_v2,
+)
+
+from src.addons.extraction.compressor import Compressor
+from src.addons.profiling import profiler
+
+# ##: Post-training quantization modes.
+quantizations = (None, "dynamic", "float16", "int8")
+
+
+def export_lite(
+    compressor: Compressor,
+    output_path: str,
+    quantization: Optional[str] = None,
+    representative: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    Export du réseau d'un extracteur au format TensorFlow Lite.
+
+    Parameters
+    ----------
+    compressor : Compressor
+        Extracteur dont le réseau est exporté.
+    output_path : str
+        Chemin du fichier `.tflite`.
+    quantization : str, default: None
+        Quantification après apprentissage : `dynamic` (poids en `int8`), `float16` (poids en `float16`) ou `int8`
+        (poids et activations en `int8`, entrées et sorties en `float32`). Par défaut, le modèle reste en `float32`.
+    representative : Sequence[str], default: None
+        Chemins d'images utilisées pour calibrer les activations, nécessaires à la quantification `int8`.
+
+    Returns
+    -------
+    str
+        Chemin du fichier `.tflite`.
+    """
+    if quantization not in quantizations:
+        raise ValueError(f"Quantification inconnue : {quantization}.")
+    if quantization == "int8" and not representative:
+        raise ValueError("La quantification `int8` nécessite des images de calibration.")
+
+    # ##: Preprocessing is part of the exported graph.
+    @tf.function(input_signature=[tf.TensorSpec(shape=(1, compressor.height, compressor.width, 3), dtype=tf.float32)])
+    def serve(images):
+        if compressor.preprocessor is not None:
+            images = compressor.preprocessor(images)
+        features = compressor.extractor(images, training=False)
+        return tf.reshape(features, [tf.shape(features)[0], -1])
+
+    def dataset():
+        for path in representative:
+            image, valid = compressor._decode(tf.constant(path))  # pylint: disable=protected-access
+            if not valid:
+                continue
+            image = tf.image.resize(image, [compressor.height, compressor.width])
+            yield [tf.expand_dims(tf.cast(image, tf.float32), axis=0)]
+
+    # ##: Weights are frozen into constants, the interpreter does not handle Keras variables.
+    converter = tf.lite.TFLiteConverter.from_concrete_functions(
+        [convert_variables_to_constants_v2(serve.get_concrete_function())]
+    )
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    if quantization == "int8":
+        converter.representative_dataset = dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    model = converter.convert()
+
+    with open(output_path, "wb") as file:
+        file.write(model)
+    return output_path
+
+
+class LiteCompressor(Compressor):
+    """
+    Extraction des données caractéristiques avec un réseau exporté par `export_lite`.
+
+    La lecture et le redimensionnement des images sont ceux de `Compressor` ; le pré-traitement propre au réseau est
+    réalisé par le modèle exporté.
+
+    Attributes
+    ----------
+    extractor : Any
+        Interpréteur TensorFlow Lite.
+    model_path : str
+        Chemin du fichier `.tflite`.
+    threads : int, default: None
+        Nombre de fils d'exécution de l'interpréteur. Par défaut, choisi par TensorFlow Lite.
+
+    Methods
+    -------
+    preprocess(image_path: str)
+        Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
+    extract(image_path: str)
+        Utilisation d'un réseau de neurones afin d'extraire les données caractéristiques d'une image.
+    extract_batch(image_paths: Iterable[str], batch_size: int = 32)
+        Extraction des données caractéristiques d'un ensemble d'images par lots.
+    extract_images(images: Sequence[ndarray], batch_size: int = 32)
+        Extraction des données caractéristiques d'images déjà décodées.
+    """
+
+    def __init__(self, model_path: str, threads: Optional[int] = None):
+        self.model_path, self.threads = model_path, threads
+        self.extractor = tf.lite.Interpreter(model_path=model_path, num_threads=threads)
+        self.extractor.allocate_tensors()
+        self._input = self.extractor.get_input_details()[0]
+        self._output = self.extractor.get_output_details()[0]
+        _, height, width, _ = self._input["shape"].tolist()
+        super().__init__(height=height, width=width)
+        self.preprocessor = None
+        self._batch = 1
+
+    def _infer(self, images: tf.Tensor) -> ndarray:
+        """
+        Appel de l'interpréteur sur un lot d'images.
+
+        Parameters
+        ----------
+        images : tf.Tensor
+            Lot d'images redimensionnées, de taille `(n, height, width, 3)`.
+
+        Returns
+        -------
+        ndarray
+            Données caractéristiques des images, de taille `(n, dimension)`.
+        """
+        images = np.asarray(images, dtype=np.float32)
+        with profiler.timer("inference", self):
+            # ##: Tensors are re-allocated only when the batch size changes.
+            if images.shape[0] != self._batch:
+                self.extractor.resize_tensor_input(self._input["index"], images.shape)
+                self.extractor.allocate_tensors()
+                self._batch = images.shape[0]
+            self.extractor.set_tensor(self._input["index"], images)
+            self.extractor.invoke()
+            features = self.extractor.get_tensor(self._output["index"])
+        profiler.count("images", self, value=features.shape[0])
+        return features.reshape(features.shape[0], -1)
+
+
+def compare(reference: Any, candidate: Any, image_paths: Sequence[str], tolerance: float = 0.01) -> Dict[str, Any]:
+    """
+    Comparaison des données caractéristiques de deux extracteurs sur les mêmes images.
+
+    Parameters
+    ----------
+    reference : Any
+        Extracteur de référence, en général le réseau Keras d'origine.
+    candidate : Any
+        Extracteur comparé, en général un `LiteCompressor`.
+    image_paths : Sequence[str]
+        Chemins des images.
+    tolerance : float, default: 0.01
+        Écart maximal toléré entre 1 et la similarité cosinus des données caractéristiques d'une même image.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Similarité cosinus minimale, écart relatif maximal des normes et respect de la tolérance.
+    """
+    expected = np.stack(list(reference.extract_batch(image_paths)))
+    found = np.stack(list(candidate.extract_batch(image_paths)))
+    expected_norms, found_norms = np.linalg.norm(expected, axis=1), np.linalg.norm(found, axis=1)
+    cosine = np.sum(expected * found, axis=1) / np.maximum(expected_norms * found_norms, 1e-12)
+    gap = np.abs(found_norms - expected_norms) / np.maximum(expected_norms, 1e-12)
+    return {
+        "min_cosine": float(cosine.min()),
+        "max_norm_gap": float(gap.max()),
+        "within_tolerance": bool(1 - cosine.min() <= tolerance),
+    }
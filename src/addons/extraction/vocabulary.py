@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Ensemble de classe pour la représentation des images en sac de mots visuels.
+"""
+from typing import Any, Iterable, List, Optional
+
+import numpy as np
+from numpy import ndarray
+from sklearn.cluster import MiniBatchKMeans
+
+from src.addons.distance import as_matrix, euclidean, normalize, squared_norms, top_k
+from src.addons.extraction.descriptor import Descriptor
+
+
+class VisualVocabulary:
+    """
+    Vocabulaire de mots visuels appris par k-means sur les descripteurs des points clés.
+
+    Les descripteurs binaires (ORB, AKAZE) sont dépliés en bits avant l'apprentissage, de sorte que la distance
+    euclidienne au carré coïncide avec la distance de Hamming.
+
+    Les fréquences documentaires inverses (IDF) des mots sont apprises sur les histogrammes de la base : les images
+    sont ensuite représentées par leurs vecteurs TF-IDF normalisés, dont le produit scalaire est la similarité
+    cosinus TF-IDF, que la recherche soit exhaustive ou passe par l'index inversé.
+
+    Attributes
+    ----------
+    size : int, default: 2048
+        Nombre de mots visuels.
+    batch_size : int, default: 8192
+        Nombre de descripteurs par lot d'apprentissage.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+
+    Methods
+    -------
+    fit(descriptors: Iterable[ndarray])
+        Apprentissage du vocabulaire sur un flux de descripteurs.
+    quantize(descriptors: ndarray)
+        Association de chaque descripteur à son mot visuel.
+    histogram(descriptors: ndarray)
+        Nombre d'occurrences de chaque mot visuel.
+    fit_idf(histograms: ndarray)
+        Apprentissage des fréquences documentaires inverses des mots visuels.
+    weight(histograms: ndarray)
+        Pondération TF-IDF et normalisation L2 d'histogrammes.
+    save(path: str)
+        Enregistrement du vocabulaire.
+    load(path: str)
+        Chargement d'un vocabulaire enregistré.
+    """
+
+    def __init__(self, size: int = 2048, batch_size: int = 8192, seed: int = 1331):
+        self.size, self.batch_size, self.seed = size, batch_size, seed
+        self.centroids: Optional[ndarray] = None
+        self.norms: Optional[ndarray] = None
+        self.idf: Optional[ndarray] = None
+
+    @staticmethod
+    def _prepare(descriptors: ndarray) -> ndarray:
+        """
+        Conversion des descripteurs en vecteurs réels.
+
+        Parameters
+        ----------
+        descriptors : ndarray
+            Descripteurs des points clés.
+
+        Returns
+        -------
+        ndarray
+            Descripteurs en `float32`, bits dépliés pour les descripteurs binaires.
+        """
+        if descriptors.dtype == np.uint8:
+            return as_matrix(np.unpackbits(descriptors, axis=1))
+        return as_matrix(descriptors)
+
+    def fit(self, descriptors: Iterable[ndarray]):
+        """
+        Apprentissage du vocabulaire sur un flux de descripteurs, par mini-lots.
+
+        Parameters
+        ----------
+        descriptors : Iterable[ndarray]
+            Descripteurs des points clés, par exemple ceux de chaque image.
+        """
+        kmeans = MiniBatchKMeans(n_clusters=self.size, batch_size=self.batch_size, random_state=self.seed, n_init=1)
+        buffer: List[ndarray] = []
+        buffered, fitted = 0, False
+        for chunk in descriptors:
+            buffer.append(self._prepare(chunk))
+            buffered += len(chunk)
+            if buffered >= max(self.batch_size, self.size):
+                kmeans.partial_fit(np.concatenate(buffer))
+                buffer, buffered, fitted = [], 0, True
+        if buffer and (fitted or buffered >= self.size):
+            kmeans.partial_fit(np.concatenate(buffer))
+            fitted = True
+        if not fitted:
+            raise ValueError("Pas assez de descripteurs pour apprendre le vocabulaire.")
+
+        self.centroids = as_matrix(kmeans.cluster_centers_)
+        self.norms = squared_norms(self.centroids)
+
+    def quantize(self, descriptors: ndarray) -> ndarray:
+        """
+        Association de chaque descripteur à son mot visuel.
+
+        Parameters
+        ----------
+        descriptors : ndarray
+            Descripteurs des points clés.
+
+        Returns
+        -------
+        ndarray
+            Indices des mots visuels, de taille `(n_points,)`.
+        """
+        return top_k(euclidean(self._prepare(descriptors), self.centroids, self.norms), depth=1)[:, 0]
+
+    def histogram(self, descriptors: ndarray) -> ndarray:
+        """
+        Nombre d'occurrences de chaque mot visuel.
+
+        Parameters
+        ----------
+        descriptors : ndarray
+            Descripteurs des points clés.
+
+        Returns
+        -------
+        ndarray
+            Histogramme des mots visuels, de taille `(size,)`.
+        """
+        return np.bincount(self.quantize(descriptors), minlength=self.size).astype(np.float32)
+
+    def fit_idf(self, histograms: ndarray, chunk_size: int = 65536):
+        """
+        Apprentissage des fréquences documentaires inverses des mots visuels.
+
+        Parameters
+        ----------
+        histograms : ndarray
+            Histogrammes des mots visuels de la base, de taille `(n_base, size)`.
+        chunk_size : int, default: 65536
+            Nombre d'images traitées à la fois.
+        """
+        count = histograms.shape[0]
+        frequencies = np.zeros(self.size, dtype=np.int64)
+        for start in range(0, count, chunk_size):
+            frequencies += np.count_nonzero(histograms[start : start + chunk_size], axis=0)
+        self.idf = (np.log((1 + count) / (1 + frequencies)) + 1).astype(np.float32)
+
+    def weight(self, histograms: ndarray) -> ndarray:
+        """
+        Pondération TF-IDF et normalisation L2 d'histogrammes.
+
+        Parameters
+        ----------
+        histograms : ndarray
+            Histogrammes des mots visuels, de taille `(n, size)`.
+
+        Returns
+        -------
+        ndarray
+            Vecteurs TF-IDF normalisés, en `float32`.
+        """
+        if self.idf is None:
+            raise RuntimeError("Les fréquences documentaires inverses n'ont pas été apprises.")
+        return normalize(np.atleast_2d(histograms) * self.idf)
+
+    def save(self, path: str):
+        """
+        Enregistrement du vocabulaire.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        arrays = {} if self.idf is None else {"idf": self.idf}
+        np.savez(path, centroids=self.centroids, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "VisualVocabulary":
+        """
+        Chargement d'un vocabulaire enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+
+        Returns
+        -------
+        VisualVocabulary
+            Vocabulaire prêt pour la quantification.
+        """
+        with np.load(path) as data:
+            vocabulary = cls(size=data["centroids"].shape[0])
+            vocabulary.centroids = data["centroids"]
+            vocabulary.idf = data["idf"] if "idf" in data else None
+        vocabulary.norms = squared_norms(vocabulary.centroids)
+        return vocabulary
+
+
+class BagOfWordsExtractor:
+    """
+    Interface pour la représentation d'une image par le vecteur TF-IDF normalisé de ses mots visuels.
+
+    Attributes
+    ----------
+    extractor : Any
+        Descripteur utilisé pour l'extraction des points clés.
+    vocabulary : VisualVocabulary
+        Vocabulaire de mots visuels, avec ses fréquences documentaires inverses.
+
+    Methods
+    -------
+    preprocess(image_path: str)
+        Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
+    extract(image_path: str)
+        Calcul du vecteur TF-IDF normalisé d'une image.
+    """
+
+    extractor: Any
+
+    def __init__(self, descriptor: Descriptor, vocabulary: VisualVocabulary):
+        self.extractor, self.vocabulary = descriptor, vocabulary
+
+    def preprocess(self, image_path: str) -> ndarray:
+        """
+        Chargement de l'image et ensemble de pré-traitement pour l'extraction des données caractéristiques.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        ndarray
+            L'image prête pour l'extraction des données caractéristiques.
+        """
+        return self.extractor.preprocess(image_path=image_path)
+
+    def extract(self, image_path: str) -> Optional[ndarray]:
+        """
+        Calcul du vecteur TF-IDF normalisé d'une image, comparable à ceux de la base.
+
+        Parameters
+        ----------
+        image_path : str
+            Chemin de l'image.
+
+        Returns
+        -------
+        ndarray
+            Vecteur TF-IDF normalisé des mots visuels, ou `None` si aucun point clé n'est détecté.
+        """
+        descriptors = self.extractor.describe(image_path=image_path)
+        return None if descriptors is None else self.vocabulary.weight(self.vocabulary.histogram(descriptors))[0]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Index des labels de la base pour la recherche filtrée par couleur et par style.
+"""
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from numpy import ndarray
+
+# ##: A filter is one accepted value or a list of accepted values.
+Filter = Optional[Union[str, Sequence[str]]]
+
+
+class LabelIndex:
+    """
+    Codage entier d'une colonne de labels et liste des lignes de chaque valeur.
+
+    Les lignes sont regroupées par valeur dans un seul tableau, dans l'ordre croissant au sein de chaque valeur :
+    les lignes d'une valeur sont une tranche de ce tableau, sans parcours de la colonne.
+
+    Attributes
+    ----------
+    values : ndarray
+        Valeurs distinctes, triées ; le code d'un label est sa position dans ce tableau.
+    codes : ndarray
+        Code de chaque ligne, en `int32`.
+    rows : ndarray
+        Indices des lignes, regroupés par code.
+    offsets : ndarray
+        Début de chaque code dans `rows`, suivi du nombre de lignes.
+
+    Methods
+    -------
+    select(wanted: Union[str, Sequence[str]])
+        Lignes portant l'une des valeurs demandées.
+    """
+
+    def __init__(self, labels: Sequence[str]):
+        self.values, codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        self.codes = codes.reshape(-1).astype(np.int32)
+        self.rows = np.argsort(self.codes, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.codes, minlength=self.values.size))])
+
+    def select(self, wanted: Union[str, Sequence[str]]) -> ndarray:
+        """
+        Lignes portant l'une des valeurs demandées.
+
+        Parameters
+        ----------
+        wanted : Union[str, Sequence[str]]
+            Valeur ou liste de valeurs acceptées.
+
+        Returns
+        -------
+        ndarray
+            Indices des lignes, dans l'ordre croissant.
+        """
+        wanted = np.unique(np.asarray([wanted] if isinstance(wanted, str) else list(wanted), dtype=str))
+        positions = np.minimum(np.searchsorted(self.values, wanted), max(self.values.size - 1, 0))
+        codes = positions[self.values[positions] == wanted] if self.values.size else positions[:0]
+        if codes.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if codes.size == 1:
+            return self.rows[self.offsets[codes[0]] : self.offsets[codes[0] + 1]]
+        return np.sort(np.concatenate([self.rows[self.offsets[code] : self.offsets[code + 1]] for code in codes]))
+
+
+def matching(
+    colors: LabelIndex, styles: LabelIndex, wanted_colors: Filter, wanted_styles: Filter
+) -> Optional[ndarray]:
+    """
+    Lignes respectant les filtres de couleur et de style.
+
+    Parameters
+    ----------
+    colors : LabelIndex
+        Index des couleurs.
+    styles : LabelIndex
+        Index des styles.
+    wanted_colors : Filter
+        Couleurs acceptées. `None` accepte toutes les couleurs.
+    wanted_styles : Filter
+        Styles acceptés. `None` accepte tous les styles.
+
+    Returns
+    -------
+    Optional[ndarray]
+        Indices des lignes, dans l'ordre croissant, ou `None` en l'absence de filtre.
+    """
+    if wanted_colors is None and wanted_styles is None:
+        return None
+    if wanted_styles is None:
+        return colors.select(wanted_colors)
+    if wanted_colors is None:
+        return styles.select(wanted_styles)
+    return np.intersect1d(colors.select(wanted_colors), styles.select(wanted_styles), assume_unique=True)
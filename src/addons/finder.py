@@ -2,21 +2,30 @@
 """
 Classes pour la recherche d'images similaires.
 """
+import threading
 import time
 from abc import ABC, abstractmethod
+from copy import copy, deepcopy
 from functools import wraps
-from typing import Callable, Dict, List, Mapping, Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from numpy import ndarray
-from sklearn.metrics.pairwise import (
-    cosine_similarity,
-    euclidean_distances,
-    manhattan_distances,
-)
 
-from src.addons.data import load_database
+from src.addons import distance
+from src.addons.data import (
+    load_database,
+    load_segments,
+    remove_segments,
+    save_database,
+    save_segment,
+    save_tombstones,
+)
 from src.addons.extraction.extractor import Extractor
+from src.addons.filtering import Filter, LabelIndex, matching
+from src.addons.indexing.index import Index, index_path, indexes, remove_indexes
+from src.addons.profiling import profiled, profiler
+from src.addons.reduction import PCAReducer, reducer_path, saved_reducer
 
 
 def timeit(func: Callable):
@@ -50,47 +59,510 @@ class Finder(ABC):
     """
     Classe générique pour la recherche d'image à partir de similarité entre données caractéristiques.
 
+    Les données caractéristiques de la base sont conservées en matrice contiguë de `float32`, et les grandeurs
+    dérivées utiles au calcul des distances sont pré-calculées au chargement de la base.
+
+    Une recherche exhaustive est réalisée par défaut. Un index de recherche approximative peut être utilisé à la
+    place avec `change_index`, `build_index` ou `load_index`. Les grandeurs pré-calculées sont alors libérées, l'index
+    conservant les siennes : les recherches filtrées les calculent pour les seules lignes qu'elles lisent.
+
+    La base peut évoluer sans rechargement : `add` place les nouvelles images dans de petits segments, recherchés
+    exhaustivement en plus de la base, et `remove` marque des identifiants comme supprimés. `compact` fusionne les
+    segments dans la base et retire les images supprimées, éventuellement en arrière-plan. Les identifiants des
+    images restent stables ; l'index éventuel de la base est abandonné lors d'une fusion, et les index enregistrés à
+    côté d'elle sont supprimés.
+
+    Les recherches peuvent être restreintes à certaines couleurs et à certains styles. Les labels de la base sont
+    codés en entiers au chargement, avec la liste des lignes de chaque valeur : les distances ne sont calculées que
+    sur les lignes qui respectent les filtres, de manière exhaustive même si un index est utilisé.
+
+    Une projection sur les composantes principales peut réduire la dimension des données avec `change_reducer`,
+    `build_reducer` ou `load_reducer` : elle est appliquée à la base puis à chaque requête. Les données d'origine
+    sont conservées pour l'enregistrement de la base.
+
+    Attributes
+    ----------
+    metric : str
+        Nom de la métrique utilisée par les index.
+    largest : bool
+        Indique si les meilleurs résultats ont les scores les plus grands (similarité) ou les plus petits (distance).
+
     Methods
     -------
     change_database(data_path: str)
         Changement de la base des données caractéristiques.
-    search(wanted: str, depth: int = 1)
+    change_index(index: Index)
+        Utilisation d'un index pour la recherche.
+    build_index(name: str, **params)
+        Construction d'un index sur la base de données.
+    load_index(data_path: str, name: str)
+        Chargement d'un index enregistré à côté de la base de données.
+    change_reducer(reducer: Optional[PCAReducer])
+        Utilisation d'une projection pour réduire la dimension des données.
+    build_reducer(dimension: int, whiten: bool = False)
+        Apprentissage d'une projection sur la base de données.
+    load_reducer(data_path: str)
+        Chargement d'une projection enregistrée à côté de la base de données.
+    search(wanted: str, depth: int = 1, colors: Filter = None, styles: Filter = None)
         Recherche des images similaires dans la base de données.
+    search_batch(wanted: Union[Sequence[str], ndarray], depth: int = 1, colors: Filter = None, styles: Filter = None)
+        Recherche des images similaires pour un lot de requêtes.
+    add(wanted: Union[Sequence[str], ndarray], colors: Sequence[str], styles: Sequence[str])
+        Ajout d'images à la base de données.
+    remove(ids: Sequence[int])
+        Suppression d'images de la base de données.
+    compact(background: bool = False)
+        Fusion des segments dans la base de données.
     """
 
-    def __init__(self, extractor: Extractor, database: Optional[Mapping[str, ndarray]] = None):
+    metric: str
+    largest: bool = False
+
+    def __init__(
+        self,
+        extractor: Extractor,
+        database: Optional[Mapping[str, ndarray]] = None,
+        index: Optional[Index] = None,
+        reducer: Optional[PCAReducer] = None,
+    ):
         self.extractor = extractor
-        self.database = database
+        self.database, self.index, self.data_path = None, None, None
+        self.source: Optional[ndarray] = None
+        self.reducer: Optional[PCAReducer] = None
+        self.segments: List["Finder"] = []
+        self.removed = np.empty(0, dtype=np.int64)
+        self.indexed: List["Finder"] = []
+        self.appended = np.empty(0, dtype=np.int64)
+        self.next_id = 0
+        self._lock, self._compaction = threading.RLock(), threading.Lock()
+        if reducer is not None:
+            self.change_reducer(reducer)
+        if database is not None:
+            self._prepare(database)
+        if index is not None:
+            self.change_index(index)
+
+    def _prepare(self, database: Mapping[str, ndarray]):
+        """
+        Préparation de la base de données pour la recherche.
+
+        Parameters
+        ----------
+        database : Mapping[str, ndarray]
+            Dictionnaires des données et des labels.
+        """
+        self.database, self.index, self.source = dict(database), None, database["features"]
+        self.indexed, self.appended = [], np.empty(0, dtype=np.int64)
+        self.database["features"] = self._as_matrix(database["features"])
+        self._cache(self.database["features"])
+        self._index_labels()
+        if "ids" in self.database:
+            self.next_id = max(self.next_id, int(self.database["ids"].max(initial=-1)) + 1)
+        else:
+            self.next_id = max(self.next_id, self.database["features"].shape[0])
+
+    def _index_labels(self):
+        """
+        Codage des couleurs et des styles de la base, pour la recherche filtrée.
+        """
+        self.labels = {key: LabelIndex(self.database[key]) for key in ("colors", "styles")}
+
+    def _matching(self, colors: Filter, styles: Filter) -> Optional[ndarray]:
+        """
+        Lignes de la base respectant les filtres.
+
+        Parameters
+        ----------
+        colors : Filter
+            Couleurs acceptées. `None` accepte toutes les couleurs.
+        styles : Filter
+            Styles acceptés. `None` accepte tous les styles.
+
+        Returns
+        -------
+        Optional[ndarray]
+            Indices des lignes, dans l'ordre croissant, ou `None` en l'absence de filtre.
+        """
+        return matching(self.labels["colors"], self.labels["styles"], colors, styles)
+
+    def _as_matrix(self, features: ndarray) -> ndarray:
+        """
+        Conversion des données caractéristiques dans le format utilisé pour le calcul des distances.
+
+        Parameters
+        ----------
+        features : ndarray
+            Données caractéristiques.
+
+        Returns
+        -------
+        ndarray
+            Matrice contiguë de `float32`, projetée si une réduction est utilisée.
+        """
+        if self.reducer is not None:
+            return self.reducer.transform(features)
+        return distance.as_matrix(features)
+
+    def _cache(self, features: Optional[ndarray]):
+        """
+        Pré-calcul des grandeurs dérivées de la base utiles au calcul des distances.
+
+        Parameters
+        ----------
+        features : Optional[ndarray]
+            Matrice des données caractéristiques de la base, ou `None` pour libérer les grandeurs pré-calculées.
+        """
 
     def change_database(self, data_path: str):
         """
         Changement de la base des données caractéristiques.
 
+        La réduction enregistrée à côté de la base par `make reduction` est utilisée automatiquement ; sans
+        réduction enregistrée, les données ne sont pas projetées.
+
         Parameters
         ----------
         data_path : str
             Chemin des données à charger.
         """
-        self.database = load_database(data_path=data_path)
+        with self._lock:
+            self.next_id, self.reducer = 0, saved_reducer(data_path)
+            self._prepare(load_database(data_path=data_path))
+            segments, self.removed = load_segments(data_path)
+
+            # ##: Segments already merged by an interrupted compaction are skipped.
+            merged = self._ids(np.arange(self.database["features"].shape[0]))
+            segments = [segment for segment in segments if not np.isin(segment["ids"][:1], merged).any()]
+            self.segments = [type(self)(self.extractor, segment, reducer=self.reducer) for segment in segments]
+            self.next_id = max([self.next_id] + [segment.next_id for segment in self.segments])
+            self.data_path = data_path
+
+    def change_index(self, index: Index):
+        """
+        Utilisation d'un index pour la recherche.
+
+        Parameters
+        ----------
+        index : Index
+            Index construit sur la base de données courante.
+        """
+        if index.metric != self.metric:
+            raise ValueError(f"L'index utilise la métrique {index.metric} au lieu de {self.metric}.")
+        # ##: The index keeps its own norms: filtered searches compute the few rows they read instead.
+        with self._lock:
+            self.index, self.indexed, self.appended = index, [], np.empty(0, dtype=np.int64)
+            self._cache(None)
+
+    def build_index(self, name: str, **params) -> Index:
+        """
+        Construction d'un index sur la base de données.
+
+        Parameters
+        ----------
+        name : str
+            Nom du type d'index.
+        **params
+            Paramètres de l'index.
+
+        Returns
+        -------
+        Index
+            Index construit, utilisé pour les recherches suivantes.
+        """
+        if self.database is None:
+            raise RuntimeError("Aucune base de données n'a été fournie.")
+        index = indexes[name](metric=self.metric, **params)
+        index.build(self.database["features"])
+        self.change_index(index)
+        return index
+
+    def load_index(self, data_path: str, name: str):
+        """
+        Chargement d'un index enregistré à côté de la base de données.
+
+        Parameters
+        ----------
+        data_path : str
+            Chemin de la base de données.
+        name : str
+            Nom du type d'index.
+
+        Raises
+        ------
+        ValueError
+            Si l'index ne porte pas sur le même nombre d'images que la base, ou sur des vecteurs d'une autre
+            dimension, par exemple construit avant ou sans la projection de la base.
+        """
+        if self.database is None:
+            raise RuntimeError("Aucune base de données n'a été fournie.")
+        path = index_path(data_path, name=name, metric=self.metric)
+        index = indexes[name].load(path, self.database["features"])
+        size, dimension = self.database["features"].shape
+        if index.size != size:
+            raise ValueError(
+                f"L'index {path} porte sur {index.size} images au lieu de {size} : il doit être reconstruit."
+            )
+        if index.dimension != dimension:
+            raise ValueError(
+                f"L'index {path} porte sur des vecteurs de dimension {index.dimension} au lieu de {dimension} : "
+                "il doit être reconstruit."
+            )
+        self.change_index(index)
+
+    def change_reducer(self, reducer: Optional[PCAReducer]):
+        """
+        Utilisation d'une projection pour réduire la dimension des données.
+
+        La base et ses segments sont projetés à nouveau depuis leurs données d'origine ; l'index éventuel, construit
+        dans l'ancien espace, est abandonné.
+
+        Parameters
+        ----------
+        reducer : Optional[PCAReducer]
+            Projection apprise sur des données de même dimension que la base, ou `None` pour ne plus réduire.
+        """
+        with self._lock:
+            self.reducer = reducer
+            if self.database is not None:
+                self._prepare({**self.database, "features": self.source})
+            for segment in self.segments:
+                segment.change_reducer(reducer)
+
+    def build_reducer(self, dimension: int, whiten: bool = False) -> PCAReducer:
+        """
+        Apprentissage d'une projection sur la base de données.
+
+        Parameters
+        ----------
+        dimension : int
+            Nombre de composantes retenues.
+        whiten : bool, default: False
+            Division de chaque composante par son écart type.
+
+        Returns
+        -------
+        PCAReducer
+            Projection apprise, utilisée pour les recherches suivantes.
+        """
+        if self.database is None:
+            raise RuntimeError("Aucune base de données n'a été fournie.")
+        reducer = PCAReducer.fit(self.source, dimension, whiten=whiten)
+        self.change_reducer(reducer)
+        return reducer
+
+    def load_reducer(self, data_path: str):
+        """
+        Chargement d'une projection enregistrée à côté de la base de données.
+
+        Parameters
+        ----------
+        data_path : str
+            Chemin de la base de données.
+        """
+        self.change_reducer(PCAReducer.load(reducer_path(data_path)))
 
     @abstractmethod
-    def _compute_distance(self, vector: ndarray) -> ndarray:
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
         """
-        Calcul de la distance entre le vecteur caractéristique et les éléments de la base de données.
+        Calcul de la distance entre les vecteurs caractéristiques et les éléments de la base de données.
 
         Parameters
         ----------
-        vector : ndarray
-            Vecteur caractéristique
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées. Par défaut, toute la base.
 
         Returns
         -------
         ndarray
-            Distance avec les éléments la base de données.
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
+        """
+
+    def _snapshot(self) -> "Finder":
+        """
+        État courant de la base, de ses segments, des images supprimées et de l'index.
+
+        Les mises à jour remplacent ces attributs au lieu de les modifier : une copie superficielle, prise sous le
+        verrou, reste cohérente pendant une recherche faite hors du verrou.
+
+        Returns
+        -------
+        Finder
+            Copie superficielle du moteur de recherche.
+        """
+        with self._lock:
+            return copy(self)
+
+    def _search(self, vectors: ndarray, depth: int, rows: Optional[ndarray] = None) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins, avec l'index s'il existe ou de manière exhaustive.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+        rows : ndarray, default: None
+            Indices des lignes de la base parmi lesquelles chercher, de manière exhaustive. Par défaut, toute la base.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins. Les places vides ont l'identifiant `-1`.
+        """
+        if self.index is not None and rows is None:
+            with profiler.timer("index", self):
+                return self.index.search(vectors, depth)
+
+        with profiler.timer("distance", self):
+            distances = self._compute_distance(vectors, rows)
+        with profiler.timer("top_k", self):
+            nearest = distance.top_k(distances, depth=depth, largest=self.largest)
+            scores = np.take_along_axis(distances, nearest, axis=1)
+            return scores, nearest if rows is None else rows[nearest]
+
+    def _ids(self, rows: ndarray) -> ndarray:
+        """
+        Conversion d'indices de lignes de la base en identifiants d'images.
+
+        Parameters
+        ----------
+        rows : ndarray
+            Indices des lignes. Les places vides ont l'indice `-1`.
+
+        Returns
+        -------
+        ndarray
+            Identifiants des images, `-1` pour les places vides.
+        """
+        rows, size, ids = np.asarray(rows, dtype=np.int64), len(self.database["colors"]), self.database.get("ids")
+        found = rows.copy() if ids is None else np.where(rows >= 0, ids[np.clip(rows, 0, max(size - 1, 0))], -1)
+        if self.appended.size:
+            # ##: Rows after the base are the images of the segments inserted into the index.
+            extra = rows >= size
+            found[extra] = self.appended[rows[extra] - size]
+        return found
+
+    def _search_live(
+        self, vectors: ndarray, depth: int, colors: Filter = None, styles: Filter = None
+    ) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche dans la base et dans ses segments, sans les images supprimées.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+        colors : Filter, default: None
+            Couleurs acceptées.
+        styles : Filter, default: None
+            Styles acceptés.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins. Les places vides ont l'identifiant `-1`.
+        """
+        # ##: Ask for more neighbours, some of them may have been removed.
+        scores, ids, wanted = [], [], depth + self.removed.size
+        for part in (self, *self.segments):
+            # ##: Segments inserted into the index are found through it, unless filters make the search exhaustive.
+            if colors is None and styles is None and part in self.indexed:
+                continue
+            # ##: Segments are finders of the same class, searched through the same protected helpers.
+            rows = part._matching(colors, styles)  # pylint: disable=protected-access
+            part_scores, rows = part._search(vectors, wanted, rows)  # pylint: disable=protected-access
+            part_ids = part._ids(rows)  # pylint: disable=protected-access
+            if self.removed.size:
+                part_ids[np.isin(part_ids, self.removed)] = -1
+            scores.append(part_scores)
+            ids.append(part_ids)
+        return distance.merge(scores, ids, depth, self.largest)
+
+    def _labels(self, ids: Sequence[int]) -> Tuple[List[str], List[str]]:
+        """
+        Couleurs et styles d'images de la base ou de ses segments.
+
+        Parameters
+        ----------
+        ids : Sequence[int]
+            Identifiants des images.
+
+        Returns
+        -------
+        Tuple[List[str], List[str]]
+            Couleurs et styles des images.
+        """
+        if not self.segments and "ids" not in self.database:
+            return self.database["colors"][ids].tolist(), self.database["styles"][ids].tolist()
+
+        ids = np.asarray(ids, dtype=np.int64)
+        colors, styles = np.empty(ids.size, dtype=object), np.empty(ids.size, dtype=object)
+        for part in (self, *self.segments):
+            part_ids = part.database.get("ids")
+            if part_ids is None:
+                rows, inside = ids, ids < part.database["features"].shape[0]
+            else:
+                rows = np.minimum(np.searchsorted(part_ids, ids), max(part_ids.size - 1, 0))
+                inside = part_ids[rows] == ids if part_ids.size else np.zeros(ids.size, dtype=bool)
+            colors[inside] = part.database["colors"][rows[inside]]
+            styles[inside] = part.database["styles"][rows[inside]]
+        return colors.tolist(), styles.tolist()
+
+    def _format(self, wanted: Any, nearest_ids: List[int], distances: List[float]) -> Dict[str, Any]:
+        """
+        Mise en forme du résultat d'une recherche.
+
+        Parameters
+        ----------
+        wanted : Any
+            Image recherchée.
+        nearest_ids : List[int]
+            Indices des éléments trouvés dans la base.
+        distances : List[float]
+            Distances des éléments trouvés.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Dictionnaire des informations trouvées dans la base.
+        """
+        color, style = self._labels(nearest_ids)
+        predicts = list(map("_".join, zip(color, style)))
+        return {"input": wanted, "colors": color, "styles": style, "returns": predicts, "distance": distances}
+
+    def _features(self, wanted: Union[Sequence[str], ndarray]) -> Tuple[List[Any], List[int], Optional[ndarray]]:
+        """
+        Données caractéristiques d'un lot d'images.
+
+        Parameters
+        ----------
+        wanted : Union[Sequence[str], ndarray]
+            Chemins des images, ou matrice de vecteurs caractéristiques déjà extraits.
+
+        Returns
+        -------
+        Tuple[List[Any], List[int], Optional[ndarray]]
+            Entrées, indices des entrées dont l'extraction a abouti et matrice de leurs vecteurs caractéristiques.
+            Pour une matrice de vecteurs, les entrées sont les indices des lignes.
         """
+        if isinstance(wanted, ndarray):
+            wanted = np.atleast_2d(wanted)
+            return list(range(wanted.shape[0])), list(range(wanted.shape[0])), wanted
+
+        inputs = list(wanted)
+        features = list(map(lambda path: self.extractor.extract(image_path=path), inputs))
+        valid = [index for index, feature in enumerate(features) if feature is not None]
+        return inputs, valid, np.stack([features[index] for index in valid]) if valid else None
 
     @timeit
-    def search(self, wanted: str, depth: int = 1) -> Dict[str, List[str]]:
+    def search(
+        self, wanted: str, depth: int = 1, colors: Filter = None, styles: Filter = None
+    ) -> Dict[str, List[str]]:
         """
         Recherche des images similaires dans la base de données.
 
@@ -100,54 +572,241 @@ class Finder(ABC):
             Image à rechercher.
         depth : int, default: 1
             Le nombre d'images à retourner.
+        colors : Filter, default: None
+            Couleur ou liste de couleurs acceptées. Par défaut, toutes les couleurs.
+        styles : Filter, default: None
+            Style ou liste de styles acceptés. Par défaut, tous les styles.
 
         Returns
         -------
         Dict[str, List[str]]
             Dictionnaire des informations trouvées dans la base.
         """
+        return self.search_batch(wanted=[wanted], depth=depth, colors=colors, styles=styles)[0]
+
+    @profiled("search")
+    def search_batch(
+        self, wanted: Union[Sequence[str], ndarray], depth: int = 1, colors: Filter = None, styles: Filter = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche des images similaires pour un lot de requêtes.
+
+        Sans index, les distances entre toutes les requêtes et la base sont calculées en une seule passe. Avec des
+        filtres, seules les lignes qui les respectent sont comparées et tous les résultats les respectent. La
+        recherche porte sur l'état de la base au début de l'appel, sans bloquer les autres recherches.
+
+        Parameters
+        ----------
+        wanted : Union[Sequence[str], ndarray]
+            Chemins des images à rechercher, ou matrice de vecteurs caractéristiques déjà extraits.
+        depth : int, default: 1
+            Le nombre d'images à retourner par requête.
+        colors : Filter, default: None
+            Couleur ou liste de couleurs acceptées, pour toutes les requêtes. Par défaut, toutes les couleurs.
+        styles : Filter, default: None
+            Style ou liste de styles acceptés, pour toutes les requêtes. Par défaut, tous les styles.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Un dictionnaire par requête, avec les mêmes clés que `search`. Pour une matrice de vecteurs,
+            la clé `input` contient l'indice de la ligne.
+        """
         if self.database is None:
             raise RuntimeError("Aucune base de données n'a été fournie.")
+        start_time = time.perf_counter()
 
-        # ##: Distance between wanted and database.
-        vector = self.extractor.extract(image_path=wanted)
-        if vector is not None:
-            distances = self._compute_distance(vector).flatten()
-            nearest_ids = np.argsort(distances)[:depth].tolist()
+        # ##: Feature vectors of the queries.
+        inputs, valid, features = self._features(wanted)
+        vectors = self._as_matrix(features) if valid else None
+
+        # ##: Distance between queries and database in one block.
+        outputs = [self._format(item, [], []) for item in inputs]
+        if valid:
+            # ##: Only the snapshot is taken under the lock, concurrent searches run in parallel.
+            state = self._snapshot()
+            # pylint: disable=protected-access
+            if state.segments or state.removed.size:
+                scores, nearest = state._search_live(vectors, depth, colors, styles)
+            else:
+                scores, nearest = state._search(vectors, depth, state._matching(colors, styles))
+                nearest = state._ids(nearest)
+            with profiler.timer("labels", self):
+                for row, index in enumerate(valid):
+                    found = nearest[row] >= 0
+                    outputs[index] = state._format(
+                        inputs[index], nearest[row, found].tolist(), scores[row, found].tolist()
+                    )
+            # pylint: enable=protected-access
+        profiler.count("queries", self, value=len(inputs))
+
+        # ##: Amortized duration per query.
+        duration = (time.perf_counter() - start_time) / max(len(inputs), 1)
+        for output in outputs:
+            output["duration"] = duration
+        return outputs
+
+    def add(self, wanted: Union[Sequence[str], ndarray], colors: Sequence[str], styles: Sequence[str]) -> ndarray:
+        """
+        Ajout d'images à la base de données, dans un nouveau segment.
 
-            # ##: Generate output.
-            color = self.database["colors"][nearest_ids].tolist()
-            style = self.database["styles"][nearest_ids].tolist()
-            distance = distances[nearest_ids].tolist()
-        else:
-            distance, color, style = [], [], []
+        Le segment est enregistré à côté de la base si celle-ci a été chargée depuis un fichier. Si l'index utilisé
+        supporte les insertions, comme `HNSWIndex`, les images y sont aussi insérées : les recherches sans filtre les
+        trouvent par l'index plutôt qu'en parcourant le segment. L'index enrichi n'est pas enregistré et est abandonné
+        lors d'une fusion, comme l'index de la base.
 
-        predicts = list(map(lambda item: "_".join(item), zip(color, style)))
+        Parameters
+        ----------
+        wanted : Union[Sequence[str], ndarray]
+            Chemins des images à ajouter, ou matrice de leurs vecteurs caractéristiques.
+        colors : Sequence[str]
+            Couleurs des images.
+        styles : Sequence[str]
+            Styles des images.
 
-        output = {"input": wanted, "colors": color, "styles": style, "returns": predicts, "distance": distance}
-        return output
+        Returns
+        -------
+        ndarray
+            Identifiants attribués aux images, `-1` pour celles dont l'extraction n'a rien donné.
+        """
+        if self.database is None:
+            raise RuntimeError("Aucune base de données n'a été fournie.")
+        inputs, valid, features = self._features(wanted)
+        ids = np.full(len(inputs), -1, dtype=np.int64)
+        if not valid:
+            return ids
+
+        with self._lock:
+            ids[valid] = np.arange(self.next_id, self.next_id + len(valid))
+            segment = {
+                "features": features,
+                "colors": np.asarray(colors, dtype=str)[valid],
+                "styles": np.asarray(styles, dtype=str)[valid],
+                "ids": ids[valid],
+            }
+            if self.data_path is not None:
+                save_segment(self.data_path, **segment)
+            part = type(self)(self.extractor, segment, reducer=self.reducer)
+            self.segments = [*self.segments, part]
+            self.next_id += len(valid)
+            if self.index is not None and hasattr(self.index, "add"):
+                # ##: Indexes supporting insertion receive the new images, in the same space as the base. The
+                # ##: insertion is done on a copy, the searches in progress keep the previous index.
+                index = deepcopy(self.index)
+                index.add(part.database["features"])
+                self.index, self.indexed = index, [*self.indexed, part]
+                self.appended = np.concatenate([self.appended, ids[valid]])
+        return ids
+
+    def remove(self, ids: Sequence[int]):
+        """
+        Suppression d'images de la base de données. Les images sont ignorées par la recherche jusqu'à la fusion.
+
+        Parameters
+        ----------
+        ids : Sequence[int]
+            Identifiants des images à supprimer.
+        """
+        with self._lock:
+            self.removed = np.union1d(self.removed, np.asarray(ids, dtype=np.int64))
+            if self.data_path is not None:
+                save_tombstones(self.data_path, self.removed)
+
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Fusion des segments dans la base de données et retrait des images supprimées.
+
+        La nouvelle base est construite sans bloquer les recherches, puis remplace l'ancienne. Les images ajoutées
+        ou supprimées pendant la fusion sont conservées pour la fusion suivante.
+
+        Parameters
+        ----------
+        background : bool, default: False
+            Fusion dans un fil d'exécution séparé.
+
+        Returns
+        -------
+        Optional[threading.Thread]
+            Fil d'exécution de la fusion en arrière-plan.
+        """
+        if background:
+            thread = threading.Thread(target=self.compact, daemon=True)
+            thread.start()
+            return thread
+
+        with self._compaction:
+            with self._lock:
+                parts, removed = [self, *self.segments], self.removed
+                databases = [{**part.database, "features": part.source} for part in parts]
+                # ##: Segments are finders of the same class, whose identifiers are read through `_ids`.
+                # pylint: disable=protected-access
+                ids = np.concatenate([part._ids(np.arange(part.database["features"].shape[0])) for part in parts])
+                # pylint: enable=protected-access
+
+            # ##: Build the merged database outside of the lock.
+            kept = ~np.isin(ids, removed)
+            merged = {
+                "features": np.concatenate([database["features"] for database in databases])[kept],
+                "colors": np.concatenate([database["colors"] for database in databases])[kept],
+                "styles": np.concatenate([database["styles"] for database in databases])[kept],
+                "ids": ids[kept],
+            }
+            if self.data_path is not None:
+                save_database(self.data_path, **merged)
+                # ##: Saved indexes refer to the rows of the previous database.
+                remove_indexes(self.data_path, distance.largests)
+                remove_segments(self.data_path, [int(part.database["ids"][0]) for part in parts[1:]])
+                merged = load_database(self.data_path)
+
+            with self._lock:
+                self._prepare(merged)
+                self.segments = [segment for segment in self.segments if segment not in parts]
+                self.removed = np.setdiff1d(self.removed, removed)
+                if self.data_path is not None:
+                    save_tombstones(self.data_path, self.removed)
+        return None
 
 
 class CosinusFinder(Finder):
     """
     Recherche d'images similaire à partir de la distance de Cosinus.
+
+    Les scores retournés sont des similarités : les résultats sont triés par ordre décroissant.
     """
 
-    def _compute_distance(self, vector: ndarray) -> ndarray:
+    metric, largest = "cosine", True
+
+    def _cache(self, features: Optional[ndarray]):
+        """
+        Pré-calcul des lignes normalisées de la base.
+
+        Parameters
+        ----------
+        features : Optional[ndarray]
+            Matrice des données caractéristiques de la base, ou `None` pour libérer les lignes normalisées.
+        """
+        self.normalized = None if features is None else distance.normalize(features)
+
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
         """
-        Calcul de la distance entre le vecteur caractéristique et les éléments de la base de données.
+        Calcul de la distance entre les vecteurs caractéristiques et les éléments de la base de données.
 
         Parameters
         ----------
-        vector : ndarray
-            Vecteur caractéristique
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées. Par défaut, toute la base.
 
         Returns
         -------
         ndarray
-            Distance avec les éléments la base de données.
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
         """
-        return cosine_similarity(self.database["features"], vector.reshape(1, -1))
+        if self.normalized is None:
+            features = self.database["features"]
+            return distance.cosine(vectors, distance.normalize(features if rows is None else features[rows]))
+        return distance.cosine(vectors, self.normalized if rows is None else self.normalized[rows])
 
 
 class ManhattanFinder(Finder):
@@ -155,21 +814,26 @@ class ManhattanFinder(Finder):
     Recherche d'images similaire à partir de la distance de Manhattan.
     """
 
-    def _compute_distance(self, vector: ndarray) -> ndarray:
+    metric = "manhattan"
+
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
         """
-        Calcul de la distance entre le vecteur caractéristique et les éléments de la base de données.
+        Calcul de la distance entre les vecteurs caractéristiques et les éléments de la base de données.
 
         Parameters
         ----------
-        vector : ndarray
-            Vecteur caractéristique
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées. Par défaut, toute la base.
 
         Returns
         -------
         ndarray
-            Distance avec les éléments la base de données.
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
         """
-        return manhattan_distances(self.database["features"], vector.reshape(1, -1))
+        features = self.database["features"]
+        return distance.manhattan(vectors, features if rows is None else features[rows])
 
 
 class EuclideanFinder(Finder):
@@ -177,18 +841,101 @@ class EuclideanFinder(Finder):
     Recherche d'images similaire à partir de la distance Euclidienne.
     """
 
-    def _compute_distance(self, vector: ndarray) -> ndarray:
+    metric = "euclidean"
+
+    def _cache(self, features: Optional[ndarray]):
+        """
+        Pré-calcul du carré des normes de la base.
+
+        Parameters
+        ----------
+        features : Optional[ndarray]
+            Matrice des données caractéristiques de la base, ou `None` pour libérer les normes.
+        """
+        self.squared_norms = None if features is None else distance.squared_norms(features)
+
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
+        """
+        Calcul de la distance entre les vecteurs caractéristiques et les éléments de la base de données.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées. Par défaut, toute la base.
+
+        Returns
+        -------
+        ndarray
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
+        """
+        features, norms = self.database["features"], self.squared_norms
+        if rows is not None:
+            features, norms = features[rows], None if norms is None else norms[rows]
+        return distance.euclidean(vectors, features, distance.squared_norms(features) if norms is None else norms)
+
+
+class HammingFinder(Finder):
+    """
+    Recherche d'images similaire à partir de la distance de Hamming entre descripteurs binaires compactés.
+
+    Les descripteurs restent sous forme de bits compactés, regroupés en mots de 64 bits pour le calcul des
+    distances par OU exclusif et comptage des bits.
+    """
+
+    metric = "hamming"
+
+    def _as_matrix(self, features: ndarray) -> ndarray:
+        """
+        Conversion des descripteurs binaires compactés en mots de 64 bits.
+
+        Parameters
+        ----------
+        features : ndarray
+            Descripteurs binaires compactés en octets `uint8`.
+
+        Returns
+        -------
+        ndarray
+            Matrice contiguë de `uint64`.
+        """
+        if features.dtype != np.uint8:
+            raise ValueError("La distance de Hamming nécessite des descripteurs binaires compactés en `uint8`.")
+        return distance.as_packed(features)
+
+    def change_reducer(self, reducer: Optional[PCAReducer]):
+        """
+        Les descripteurs binaires sont comparés bit à bit et ne peuvent pas être projetés.
+
+        Parameters
+        ----------
+        reducer : Optional[PCAReducer]
+            Seule la valeur `None`, sans projection, est acceptée.
+
+        Raises
+        ------
+        TypeError
+            Si une projection est fournie.
+        """
+        if reducer is not None:
+            raise TypeError("Les descripteurs binaires ne peuvent pas être projetés.")
+
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
         """
-        Calcul de la distance entre le vecteur caractéristique et les éléments de la base de données.
+        Calcul de la distance entre les vecteurs caractéristiques et les éléments de la base de données.
 
         Parameters
         ----------
-        vector : ndarray
-            Vecteur caractéristique
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, mots)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées. Par défaut, toute la base.
 
         Returns
         -------
         ndarray
-            Distance avec les éléments la base de données.
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
         """
-        return euclidean_distances(self.database["features"], vector.reshape(1, -1))
+        features = self.database["features"]
+        return distance.hamming(vectors, features if rows is None else features[rows])
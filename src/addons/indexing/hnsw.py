@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Index par graphe hiérarchique navigable (HNSW) pour la recherche rapide des plus proches voisins.
+"""
+from heapq import heapify, heappop, heappush
+from math import log
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+from src.addons.distance import as_matrix, manhattan, normalize
+
+Neighbors = List[Tuple[float, int]]
+
+
+class HNSWIndex:
+    """
+    Index par graphe hiérarchique navigable (Hierarchical Navigable Small World).
+
+    Chaque vecteur est inséré dans les niveaux `0` à `l` d'une hiérarchie de graphes, où `l` est tiré selon une loi
+    géométrique. Une recherche descend gloutonnement les niveaux supérieurs, puis explore le niveau `0` avec une
+    file de `ef_search` candidats. L'index conserve sa propre copie des vecteurs, ce qui permet les insertions
+    incrémentales.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées : `cosine`, `euclidean` et `manhattan`.
+    metric : str
+        Nom de la métrique : `cosine`, `euclidean` ou `manhattan`.
+    M : int, default: 16
+        Nombre de voisins par nœud dans les niveaux supérieurs, le double au niveau `0`.
+    ef_construction : int, default: 200
+        Taille de la file des candidats lors de l'insertion.
+    ef_search : int, default: 64
+        Taille de la file des candidats lors de la recherche.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des données caractéristiques de la base.
+    add(features: ndarray)
+        Insertion incrémentale de nouveaux vecteurs.
+    search(queries: ndarray, depth: int)
+        Recherche des plus proches voisins des requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics = ("cosine", "euclidean", "manhattan")
+
+    # pylint: disable=invalid-name
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: int = 1331,
+    ):
+        if metric not in self.metrics:
+            raise ValueError(f"Métrique inconnue : {metric}.")
+        self.metric, self.M, self.ef_construction, self.ef_search = metric, max(M, 2), ef_construction, ef_search
+        self.generator = np.random.default_rng(seed)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.size, self.entry = 0, None
+        self.levels: List[int] = []
+        self.graph: List[Dict[int, List[int]]] = []
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension des vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de colonnes de la base indexée.
+        """
+        return self.vectors.shape[1]
+
+    def _distances(self, query: ndarray, ids: Sequence[int]) -> ndarray:
+        """
+        Calcul des distances entre un vecteur et des nœuds du graphe. Plus la distance est petite, plus les
+        vecteurs sont proches.
+
+        Parameters
+        ----------
+        query : ndarray
+            Vecteur, de taille `(dimension,)`.
+        ids : Sequence[int]
+            Identifiants des nœuds.
+
+        Returns
+        -------
+        ndarray
+            Carré de la distance euclidienne, distance de Manhattan ou `1 - similarité` cosinus.
+        """
+        vectors = self.vectors[ids]
+        if self.metric == "cosine":
+            return 1 - vectors @ query
+        differences = vectors - query
+        if self.metric == "manhattan":
+            return np.abs(differences).sum(axis=1)
+        return np.einsum("ij,ij->i", differences, differences)
+
+    def _scores(self, distances: ndarray) -> ndarray:
+        """
+        Conversion des distances internes en scores de la métrique.
+
+        Parameters
+        ----------
+        distances : ndarray
+            Distances internes.
+
+        Returns
+        -------
+        ndarray
+            Distances euclidiennes, distances de Manhattan ou similarités cosinus.
+        """
+        if self.metric == "cosine":
+            return 1 - distances
+        if self.metric == "euclidean":
+            return np.sqrt(np.maximum(distances, 0))
+        return distances
+
+    def _greedy(self, query: ndarray, entry: int, distance: float, level: int) -> Tuple[int, float]:
+        """
+        Descente gloutonne vers le nœud le plus proche d'un niveau.
+
+        Parameters
+        ----------
+        query : ndarray
+            Vecteur recherché.
+        entry : int
+            Nœud de départ.
+        distance : float
+            Distance entre le vecteur et le nœud de départ.
+        level : int
+            Niveau parcouru.
+
+        Returns
+        -------
+        Tuple[int, float]
+            Nœud le plus proche trouvé et sa distance.
+        """
+        while True:
+            neighbors = self.graph[level][entry]
+            if not neighbors:
+                return entry, distance
+            distances = self._distances(query, neighbors)
+            best = int(np.argmin(distances))
+            if distances[best] >= distance:
+                return entry, distance
+            entry, distance = neighbors[best], float(distances[best])
+
+    def _search_layer(self, query: ndarray, entries: Neighbors, ef: int, level: int) -> Neighbors:
+        """
+        Exploration d'un niveau avec une file de `ef` candidats.
+
+        Parameters
+        ----------
+        query : ndarray
+            Vecteur recherché.
+        entries : Neighbors
+            Points d'entrée, sous la forme `(distance, nœud)`.
+        ef : int
+            Taille de la file des candidats.
+        level : int
+            Niveau parcouru.
+
+        Returns
+        -------
+        Neighbors
+            Au plus `ef` voisins, triés par distance croissante.
+        """
+        visited = {node for _, node in entries}
+        candidates = list(entries)
+        heapify(candidates)
+        results = [(-distance, node) for distance, node in entries]
+        heapify(results)
+
+        while candidates:
+            distance, node = heappop(candidates)
+            if distance > -results[0][0] and len(results) >= ef:
+                break
+            neighbors = [neighbor for neighbor in self.graph[level][node] if neighbor not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+
+            bound = -results[0][0]
+            for neighbor_distance, neighbor in zip(self._distances(query, neighbors).tolist(), neighbors):
+                if len(results) < ef or neighbor_distance < bound:
+                    heappush(candidates, (neighbor_distance, neighbor))
+                    heappush(results, (-neighbor_distance, neighbor))
+                    if len(results) > ef:
+                        heappop(results)
+                    bound = -results[0][0]
+        return sorted((-distance, node) for distance, node in results)
+
+    def _select(self, candidates: Neighbors, count: int) -> List[int]:
+        """
+        Sélection heuristique des voisins : un candidat est retenu s'il est plus proche du nœud que des voisins
+        déjà retenus, afin de conserver des liens dans plusieurs directions.
+
+        Parameters
+        ----------
+        candidates : Neighbors
+            Candidats triés par distance croissante.
+        count : int
+            Nombre maximal de voisins.
+
+        Returns
+        -------
+        List[int]
+            Voisins retenus.
+        """
+        if len(candidates) <= count:
+            return [node for _, node in candidates]
+
+        # ##: Distances between all candidates, computed once.
+        vectors = self.vectors[[node for _, node in candidates]]
+        if self.metric == "cosine":
+            between = 1 - vectors @ vectors.T
+        elif self.metric == "manhattan":
+            between = manhattan(vectors, vectors)
+        else:
+            norms = np.einsum("ij,ij->i", vectors, vectors)
+            between = norms[:, None] + norms[None, :] - 2 * (vectors @ vectors.T)
+
+        selected, pruned = [], []
+        for row, (distance, _) in enumerate(candidates):
+            if len(selected) >= count:
+                break
+            if selected and (between[row, selected] < distance).any():
+                pruned.append(row)
+            else:
+                selected.append(row)
+        return [candidates[row][1] for row in selected + pruned[: count - len(selected)]]
+
+    def _insert(self, node: int):
+        """
+        Insertion d'un nœud déjà stocké dans le graphe.
+
+        Parameters
+        ----------
+        node : int
+            Identifiant du nœud.
+        """
+        query = self.vectors[node]
+        level = int(-log(1.0 - self.generator.random()) / log(self.M))
+        self.levels.append(level)
+        while len(self.graph) <= level:
+            self.graph.append({})
+        for layer in range(level + 1):
+            self.graph[layer][node] = []
+
+        if self.entry is None:
+            self.entry = node
+            return
+
+        # ##: Greedy descent through the levels above the node.
+        entry, top = self.entry, self.levels[self.entry]
+        distance = float(self._distances(query, [entry])[0])
+        for layer in range(top, level, -1):
+            entry, distance = self._greedy(query, entry, distance, layer)
+
+        # ##: Link the node in every level it belongs to.
+        entries = [(distance, entry)]
+        for layer in range(min(top, level), -1, -1):
+            found = self._search_layer(query, entries, self.ef_construction, layer)
+            self.graph[layer][node] = self._select(found, self.M)
+            limit = 2 * self.M if layer == 0 else self.M
+            for neighbor in self.graph[layer][node]:
+                links = self.graph[layer][neighbor]
+                links.append(node)
+                if len(links) > limit:
+                    distances = self._distances(self.vectors[neighbor], links)
+                    order = np.argsort(distances).tolist()
+                    self.graph[layer][neighbor] = self._select([(distances[i], links[i]) for i in order], limit)
+            entries = found
+
+        if level > top:
+            self.entry = node
+
+    def add(self, features: ndarray) -> ndarray:
+        """
+        Insertion incrémentale de nouveaux vecteurs.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des nouveaux vecteurs.
+
+        Returns
+        -------
+        ndarray
+            Identifiants attribués aux nouveaux vecteurs, à la suite des précédents.
+        """
+        features = normalize(features) if self.metric == "cosine" else as_matrix(features)
+        count = features.shape[0]
+        if self.size + count > self.vectors.shape[0]:
+            vectors = np.empty((max(2 * self.vectors.shape[0], self.size + count), features.shape[1]), np.float32)
+            vectors[: self.size] = self.vectors[: self.size]
+            self.vectors = vectors
+        self.vectors[self.size : self.size + count] = features
+
+        ids = np.arange(self.size, self.size + count)
+        for node in ids.tolist():
+            self.size += 1
+            self._insert(node)
+        return ids
+
+    def build(self, features: ndarray):
+        """
+        Construction de l'index à partir des données caractéristiques de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques de la base.
+        """
+        self.vectors = np.empty((0, features.shape[1]), dtype=np.float32)
+        self.size, self.entry, self.levels, self.graph = 0, None, [], []
+        self.add(features)
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins des requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins, de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant
+            `-1`.
+        """
+        queries = normalize(queries) if self.metric == "cosine" else as_matrix(queries)
+        scores = np.full((queries.shape[0], depth), -np.inf if self.metric == "cosine" else np.inf, np.float32)
+        ids = np.full((queries.shape[0], depth), -1, dtype=np.int64)
+        if self.entry is None:
+            return scores, ids
+
+        for row, query in enumerate(queries):
+            entry = self.entry
+            distance = float(self._distances(query, [entry])[0])
+            for layer in range(self.levels[entry], 0, -1):
+                entry, distance = self._greedy(query, entry, distance, layer)
+            found = self._search_layer(query, [(distance, entry)], max(self.ef_search, depth), 0)[:depth]
+            scores[row, : len(found)] = self._scores(np.array([item[0] for item in found]))
+            ids[row, : len(found)] = [item[1] for item in found]
+        return scores, ids
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index, vecteurs compris.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        arrays = {}
+        for layer, links in enumerate(self.graph):
+            nodes = sorted(links)
+            arrays[f"nodes_{layer}"] = np.array(nodes, dtype=np.int64)
+            arrays[f"offsets_{layer}"] = np.cumsum([0] + [len(links[node]) for node in nodes]).astype(np.int64)
+            arrays[f"neighbors_{layer}"] = np.array([item for node in nodes for item in links[node]], np.int64)
+        np.savez(
+            path,
+            metric=np.array(self.metric),
+            parameters=np.array(
+                [self.M, self.ef_construction, self.ef_search, -1 if self.entry is None else self.entry]
+            ),
+            vectors=self.vectors[: self.size],
+            levels=np.array(self.levels, dtype=np.int64),
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path: str, features: Optional[ndarray] = None) -> "HNSWIndex":  # pylint: disable=unused-argument
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        features : ndarray, default: None
+            Non utilisé : les vecteurs sont enregistrés avec l'index.
+
+        Returns
+        -------
+        HNSWIndex
+            Index prêt pour la recherche et les insertions.
+        """
+        with np.load(path) as data:
+            M, ef_construction, ef_search, entry = data["parameters"].tolist()
+            index = cls(metric=str(data["metric"]), M=M, ef_construction=ef_construction, ef_search=ef_search)
+            index.vectors, index.levels = data["vectors"], data["levels"].tolist()
+            index.size, index.entry = index.vectors.shape[0], None if entry < 0 else entry
+            for layer in range(max(index.levels, default=-1) + 1):
+                nodes, offsets = data[f"nodes_{layer}"].tolist(), data[f"offsets_{layer}"]
+                neighbors = data[f"neighbors_{layer}"].tolist()
+                index.graph.append({node: neighbors[offsets[i] : offsets[i + 1]] for i, node in enumerate(nodes)})
+        return index
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Classe générique pour les index de recherche des plus proches voisins.
+"""
+import os
+from contextlib import suppress
+from os.path import splitext
+from typing import Iterable, Protocol, Tuple
+
+from numpy import ndarray
+
+from src.addons.registry import LazyRegistry
+
+
+class Index(Protocol):
+    """
+    Class générique pour les index de recherche des plus proches voisins.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées par le type d'index.
+    metric : str
+        Nom de la métrique : `cosine`, `euclidean` ou `manhattan`.
+    size : int
+        Nombre de vecteurs indexés.
+    dimension : int
+        Dimension des vecteurs indexés.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des données caractéristiques de la base.
+    search(queries: ndarray, depth: int)
+        Recherche des plus proches voisins des requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics: Tuple[str, ...]
+    metric: str
+    size: int
+    dimension: int
+
+    def build(self, features: ndarray):
+        """
+        Construction de l'index à partir des données caractéristiques de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques de la base.
+        """
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins des requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins, de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant
+            `-1`.
+        """
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier.
+        """
+
+    @classmethod
+    def load(cls, path: str, features: ndarray) -> "Index":
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier.
+        features : ndarray
+            Matrice des données caractéristiques de la base indexée.
+
+        Returns
+        -------
+        Index
+            Index prêt pour la recherche.
+        """
+
+
+def index_path(data_path: str, name: str, metric: str) -> str:
+    """
+    Chemin d'un index enregistré à côté de sa base de données.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la base de données, `{method}_db.parquet`.
+    name : str
+        Nom du type d'index.
+    metric : str
+        Nom de la métrique.
+
+    Returns
+    -------
+    str
+        Chemin de l'index, `{method}_db_{name}_{metric}.npz`.
+    """
+    return f"{splitext(data_path)[0]}_{name}_{metric}.npz"
+
+
+def remove_indexes(data_path: str, metrics: Iterable[str]):
+    """
+    Suppression des index enregistrés à côté d'une base de données, devenus invalides après sa réécriture.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la base de données.
+    metrics : Iterable[str]
+        Métriques des index à supprimer.
+    """
+    for metric in metrics:
+        for name in indexes:
+            with suppress(FileNotFoundError):
+                os.remove(index_path(data_path, name=name, metric=metric))
+
+
+indexes = LazyRegistry(
+    {
+        "ivf": "src.addons.indexing.ivf:IVFIndex",
+        "pq": "src.addons.indexing.pq:PQIndex",
+        "sq": "src.addons.indexing.sq:SQIndex",
+        "hnsw": "src.addons.indexing.hnsw:HNSWIndex",
+        "inverted": "src.addons.indexing.inverted:InvertedIndex",
+    }
+)
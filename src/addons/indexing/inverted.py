@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Index inversé pour la recherche dans des vecteurs creux de mots visuels pondérés par TF-IDF.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+from src.addons.distance import normalize, select
+
+
+class InvertedIndex:
+    """
+    Index inversé sur des vecteurs creux de mots visuels.
+
+    Chaque image est représentée par son vecteur TF-IDF, pondéré par `VisualVocabulary.weight`, stocké normalisé
+    sous forme de listes inversées : pour chaque mot, les identifiants des images qui le contiennent et leurs poids.
+    Seules les images partageant au moins un mot avec la requête sont évaluées, si bien que le coût d'une recherche
+    dépend du nombre d'entrées parcourues et non de la taille de la base. Le score est la similarité cosinus, la même
+    que celle de la recherche exhaustive de `CosinusFinder`.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées : `cosine`.
+    metric : str
+        Nom de la métrique : `cosine`.
+    size : int
+        Nombre d'images indexées.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des vecteurs de la base.
+    search(queries: ndarray, depth: int)
+        Recherche des images les plus similaires aux requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics = ("cosine",)
+
+    def __init__(self, metric: str = "cosine"):
+        if metric not in self.metrics:
+            raise ValueError(f"L'index inversé ne supporte pas la métrique {metric}.")
+        self.metric = metric
+        self.offsets: Optional[ndarray] = None
+        self.ids: Optional[ndarray] = None
+        self.weights: Optional[ndarray] = None
+        self.size = 0
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension des vecteurs indexés, soit la taille du vocabulaire.
+
+        Returns
+        -------
+        int
+            Nombre de mots du vocabulaire.
+        """
+        return 0 if self.offsets is None else self.offsets.shape[0] - 1
+
+    def build(self, features: ndarray, chunk_size: int = 65536):
+        """
+        Construction de l'index à partir des vecteurs de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Vecteurs TF-IDF des mots visuels, de taille `(n_base, mots)`.
+        chunk_size : int, default: 65536
+            Nombre d'images traitées à la fois.
+        """
+        size, words = features.shape
+        self.size = size
+
+        # ##: Postings of every chunk, then grouped by word.
+        rows, columns, values = [], [], []
+        for start in range(0, size, chunk_size):
+            weights = normalize(features[start : start + chunk_size])
+            row, column = np.nonzero(weights)
+            rows.append(row + start)
+            columns.append(column)
+            values.append(weights[row, column])
+        rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+
+        order = np.argsort(columns, kind="stable")
+        self.ids, self.weights = rows[order].astype(np.int64), values[order].astype(np.float32)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(columns, minlength=words))]).astype(np.int64)
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des images les plus similaires aux requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Vecteurs TF-IDF des requêtes, de taille `(n_requêtes, mots)`.
+        depth : int
+            Nombre d'images à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Similarités et identifiants des images, de taille `(n_requêtes, depth)`. Les places vides ont
+            l'identifiant `-1`.
+        """
+        if self.ids is None:
+            raise RuntimeError("L'index n'a pas été construit.")
+
+        queries = normalize(np.atleast_2d(queries))
+        scores = np.empty((queries.shape[0], depth), dtype=np.float32)
+        ids = np.empty((queries.shape[0], depth), dtype=np.int64)
+        for row, query in enumerate(queries):
+            words = np.flatnonzero(query)
+            postings = [slice(self.offsets[word], self.offsets[word + 1]) for word in words]
+            if postings:
+                matches = np.concatenate([self.ids[posting] for posting in postings])
+                contributions = np.concatenate(
+                    [self.weights[posting] * query[word] for posting, word in zip(postings, words)]
+                )
+            else:
+                matches, contributions = np.empty(0, np.int64), np.empty(0, np.float32)
+
+            # ##: Accumulate the scores of the matched images only.
+            candidates, inverse = np.unique(matches, return_inverse=True)
+            values = np.bincount(inverse, weights=contributions, minlength=candidates.size)
+            scores[row], ids[row] = select(values, candidates, depth, largest=True)
+        return scores, ids
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        np.savez(
+            path,
+            metric=np.array(self.metric),
+            size=np.array(self.size),
+            offsets=self.offsets,
+            ids=self.ids,
+            weights=self.weights,
+        )
+
+    @classmethod
+    def load(cls, path: str, features: Optional[ndarray] = None) -> "InvertedIndex":  # pylint: disable=unused-argument
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        features : ndarray, default: None
+            Non utilisé : les listes inversées suffisent à la recherche.
+
+        Returns
+        -------
+        InvertedIndex
+            Index prêt pour la recherche.
+        """
+        with np.load(path) as data:
+            index = cls(metric=str(data["metric"]))
+            index.offsets, index.ids, index.weights = data["offsets"], data["ids"], data["weights"]
+            index.size = int(data["size"])
+        return index
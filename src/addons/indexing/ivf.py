@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Index à listes inversées (IVF) pour la recherche approximative des plus proches voisins.
+"""
+from math import sqrt
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy import ndarray
+from sklearn.cluster import MiniBatchKMeans
+
+from src.addons.distance import (
+    as_matrix,
+    euclidean,
+    largests,
+    normalize,
+    pairwise,
+    select,
+    squared_norms,
+    top_k,
+)
+
+
+class IVFIndex:
+    """
+    Index à listes inversées.
+
+    Les vecteurs de la base sont répartis entre `nlist` centroïdes obtenus par k-means. Une requête n'est comparée
+    qu'aux vecteurs des `nprobe` listes dont les centroïdes sont les plus proches.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées : `cosine`, `euclidean` et `manhattan`.
+    metric : str
+        Nom de la métrique : `cosine`, `euclidean` ou `manhattan`.
+    nlist : int, default: None
+        Nombre de listes inversées. Par défaut, la racine carrée de la taille de la base.
+    nprobe : int, default: 8
+        Nombre de listes parcourues par requête.
+    sample_size : int, default: 100000
+        Nombre maximal de vecteurs utilisés pour l'apprentissage des centroïdes.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des données caractéristiques de la base.
+    search(queries: ndarray, depth: int)
+        Recherche des plus proches voisins des requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics = ("cosine", "euclidean", "manhattan")
+
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        sample_size: int = 100_000,
+        seed: int = 1331,
+    ):
+        self.metric, self.nlist, self.nprobe = metric, nlist, nprobe
+        self.sample_size, self.seed = sample_size, seed
+        self.features: Optional[ndarray] = None
+        self.norms: Optional[ndarray] = None
+        self.centroids: Optional[ndarray] = None
+        self.offsets: Optional[ndarray] = None
+        self.ids: Optional[ndarray] = None
+
+    @property
+    def size(self) -> int:
+        """
+        Nombre de vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de lignes de la base indexée.
+        """
+        return 0 if self.norms is None else self.norms.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension des vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de colonnes de la base indexée.
+        """
+        return 0 if self.centroids is None else self.centroids.shape[1]
+
+    def _coarse(self, vectors: ndarray) -> ndarray:
+        """
+        Représentation des vecteurs utilisée pour la quantification grossière.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice de vecteurs.
+
+        Returns
+        -------
+        ndarray
+            Vecteurs normalisés pour la similarité cosinus, inchangés sinon.
+        """
+        return normalize(vectors) if self.metric == "cosine" else vectors
+
+    def _nearest_lists(self, vectors: ndarray, count: int) -> ndarray:
+        """
+        Recherche des listes dont les centroïdes sont les plus proches des vecteurs.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice de vecteurs.
+        count : int
+            Nombre de listes à retourner par vecteur.
+
+        Returns
+        -------
+        ndarray
+            Indices des listes, de taille `(n, count)`.
+        """
+        distances = euclidean(self._coarse(vectors), self.centroids, squared_norms(self.centroids))
+        return top_k(distances, depth=count)
+
+    def build(self, features: ndarray):
+        """
+        Construction de l'index à partir des données caractéristiques de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques de la base.
+        """
+        features = as_matrix(features)
+        size = features.shape[0]
+        nlist = min(self.nlist or max(1, int(sqrt(size))), size)
+
+        # ##: Coarse centroids trained on a sample.
+        generator = np.random.default_rng(self.seed)
+        sample = np.sort(generator.choice(size, size=min(size, self.sample_size), replace=False))
+        kmeans = MiniBatchKMeans(n_clusters=nlist, random_state=self.seed, n_init=3, batch_size=4096)
+        kmeans.fit(self._coarse(features[sample]))
+        self.centroids = as_matrix(kmeans.cluster_centers_)
+
+        # ##: Inverted lists, stored contiguously.
+        assignments = np.concatenate(
+            [self._nearest_lists(features[start : start + 65536], 1)[:, 0] for start in range(0, size, 65536)]
+        )
+        self.ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        self.features, self.norms = features, squared_norms(features)
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins des requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins, de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant
+            `-1`.
+        """
+        if self.features is None:
+            raise RuntimeError("L'index n'a pas été construit.")
+
+        queries = as_matrix(queries)
+        probes = self._nearest_lists(queries, min(self.nprobe, self.centroids.shape[0]))
+        scores = np.empty((queries.shape[0], depth), dtype=np.float32)
+        ids = np.empty((queries.shape[0], depth), dtype=np.int64)
+        for row, lists in enumerate(probes):
+            candidates = np.sort(
+                np.concatenate([self.ids[self.offsets[item] : self.offsets[item + 1]] for item in lists])
+            )
+            values = pairwise(queries[row : row + 1], self.features[candidates], self.metric, self.norms[candidates])
+            scores[row], ids[row] = select(values[0], candidates, depth, largests[self.metric])
+        return scores, ids
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        np.savez(
+            path,
+            metric=np.array(self.metric),
+            nprobe=np.array(self.nprobe),
+            centroids=self.centroids,
+            offsets=self.offsets,
+            ids=self.ids,
+            norms=self.norms,
+        )
+
+    @classmethod
+    def load(cls, path: str, features: ndarray) -> "IVFIndex":
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        features : ndarray
+            Matrice des données caractéristiques de la base indexée.
+
+        Returns
+        -------
+        IVFIndex
+            Index prêt pour la recherche.
+        """
+        with np.load(path) as data:
+            index = cls(metric=str(data["metric"]), nlist=data["centroids"].shape[0], nprobe=int(data["nprobe"]))
+            index.centroids, index.offsets, index.ids = data["centroids"], data["offsets"], data["ids"]
+            index.norms = data["norms"]
+        index.features = as_matrix(features)
+        return index
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Index par quantification produit (PQ) pour la compression des données caractéristiques.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy import ndarray
+from sklearn.cluster import MiniBatchKMeans
+
+from src.addons.distance import (
+    as_matrix,
+    euclidean,
+    largests,
+    normalize,
+    pairwise,
+    select,
+    squared_norms,
+    top_k,
+)
+
+
+class PQIndex:
+    """
+    Index par quantification produit.
+
+    Chaque vecteur est découpé en `m` sous-vecteurs, chacun remplacé par l'indice du centroïde le plus proche parmi
+    `2 ** nbits`. Un vecteur est ainsi codé sur `m` octets. Les distances aux requêtes sont calculées de manière
+    asymétrique à l'aide de tables de distances entre les sous-vecteurs de la requête et les centroïdes.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées : `cosine` et `euclidean`.
+    metric : str
+        Nom de la métrique : `cosine` ou `euclidean`.
+    m : int, default: 32
+        Nombre de sous-vecteurs.
+    nbits : int, default: 8
+        Nombre de bits par code, au plus 8.
+    shortlist : int, default: 0
+        Nombre de candidats re-classés exactement avec les vecteurs d'origine. `0` désactive le re-classement.
+    sample_size : int, default: 65536
+        Nombre maximal de vecteurs utilisés pour l'apprentissage des dictionnaires.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+    dimension : Optional[int]
+        Dimension des vecteurs indexés, connue une fois l'index construit.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des données caractéristiques de la base.
+    search(queries: ndarray, depth: int)
+        Recherche des plus proches voisins des requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics = ("cosine", "euclidean")
+
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        m: int = 32,
+        nbits: int = 8,
+        shortlist: int = 0,
+        sample_size: int = 65536,
+        seed: int = 1331,
+    ):
+        if metric not in self.metrics:
+            raise ValueError(f"La quantification produit ne supporte pas la métrique {metric}.")
+        if not 1 <= nbits <= 8:
+            raise ValueError("Le nombre de bits par code doit être compris entre 1 et 8.")
+        self.metric, self.m, self.nbits, self.shortlist = metric, m, nbits, shortlist
+        self.sample_size, self.seed = sample_size, seed
+        self.dimension: Optional[int] = None
+        self.codebooks: Optional[ndarray] = None
+        self.codes: Optional[ndarray] = None
+        self.features: Optional[ndarray] = None
+
+    @property
+    def size(self) -> int:
+        """
+        Nombre de vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de lignes de la base indexée.
+        """
+        return 0 if self.codes is None else self.codes.shape[0]
+
+    def _split(self, vectors: ndarray) -> ndarray:
+        """
+        Découpage des vecteurs en `m` sous-vecteurs, après normalisation et complétion par des zéros.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice de vecteurs, de taille `(n, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Sous-vecteurs, de taille `(m, n, dimension_sous_vecteur)`.
+        """
+        vectors = normalize(vectors) if self.metric == "cosine" else as_matrix(vectors)
+        padding = -vectors.shape[1] % self.m
+        if padding:
+            vectors = np.pad(vectors, ((0, 0), (0, padding)))
+        return np.ascontiguousarray(vectors.reshape(vectors.shape[0], self.m, -1).transpose(1, 0, 2))
+
+    def _encode(self, vectors: ndarray) -> ndarray:
+        """
+        Codage des vecteurs.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice de vecteurs, de taille `(n, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Codes, de taille `(n, m)`.
+        """
+        parts = self._split(vectors)
+        codes = np.empty((parts.shape[1], self.m), dtype=np.uint8)
+        for sub, codebook in enumerate(self.codebooks):
+            codes[:, sub] = top_k(euclidean(parts[sub], codebook, squared_norms(codebook)), depth=1)[:, 0]
+        return codes
+
+    def _tables(self, query: ndarray) -> ndarray:
+        """
+        Calcul des tables de distances entre les sous-vecteurs d'une requête et les centroïdes.
+
+        Parameters
+        ----------
+        query : ndarray
+            Requête, de taille `(1, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Carré des distances, de taille `(m, 2 ** nbits)`.
+        """
+        parts = self._split(query)[:, 0, :]
+        differences = self.codebooks - parts[:, None, :]
+        return np.einsum("mkd,mkd->mk", differences, differences)
+
+    def build(self, features: ndarray):
+        """
+        Construction de l'index à partir des données caractéristiques de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques de la base.
+        """
+        size, self.dimension = features.shape
+        generator = np.random.default_rng(self.seed)
+        sample = np.sort(generator.choice(size, size=min(size, self.sample_size), replace=False))
+        parts = self._split(features[sample])
+
+        # ##: One codebook per sub-space.
+        clusters = min(2**self.nbits, sample.size)
+        codebooks = []
+        for sub in range(self.m):
+            kmeans = MiniBatchKMeans(n_clusters=clusters, random_state=self.seed, n_init=3, batch_size=4096)
+            codebooks.append(kmeans.fit(parts[sub]).cluster_centers_)
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+
+        # ##: Encode the whole database by chunk.
+        self.codes = np.concatenate([self._encode(features[start : start + 65536]) for start in range(0, size, 65536)])
+        self.features = features
+
+    def _approximate(self, query: ndarray) -> ndarray:
+        """
+        Calcul asymétrique du carré des distances entre une requête et tous les codes.
+
+        Parameters
+        ----------
+        query : ndarray
+            Requête, de taille `(1, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Carré des distances approchées, de taille `(n_base,)`.
+        """
+        tables = self._tables(query).ravel()
+        offsets = np.arange(self.m, dtype=np.intp) * self.codebooks.shape[1]
+        distances = np.empty(self.codes.shape[0], dtype=np.float32)
+        for start in range(0, self.codes.shape[0], 65536):
+            chunk = self.codes[start : start + 65536].astype(np.intp) + offsets
+            distances[start : start + 65536] = np.take(tables, chunk).sum(axis=1)
+        return distances
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins des requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins, de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant
+            `-1`.
+        """
+        if self.codes is None:
+            raise RuntimeError("L'index n'a pas été construit.")
+
+        queries = as_matrix(queries)
+        rerank = self.shortlist > 0 and self.features is not None
+        scores = np.empty((queries.shape[0], depth), dtype=np.float32)
+        ids = np.empty((queries.shape[0], depth), dtype=np.int64)
+        for row in range(queries.shape[0]):
+            query = queries[row : row + 1]
+            approximate = self._approximate(query)
+            if rerank:
+                candidates = np.sort(top_k(approximate.reshape(1, -1), depth=max(self.shortlist, depth))[0])
+                values = pairwise(query, self.features[candidates], self.metric)[0]
+                scores[row], ids[row] = select(values, candidates, depth, largests[self.metric])
+            else:
+                # ##: Normalized vectors: cosine similarity is 1 - d² / 2.
+                values = 1 - approximate / 2 if self.metric == "cosine" else np.sqrt(approximate)
+                scores[row], ids[row] = select(values, np.arange(values.size), depth, largests[self.metric])
+        return scores, ids
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        np.savez(
+            path,
+            metric=np.array(self.metric),
+            parameters=np.array([self.m, self.nbits, self.shortlist, self.dimension]),
+            codebooks=self.codebooks,
+            codes=self.codes,
+        )
+
+    @classmethod
+    def load(cls, path: str, features: Optional[ndarray] = None) -> "PQIndex":
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        features : ndarray, default: None
+            Matrice des données caractéristiques de la base indexée, nécessaire au re-classement. Elle peut être
+            projetée en mémoire.
+
+        Returns
+        -------
+        PQIndex
+            Index prêt pour la recherche.
+        """
+        with np.load(path) as data:
+            m, nbits, shortlist, dimension = data["parameters"].tolist()
+            index = cls(metric=str(data["metric"]), m=m, nbits=nbits, shortlist=shortlist)
+            index.dimension, index.codebooks, index.codes = dimension, data["codebooks"], data["codes"]
+        index.features = features
+        return index
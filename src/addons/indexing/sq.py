@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Index par quantification scalaire (SQ) des données caractéristiques, avec re-classement exact.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+from src.addons.distance import largests, pairwise, select, squared_norms, top_k
+
+
+class SQIndex:
+    """
+    Index par quantification scalaire.
+
+    Chaque composante est stockée sur un octet (`int8`, avec une échelle et un décalage par dimension) ou sur deux
+    octets (`float16`), soit quatre ou deux fois moins que les `float32` de la base. Les scores sont d'abord calculés
+    sur les vecteurs quantifiés, décodés par blocs, pour retenir `shortlist` candidats par requête ; ceux-ci sont
+    ensuite re-classés exactement avec les vecteurs d'origine, qui peuvent rester projetés en mémoire.
+
+    Le gain de mémoire suppose que la base reste projetée en mémoire, comme avec `load_database` par défaut : tant
+    que l'index est utilisé, le moteur de recherche libère ses propres copies de la base, comme les lignes
+    normalisées de la distance cosinus.
+
+    Attributes
+    ----------
+    metrics : Tuple[str, ...]
+        Métriques supportées : `cosine`, `euclidean` et `manhattan`.
+    metric : str
+        Nom de la métrique : `cosine`, `euclidean` ou `manhattan`.
+    dtype : str, default: "int8"
+        Type des composantes quantifiées : `int8` ou `float16`.
+    shortlist : int, default: 100
+        Nombre de candidats re-classés exactement avec les vecteurs d'origine. `0` désactive le re-classement.
+    chunk_size : int, default: 256
+        Nombre de vecteurs décodés ensemble, assez petit pour que chaque bloc décodé reste dans le cache.
+
+    Methods
+    -------
+    build(features: ndarray)
+        Construction de l'index à partir des données caractéristiques de la base.
+    search(queries: ndarray, depth: int)
+        Recherche des plus proches voisins des requêtes.
+    save(path: str)
+        Enregistrement de l'index.
+    load(path: str, features: ndarray)
+        Chargement d'un index enregistré.
+    """
+
+    metrics = ("cosine", "euclidean", "manhattan")
+
+    def __init__(self, metric: str = "euclidean", dtype: str = "int8", shortlist: int = 100, chunk_size: int = 256):
+        if metric not in self.metrics:
+            raise ValueError(f"La quantification scalaire ne supporte pas la métrique {metric}.")
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Type de quantification inconnu : {dtype}.")
+        self.metric, self.dtype, self.shortlist, self.chunk_size = metric, dtype, shortlist, chunk_size
+        self.scale: Optional[ndarray] = None
+        self.offset: Optional[ndarray] = None
+        self.codes: Optional[ndarray] = None
+        self.norms: Optional[ndarray] = None
+        self.features: Optional[ndarray] = None
+
+    @property
+    def size(self) -> int:
+        """
+        Nombre de vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de lignes de la base indexée.
+        """
+        return 0 if self.codes is None else self.codes.shape[0]
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension des vecteurs indexés.
+
+        Returns
+        -------
+        int
+            Nombre de colonnes de la base indexée.
+        """
+        return 0 if self.codes is None else self.codes.shape[1]
+
+    def _encode(self, vectors: ndarray) -> ndarray:
+        """
+        Quantification des vecteurs.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice de vecteurs, de taille `(n, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Codes, de taille `(n, dimension)`, en `int8` ou `float16`.
+        """
+        if self.dtype == "float16":
+            return np.asarray(vectors, dtype=np.float16)
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def _decode(self, start: int, end: int) -> ndarray:
+        """
+        Décodage d'un bloc de vecteurs quantifiés.
+
+        Parameters
+        ----------
+        start : int
+            Indice du premier vecteur.
+        end : int
+            Indice suivant le dernier vecteur.
+
+        Returns
+        -------
+        ndarray
+            Matrice contiguë de `float32`.
+        """
+        decoded = self.codes[start:end].astype(np.float32)
+        if self.dtype == "int8":
+            decoded *= self.scale
+            decoded += self.offset + 128 * self.scale
+        return decoded
+
+    def build(self, features: ndarray):
+        """
+        Construction de l'index à partir des données caractéristiques de la base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques de la base.
+        """
+        size = features.shape[0]
+        if self.dtype == "int8":
+            # ##: Per-dimension range, mapped onto the 256 levels.
+            starts = range(0, size, self.chunk_size)
+            low = np.min([features[start : start + self.chunk_size].min(axis=0) for start in starts], axis=0)
+            high = np.max([features[start : start + self.chunk_size].max(axis=0) for start in starts], axis=0)
+            self.offset = np.asarray(low, dtype=np.float32)
+            self.scale = np.asarray((high - low) / 255, dtype=np.float32)
+            self.scale[self.scale == 0] = 1
+
+        self.codes = np.concatenate(
+            [self._encode(features[start : start + self.chunk_size]) for start in range(0, size, self.chunk_size)]
+        )
+        self.norms = np.concatenate(
+            [squared_norms(self._decode(start, start + self.chunk_size)) for start in range(0, size, self.chunk_size)]
+        )
+        self.features = features
+
+    def _approximate(self, queries: ndarray) -> ndarray:
+        """
+        Calcul des scores entre les requêtes et tous les vecteurs quantifiés.
+
+        Pour les métriques euclidienne et cosinus, l'échelle et le décalage sont reportés sur les requêtes : seuls les
+        codes sont convertis en `float32` avant le produit matriciel.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+
+        Returns
+        -------
+        ndarray
+            Scores approchés, de taille `(n_requêtes, n_base)`.
+        """
+        scores = np.empty((queries.shape[0], self.codes.shape[0]), dtype=np.float32)
+        if self.metric == "manhattan":
+            for start in range(0, self.codes.shape[0], self.chunk_size):
+                end = start + self.chunk_size
+                scores[:, start:end] = pairwise(queries, self._decode(start, end), self.metric)
+            return scores
+
+        # ##: q . (c * scale + shift) = (q * scale) . c + q . shift
+        if self.dtype == "int8":
+            weights, bias = queries * self.scale, queries @ (self.offset + 128 * self.scale)
+        else:
+            weights, bias = queries, np.zeros(queries.shape[0], dtype=np.float32)
+        for start in range(0, self.codes.shape[0], self.chunk_size):
+            end = start + self.chunk_size
+            scores[:, start:end] = weights @ self.codes[start:end].astype(np.float32).T
+        scores += bias[:, None]
+
+        queries_norms = squared_norms(queries)
+        if self.metric == "euclidean":
+            scores *= -2
+            scores += queries_norms[:, None]
+            scores += self.norms[None, :]
+            np.maximum(scores, 0, out=scores)
+            return np.sqrt(scores, out=scores)
+        queries_norms, norms = np.sqrt(queries_norms), np.sqrt(self.norms)
+        queries_norms[queries_norms == 0], norms[norms == 0] = 1, 1
+        scores /= queries_norms[:, None]
+        scores /= norms[None, :]
+        return scores
+
+    def search(self, queries: ndarray, depth: int) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche des plus proches voisins des requêtes.
+
+        Parameters
+        ----------
+        queries : ndarray
+            Matrice des requêtes, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants des voisins, de taille `(n_requêtes, depth)`. Les places vides ont l'identifiant
+            `-1`.
+        """
+        if self.codes is None:
+            raise RuntimeError("L'index n'a pas été construit.")
+
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        largest = largests[self.metric]
+        approximate = self._approximate(queries)
+        if self.shortlist <= 0 or self.features is None:
+            nearest = top_k(approximate, depth=depth, largest=largest)
+            return np.take_along_axis(approximate, nearest, axis=1), nearest
+
+        # ##: Exact scores on the shortlist, read in increasing order from the original vectors.
+        candidates = np.sort(top_k(approximate, depth=max(self.shortlist, depth), largest=largest), axis=1)
+        scores = np.empty((queries.shape[0], depth), dtype=np.float32)
+        ids = np.empty((queries.shape[0], depth), dtype=np.int64)
+        for row in range(queries.shape[0]):
+            values = pairwise(queries[row : row + 1], self.features[candidates[row]], self.metric)[0]
+            scores[row], ids[row] = select(values, candidates[row], depth, largest)
+        return scores, ids
+
+    def save(self, path: str):
+        """
+        Enregistrement de l'index.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        arrays = {"scale": self.scale, "offset": self.offset} if self.dtype == "int8" else {}
+        np.savez(
+            path,
+            metric=np.array(self.metric),
+            dtype=np.array(self.dtype),
+            shortlist=np.array(self.shortlist),
+            codes=self.codes,
+            norms=self.norms,
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path: str, features: Optional[ndarray] = None) -> "SQIndex":
+        """
+        Chargement d'un index enregistré.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        features : ndarray, default: None
+            Matrice des données caractéristiques de la base indexée, nécessaire au re-classement. Elle peut être
+            projetée en mémoire.
+
+        Returns
+        -------
+        SQIndex
+            Index prêt pour la recherche.
+        """
+        with np.load(path) as data:
+            index = cls(metric=str(data["metric"]), dtype=str(data["dtype"]), shortlist=int(data["shortlist"]))
+            index.codes, index.norms = data["codes"], data["norms"]
+            if index.dtype == "int8":
+                index.scale, index.offset = data["scale"], data["offset"]
+        index.features = features
+        return index
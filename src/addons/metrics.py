@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 """
 Ensemble des métriques pour l'évaluation.
+
+Les fonctions suffixées par `_at_k` opèrent en une passe sur une matrice de pertinence de taille
+`(n_requêtes, profondeur)`, obtenue par `relevance_matrix`. Les autres fonctions calculent les mêmes valeurs à partir
+des listes de labels trouvés.
 """
+from itertools import chain
+from math import fsum
 from statistics import fmean
-from typing import Sequence
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+from numpy import ndarray
 
 
 def reciprocal_rank(found: Sequence[str], ground_truth: str) -> float:
@@ -46,10 +55,7 @@ def mean_reciprocal_rank(retrievals: Sequence[Sequence[str]], labels: Sequence[s
     float
         Moyenne des rangs de réciprocité.
     """
-    reciprocal_rangs = list(
-        map(lambda groups: reciprocal_rank(found=groups[0], ground_truth=groups[1]), zip(retrievals, labels))
-    )
-    return fmean(reciprocal_rangs)
+    return mean_reciprocal_rank_at_k(relevance_matrix(retrievals, labels))
 
 
 def first_rank_accuracy(retrievals: Sequence[Sequence[str]], labels: Sequence[str]) -> float:
@@ -68,8 +74,7 @@ def first_rank_accuracy(retrievals: Sequence[Sequence[str]], labels: Sequence[st
     float
         Pourcentage des labels corrects trouvés en premières positions.
     """
-    first_rank = list(map(lambda couple: couple[0][0] == couple[1] if couple[0] else False, zip(retrievals, labels)))
-    return fmean(first_rank)
+    return first_rank_accuracy_at_k(relevance_matrix(retrievals, labels))
 
 
 def precision(found: Sequence[str], ground_truth: str) -> float:
@@ -108,10 +113,7 @@ def average_precision(found: Sequence[str], ground_truth: str) -> float:
     float
         Précision moyenne.
     """
-    groups = list(map(lambda index: (found[index], found[: index + 1]), range(len(found))))
-    groups = list(filter(lambda group: group[0] == ground_truth, groups))
-    precisions = list(map(lambda group: precision(found=group[1], ground_truth=group[0]), groups))
-    return fmean(precisions) if precisions else 0.0
+    return float(average_precision_at_k(relevance_matrix([found], [ground_truth]))[0])
 
 
 def mean_average_precision(retrievals: Sequence[Sequence[str]], labels: Sequence[str]) -> float:
@@ -130,7 +132,219 @@ def mean_average_precision(retrievals: Sequence[Sequence[str]], labels: Sequence
     float
         Moyenne des précisions moyennes.
     """
-    average_precisions = list(
-        map(lambda groups: average_precision(found=groups[0], ground_truth=groups[1]), list(zip(retrievals, labels)))
-    )
-    return fmean(average_precisions)
+    return mean_average_precision_at_k(relevance_matrix(retrievals, labels))
+
+
+def relevance_matrix(
+    retrievals: Union[Sequence[Sequence[str]], ndarray],
+    labels: Union[Sequence[str], ndarray],
+    depth: Optional[int] = None,
+) -> ndarray:
+    """
+    Construction de la matrice de pertinence des éléments trouvés.
+
+    Les labels sont codés par des entiers, puis comparés en une seule opération. Les listes plus courtes que la
+    profondeur sont complétées par des éléments non pertinents.
+
+    Parameters
+    ----------
+    retrievals : Union[Sequence[Sequence[str]], ndarray]
+        Listes des éléments trouvés, ou matrice de labels de taille `(n_requêtes, profondeur)`.
+    labels : Union[Sequence[str], ndarray]
+        Listes des vrais labels.
+    depth : int, default: None
+        Profondeur de la matrice. Par défaut, la longueur de la plus longue liste.
+
+    Returns
+    -------
+    ndarray
+        Matrice booléenne de taille `(n_requêtes, profondeur)`.
+    """
+    labels = np.asarray(labels)
+    if isinstance(retrievals, ndarray) and retrievals.ndim == 2:
+        return np.asarray(retrievals[:, :depth] == labels[:, None], dtype=bool)
+
+    lengths = np.fromiter(map(len, retrievals), dtype=np.int64, count=len(retrievals))
+    depth = int(lengths.max(initial=0)) if depth is None else depth
+    found = np.array(list(chain.from_iterable(retrievals)), dtype=labels.dtype if labels.size else str)
+
+    # ##: Integer codes shared by labels and retrievals.
+    _, codes = np.unique(np.concatenate([labels, found]), return_inverse=True)
+    truth, found = codes[: labels.size], codes[labels.size :]
+
+    rows = np.repeat(np.arange(lengths.size), lengths)
+    columns = np.arange(found.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    kept = columns < depth
+    relevance = np.zeros((lengths.size, depth), dtype=bool)
+    relevance[rows[kept], columns[kept]] = found[kept] == truth[rows[kept]]
+    return relevance
+
+
+def _cut(relevance: ndarray, k: Optional[int]) -> ndarray:
+    """
+    Restriction d'une matrice de pertinence aux `k` premières positions.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions conservées. Par défaut, toutes.
+
+    Returns
+    -------
+    ndarray
+        Matrice booléenne de taille `(n_requêtes, k)`.
+    """
+    relevance = np.asarray(relevance, dtype=bool)
+    return relevance if k is None else relevance[:, :k]
+
+
+def average_precision_at_k(relevance: ndarray, k: Optional[int] = None) -> ndarray:
+    """
+    Calcul de la précision moyenne de chaque requête : moyenne des précisions aux positions pertinentes.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    ndarray
+        Précision moyenne de chaque requête, nulle sans élément pertinent.
+    """
+    relevance = _cut(relevance, k)
+    hits = np.cumsum(relevance, axis=1)
+    precisions = np.where(relevance, hits / np.arange(1, relevance.shape[1] + 1), 0.0)
+    counts = hits[:, -1] if relevance.shape[1] else np.zeros(relevance.shape[0], dtype=np.int64)
+    # ##: Exactly rounded sums, as `fmean` over the precisions of each query.
+    sums = np.fromiter(map(fsum, precisions), dtype=np.float64, count=precisions.shape[0])
+    return np.divide(sums, counts, out=np.zeros(relevance.shape[0]), where=counts > 0)
+
+
+def mean_average_precision_at_k(relevance: ndarray, k: Optional[int] = None) -> float:
+    """
+    Calcul de la moyenne des précisions moyennes (MAP@k).
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    float
+        Moyenne des précisions moyennes.
+    """
+    return fmean(average_precision_at_k(relevance, k).tolist())
+
+
+def mean_reciprocal_rank_at_k(relevance: ndarray, k: Optional[int] = None) -> float:
+    """
+    Calcul de la moyenne des rangs de réciprocité (MRR@k).
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    float
+        Moyenne des rangs de réciprocité.
+    """
+    relevance = _cut(relevance, k)
+    ranks = relevance.argmax(axis=1) + 1 if relevance.shape[1] else np.ones(relevance.shape[0], dtype=np.int64)
+    return fmean(np.where(relevance.any(axis=1), 1 / ranks, 0.0).tolist())
+
+
+def precision_at_k(relevance: ndarray, k: Optional[int] = None) -> float:
+    """
+    Calcul de la précision moyenne sur les `k` premières positions.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    float
+        Proportion moyenne d'éléments pertinents parmi les `k` premiers.
+    """
+    relevance = _cut(relevance, k)
+    return float(relevance.mean(axis=1).mean())
+
+
+def recall_at_k(relevance: ndarray, totals: Union[Sequence[int], ndarray], k: Optional[int] = None) -> float:
+    """
+    Calcul du rappel moyen sur les `k` premières positions.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    totals : Union[Sequence[int], ndarray]
+        Nombre d'éléments pertinents de la base pour chaque requête.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    float
+        Proportion moyenne des éléments pertinents de la base retrouvés parmi les `k` premiers.
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    hits = _cut(relevance, k).sum(axis=1)
+    return float(np.divide(hits, totals, out=np.zeros(hits.shape[0]), where=totals > 0).mean())
+
+
+def first_rank_accuracy_at_k(relevance: ndarray) -> float:
+    """
+    Calcul du pourcentage des labels corrects trouvés en premières positions.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+
+    Returns
+    -------
+    float
+        Pourcentage des labels corrects trouvés en premières positions.
+    """
+    relevance = _cut(relevance, 1)
+    return fmean(relevance.any(axis=1).tolist())
+
+
+def evaluate(relevance: ndarray, k: Optional[int] = None) -> Dict[str, float]:
+    """
+    Calcul de l'ensemble des métriques sur une matrice de pertinence.
+
+    Parameters
+    ----------
+    relevance : ndarray
+        Matrice de pertinence, de taille `(n_requêtes, profondeur)`.
+    k : int, default: None
+        Nombre de positions évaluées. Par défaut, toutes.
+
+    Returns
+    -------
+    Dict[str, float]
+        MAP@k, MRR@k, précision@k et exactitude au premier rang.
+    """
+    return {
+        "map": mean_average_precision_at_k(relevance, k),
+        "mrr": mean_reciprocal_rank_at_k(relevance, k),
+        "precision": precision_at_k(relevance, k),
+        "first_rank": first_rank_accuracy_at_k(relevance),
+    }
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure de la durée de chaque étape de l'extraction et de la recherche.
+
+Les mesures sont désactivées par défaut : chaque point de mesure se réduit alors à un test sur `profiler.enabled`.
+Les durées ne sont pas conservées : chacune est agrégée à son arrivée dans un histogramme, d'où sont estimés les
+percentiles, ce qui borne la mémoire utilisée par un service mesuré en continu.
+"""
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Dict
+
+import numpy as np
+from rich.table import Table
+
+# ##: Histogram buckets, from 10 µs to 100 s on a logarithmic scale, 20 per decade (12 % wide).
+BUCKETS_MS = np.logspace(-2, 5, num=141)
+
+
+class _Statistics:
+    """
+    Agrégat des durées d'une étape.
+
+    Attributes
+    ----------
+    calls : int
+        Nombre de durées.
+    total : float
+        Somme des durées, en millisecondes.
+    maximum : float
+        Durée maximale, en millisecondes.
+    counts : ndarray
+        Nombre de durées par intervalle de `BUCKETS_MS`, les durées hors bornes étant comptées dans l'intervalle le
+        plus proche.
+    """
+
+    __slots__ = ("calls", "total", "maximum", "counts")
+
+    def __init__(self):
+        self.calls, self.total, self.maximum = 0, 0.0, 0.0
+        self.counts = np.zeros(BUCKETS_MS.size - 1, dtype=np.int64)
+
+    def add(self, duration: float):
+        """
+        Agrégation d'une durée.
+
+        Parameters
+        ----------
+        duration : float
+            Durée, en millisecondes.
+        """
+        self.calls += 1
+        self.total += duration
+        self.maximum = max(self.maximum, duration)
+        bucket = int(np.searchsorted(BUCKETS_MS, duration, side="right")) - 1
+        self.counts[min(max(bucket, 0), self.counts.size - 1)] += 1
+
+    def percentile(self, rank: float) -> float:
+        """
+        Estimation d'un percentile des durées.
+
+        Parameters
+        ----------
+        rank : float
+            Rang du percentile, entre 0 et 100.
+
+        Returns
+        -------
+        float
+            Borne supérieure de l'intervalle contenant le percentile, en millisecondes, sans dépasser la durée maximale.
+        """
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank / 100 * self.calls, side="left"))
+        return min(float(BUCKETS_MS[min(bucket, self.counts.size - 1) + 1]), self.maximum)
+
+
+class _Timer:
+    """
+    Chronomètre d'une étape, utilisé comme gestionnaire de contexte.
+    """
+
+    __slots__ = ("owner", "name", "start")
+
+    def __init__(self, owner: "Profiler", name: str):
+        self.owner, self.name, self.start = owner, name, 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any):
+        duration = (time.perf_counter() - self.start) * 1000
+        with self.owner.lock:
+            self.owner.timings[self.name].add(duration)
+
+
+class Profiler:
+    """
+    Collecte des durées et des compteurs de chaque étape, par nom.
+
+    Le nom d'une étape est préfixé par la classe de l'objet mesuré, par exemple `VGGCompressor.inference` ou
+    `CosinusFinder.distance`, ce qui regroupe les mesures par extracteur et par moteur de recherche.
+
+    Attributes
+    ----------
+    enabled : bool, default: False
+        Activation des mesures.
+    timings : Dict[str, _Statistics]
+        Agrégat des durées, par chronomètre.
+    counters : Dict[str, int]
+        Valeur des compteurs.
+
+    Methods
+    -------
+    timer(stage: str, owner: Any = None)
+        Chronomètre d'une étape.
+    count(stage: str, owner: Any = None, value: int = 1)
+        Incrément d'un compteur.
+    summary()
+        Résumé des mesures sous forme de dictionnaire.
+    table()
+        Résumé des mesures sous forme de tableau.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.timings: Dict[str, _Statistics] = defaultdict(_Statistics)
+        self.counters: Dict[str, int] = defaultdict(int)
+        # ##: Stages run concurrently in the service threads.
+        self.lock = Lock()
+
+    def enable(self):
+        """
+        Activation des mesures.
+        """
+        self.enabled = True
+
+    def disable(self):
+        """
+        Désactivation des mesures.
+        """
+        self.enabled = False
+
+    def reset(self):
+        """
+        Suppression des mesures.
+        """
+        with self.lock:
+            self.timings.clear()
+            self.counters.clear()
+
+    @staticmethod
+    def _name(stage: str, owner: Any) -> str:
+        """
+        Nom complet d'une étape.
+
+        Parameters
+        ----------
+        stage : str
+            Nom de l'étape.
+        owner : Any
+            Objet mesuré, ou `None`.
+
+        Returns
+        -------
+        str
+            Nom de l'étape préfixé par la classe de l'objet.
+        """
+        return stage if owner is None else f"{type(owner).__name__}.{stage}"
+
+    def timer(self, stage: str, owner: Any = None) -> Any:
+        """
+        Chronomètre d'une étape.
+
+        Parameters
+        ----------
+        stage : str
+            Nom de l'étape.
+        owner : Any, default: None
+            Objet mesuré.
+
+        Returns
+        -------
+        Any
+            Gestionnaire de contexte mesurant la durée de son bloc, sans effet si les mesures sont désactivées.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return _Timer(self, self._name(stage, owner))
+
+    def count(self, stage: str, owner: Any = None, value: int = 1):
+        """
+        Incrément d'un compteur.
+
+        Parameters
+        ----------
+        stage : str
+            Nom du compteur.
+        owner : Any, default: None
+            Objet mesuré.
+        value : int, default: 1
+            Valeur de l'incrément.
+        """
+        if self.enabled:
+            with self.lock:
+                self.counters[self._name(stage, owner)] += value
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Résumé des mesures sous forme de dictionnaire.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            Pour chaque chronomètre, le nombre d'appels, les durées totale, moyenne, p50, p95, p99 et maximale en
+            millisecondes, et l'histogramme des durées ; pour chaque compteur, sa valeur. Les percentiles sont estimés
+            à la largeur d'un intervalle de l'histogramme près.
+        """
+        timers = {}
+        with self.lock:
+            for name, statistics in sorted(self.timings.items()):
+                timers[name] = {
+                    "calls": statistics.calls,
+                    "total_ms": statistics.total,
+                    "mean_ms": statistics.total / statistics.calls,
+                    "p50_ms": statistics.percentile(50),
+                    "p95_ms": statistics.percentile(95),
+                    "p99_ms": statistics.percentile(99),
+                    "max_ms": statistics.maximum,
+                    "histogram": {"edges_ms": BUCKETS_MS.tolist(), "counts": statistics.counts.tolist()},
+                }
+            counters = dict(sorted(self.counters.items()))
+        return {"timers": timers, "counters": counters}
+
+    def table(self) -> Table:
+        """
+        Résumé des mesures sous forme de tableau.
+
+        Returns
+        -------
+        Table
+            Tableau affichable par `rich`, une ligne par chronomètre.
+        """
+        table = Table(title="Durée des étapes")
+        for column in ("étape", "appels", "total (ms)", "moyenne (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)"):
+            table.add_column(column, justify="left" if column == "étape" else "right")
+        summary = self.summary()
+        for name, timer in summary["timers"].items():
+            values = [f"{timer[key]:.3f}" for key in ("total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms")]
+            table.add_row(name, str(timer["calls"]), *values)
+        for name, value in summary["counters"].items():
+            table.add_row(name, str(value), *[""] * 5)
+        return table
+
+
+def profiled(stage: str) -> Callable:
+    """
+    Mesure de la durée d'une méthode.
+
+    Parameters
+    ----------
+    stage : str
+        Nom de l'étape, préfixé par la classe de l'instance.
+
+    Returns
+    -------
+    Callable
+        Décorateur de méthode.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def profiled_wrapper(self, *args, **kwargs):
+            if not profiler.enabled:
+                return func(self, *args, **kwargs)
+            with profiler.timer(stage, self):
+                return func(self, *args, **kwargs)
+
+        return profiled_wrapper
+
+    return decorator
+
+
+profiler = Profiler()
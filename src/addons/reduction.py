@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Réduction de la dimension des données caractéristiques par analyse en composantes principales.
+"""
+from os.path import exists, splitext
+from typing import Optional
+
+import numpy as np
+from numpy import ndarray
+
+
+def reducer_path(data_path: str) -> str:
+    """
+    Chemin d'une réduction enregistrée à côté de sa base de données.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la base de données, `{method}_db.parquet`.
+
+    Returns
+    -------
+    str
+        Chemin de la réduction, `{method}_db_pca.npz`.
+    """
+    return f"{splitext(data_path)[0]}_pca.npz"
+
+
+def saved_reducer(data_path: str) -> Optional["PCAReducer"]:
+    """
+    Chargement de la réduction enregistrée à côté d'une base de données, si elle existe.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la base de données, `{method}_db.parquet`.
+
+    Returns
+    -------
+    Optional[PCAReducer]
+        Projection enregistrée, ou `None` si la base n'a pas de réduction.
+    """
+    path = reducer_path(data_path)
+    return PCAReducer.load(path) if exists(path) else None
+
+
+class PCAReducer:
+    """
+    Projection des données caractéristiques sur leurs composantes principales, avec blanchiment optionnel.
+
+    La covariance est accumulée par blocs de lignes : l'apprentissage sur une base chargée en mémoire partagée ne
+    charge jamais toute la base en mémoire.
+
+    Attributes
+    ----------
+    mean : ndarray
+        Moyenne des données d'apprentissage.
+    components : ndarray
+        Matrice de projection, de taille `(dimension, n_composantes)`, divisée par l'écart type de chaque composante
+        en cas de blanchiment.
+    variance : ndarray
+        Variance de chaque composante retenue.
+    explained : float
+        Part de la variance totale conservée.
+    whiten : bool
+        Blanchiment des composantes.
+
+    Methods
+    -------
+    fit(features: ndarray, dimension: int, whiten: bool = False)
+        Apprentissage de la projection.
+    transform(features: ndarray)
+        Projection des données caractéristiques.
+    save(path: str)
+        Enregistrement de la projection.
+    load(path: str)
+        Chargement d'une projection enregistrée.
+    """
+
+    def __init__(self, mean: ndarray, components: ndarray, variance: ndarray, explained: float, whiten: bool):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.variance = np.asarray(variance, dtype=np.float32)
+        self.explained, self.whiten = float(explained), bool(whiten)
+
+    @property
+    def dimension(self) -> int:
+        """
+        Dimension des données après projection.
+
+        Returns
+        -------
+        int
+            Nombre de composantes retenues.
+        """
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(
+        cls, features: ndarray, dimension: int, whiten: bool = False, chunk_size: int = 4096, epsilon: float = 1e-6
+    ) -> "PCAReducer":
+        """
+        Apprentissage de la projection sur les données caractéristiques d'une base.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques, éventuellement en mémoire partagée.
+        dimension : int
+            Nombre de composantes retenues.
+        whiten : bool, default: False
+            Division de chaque composante par son écart type.
+        chunk_size : int, default: 4096
+            Nombre de lignes traitées ensemble.
+        epsilon : float, default: 1e-6
+            Régularisation du blanchiment des composantes de variance quasi nulle.
+
+        Returns
+        -------
+        PCAReducer
+            Projection apprise.
+        """
+        count, size = features.shape
+        if not 0 < dimension <= size:
+            raise ValueError(f"La dimension doit être comprise entre 1 et {size}.")
+
+        # ##: Two passes: mean, then covariance of the centred rows.
+        mean = np.zeros(size, dtype=np.float64)
+        for start in range(0, count, chunk_size):
+            mean += np.asarray(features[start : start + chunk_size], dtype=np.float64).sum(axis=0)
+        mean /= count
+        covariance = np.zeros((size, size), dtype=np.float64)
+        for start in range(0, count, chunk_size):
+            chunk = np.asarray(features[start : start + chunk_size], dtype=np.float32) - mean.astype(np.float32)
+            covariance += chunk.T @ chunk
+        covariance /= max(count - 1, 1)
+
+        values, vectors = np.linalg.eigh(covariance)
+        order = np.argsort(values)[::-1][:dimension]
+        variance, components = np.maximum(values[order], 0.0), vectors[:, order]
+        explained = variance.sum() / max(np.maximum(values, 0.0).sum(), np.finfo(np.float64).tiny)
+        if whiten:
+            components = components / np.sqrt(variance + epsilon)
+        return cls(mean, components, variance, explained, whiten)
+
+    def transform(self, features: ndarray, chunk_size: int = 4096) -> ndarray:
+        """
+        Projection des données caractéristiques.
+
+        Parameters
+        ----------
+        features : ndarray
+            Matrice des données caractéristiques, éventuellement en mémoire partagée.
+        chunk_size : int, default: 4096
+            Nombre de lignes traitées ensemble.
+
+        Returns
+        -------
+        ndarray
+            Matrice contiguë de `float32`, de taille `(n, n_composantes)`.
+        """
+        features = np.atleast_2d(features)
+        if features.shape[1] != self.mean.size:
+            raise ValueError(f"Les données ont {features.shape[1]} dimensions au lieu de {self.mean.size}.")
+        reduced = np.empty((features.shape[0], self.dimension), dtype=np.float32)
+        for start in range(0, features.shape[0], chunk_size):
+            chunk = np.asarray(features[start : start + chunk_size], dtype=np.float32)
+            np.matmul(chunk - self.mean, self.components, out=reduced[start : start + chunk_size])
+        return reduced
+
+    def save(self, path: str):
+        """
+        Enregistrement de la projection.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+        """
+        np.savez(
+            path,
+            mean=self.mean,
+            components=self.components,
+            variance=self.variance,
+            explained=np.array(self.explained),
+            whiten=np.array(self.whiten),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PCAReducer":
+        """
+        Chargement d'une projection enregistrée.
+
+        Parameters
+        ----------
+        path : str
+            Chemin du fichier `.npz`.
+
+        Returns
+        -------
+        PCAReducer
+            Projection prête à l'emploi.
+        """
+        with np.load(path) as data:
+            return cls(
+                data["mean"], data["components"], data["variance"], float(data["explained"]), bool(data["whiten"])
+            )
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Registre de classes résolues à la demande.
+"""
+from functools import partial
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterator, Mapping
+
+
+class LazyRegistry(Mapping):
+    """
+    Dictionnaire de classes désignées par leur chemin d'import `module:Classe`.
+
+    Le module d'une classe n'est importé qu'au premier accès à son entrée : un processus qui n'utilise que les
+    descripteurs d'OpenCV n'importe pas TensorFlow, et un processus de recherche n'importe ni l'un ni l'autre.
+
+    Attributes
+    ----------
+    entries : Dict[str, str]
+        Chemin d'import de chaque classe, par nom.
+    defaults : Dict[str, Any]
+        Paramètres fixés pour la construction de toutes les classes du registre.
+    """
+
+    def __init__(self, entries: Dict[str, str], **defaults: Any):
+        self.entries, self.defaults = entries, defaults
+        self._resolved: Dict[str, Callable] = {}
+
+    def __getitem__(self, name: str) -> Callable:
+        if name not in self._resolved:
+            module, attribute = self.entries[name].split(":")
+            target = getattr(import_module(module), attribute)
+            self._resolved[name] = partial(target, **self.defaults) if self.defaults else target
+        return self._resolved[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche répartie entre plusieurs processus, chacun servant une partie de la base de données.
+"""
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from os.path import splitext
+from typing import Any, List, Mapping, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from numpy import ndarray
+
+from src.addons import distance
+from src.addons.data import load_database, load_segments
+from src.addons.extraction.extractor import Extractor
+from src.addons.finder import Finder
+from src.addons.indexing.index import Index, index_path
+from src.addons.reduction import PCAReducer
+
+
+def shard_path(data_path: str, shard: int, shards: int) -> str:
+    """
+    Chemin de la base de données d'une partie, à côté duquel ses index sont enregistrés.
+
+    Parameters
+    ----------
+    data_path : str
+        Chemin de la base de données complète.
+    shard : int
+        Numéro de la partie.
+    shards : int
+        Nombre de parties.
+
+    Returns
+    -------
+    str
+        Chemin propre à la partie et au découpage.
+    """
+    root, extension = splitext(data_path)
+    return f"{root}_shard{shard}of{shards}{extension}"
+
+
+def _serve(connection: Connection, finder_class: Type[Finder], database: Mapping[str, ndarray]):
+    """
+    Boucle de service d'une partie de la base : exécution des commandes reçues jusqu'à la fermeture.
+
+    Parameters
+    ----------
+    connection : Connection
+        Connexion avec le coordinateur.
+    finder_class : Type[Finder]
+        Classe du moteur de recherche.
+    database : Mapping[str, ndarray]
+        Partie de la base de données servie.
+    """
+    finder = finder_class(None, database)
+    while True:
+        try:
+            command, *args = connection.recv()
+        except EOFError:
+            break
+        if command == "close":
+            break
+        try:
+            if command == "search":
+                vectors, depth, rows = args
+                result = finder._search(finder._as_matrix(vectors), depth, rows)  # pylint: disable=protected-access
+            elif command == "distance":
+                vectors, rows = args
+                result = finder._compute_distance(finder._as_matrix(vectors), rows)  # pylint: disable=protected-access
+            elif command == "build_index":
+                name, params = args
+                result = finder.build_index(name, **params).metric
+            elif command == "load_index":
+                data_path, name = args
+                result = finder.load_index(data_path, name)
+            elif command == "save_index":
+                data_path, name = args
+                if finder.index is None:
+                    raise RuntimeError("Aucun index n'a été construit.")
+                result = finder.index.save(index_path(data_path, name=name, metric=finder.metric))
+            else:
+                raise ValueError(f"Commande inconnue : {command}.")
+            connection.send(("ok", result))
+        except Exception as error:  # pylint: disable=broad-except
+            connection.send(("error", error))
+    connection.close()
+
+
+def serve(
+    address: Tuple[str, int],
+    authkey: bytes,
+    finder_class: Type[Finder],
+    database: Mapping[str, ndarray],
+    report: Optional[Connection] = None,
+):
+    """
+    Service d'une partie de la base sur une adresse réseau, par exemple depuis un autre nœud.
+
+    Parameters
+    ----------
+    address : Tuple[str, int]
+        Adresse d'écoute. Le port `0` laisse le système choisir un port libre.
+    authkey : bytes
+        Clé d'authentification partagée avec le coordinateur.
+    finder_class : Type[Finder]
+        Classe du moteur de recherche.
+    database : Mapping[str, ndarray]
+        Partie de la base de données servie.
+    report : Connection, default: None
+        Connexion sur laquelle envoyer l'adresse effective d'écoute.
+    """
+    with Listener(address, authkey=authkey) as listener:
+        if report is not None:
+            report.send(listener.address)
+            report.close()
+        with listener.accept() as connection:
+            _serve(connection, finder_class, database)
+
+
+class ShardedFinder(Finder):
+    """
+    Recherche répartie entre plusieurs processus.
+
+    La base est découpée en `shards` parties contiguës, chacune servie par un processus qui calcule les meilleurs
+    résultats de sa partie. Le coordinateur extrait les requêtes, les envoie à toutes les parties puis fusionne les
+    résultats partiels en un classement global. Les résultats ont le même format que ceux de `Finder.search`.
+
+    Avec le transport `socket`, chaque partie est servie par `serve` sur une adresse locale, comme le serait un nœud
+    distant ; avec le transport `process`, par un processus relié au coordinateur par un tube.
+
+    Chaque partie construit son propre index avec `build_index`. `save_index` l'enregistre à côté de la base sous un
+    nom propre à la partie et au découpage, relu par `load_index`.
+
+    Attributes
+    ----------
+    finder_class : Type[Finder]
+        Classe du moteur de recherche de chaque partie.
+    shards : int, default: 2
+        Nombre de parties.
+    transport : str, default: "process"
+        Transport entre le coordinateur et les parties : `process` ou `socket`.
+
+    Methods
+    -------
+    save_index(data_path: str, name: str)
+        Enregistrement de l'index de chaque partie.
+    close()
+        Arrêt des processus.
+    """
+
+    def __init__(
+        self,
+        finder_class: Type[Finder],
+        extractor: Extractor,
+        database: Optional[Mapping[str, ndarray]] = None,
+        shards: int = 2,
+        transport: str = "process",
+    ):
+        if transport not in ("process", "socket"):
+            raise ValueError(f"Transport inconnu : {transport}.")
+        self.finder_class, self.shards, self.transport = finder_class, shards, transport
+        self.metric, self.largest = finder_class.metric, finder_class.largest
+        self.connections: List[Connection] = []
+        self.processes: List[mp.Process] = []
+        self.offsets: Optional[ndarray] = None
+        # ##: Searches run outside of the finder lock, but each connection carries one command at a time.
+        self._pipes = threading.Lock()
+        super().__init__(extractor, database)
+
+    def _start(self, shard: Mapping[str, ndarray]) -> Connection:
+        """
+        Démarrage du processus servant une partie de la base.
+
+        Parameters
+        ----------
+        shard : Mapping[str, ndarray]
+            Partie de la base de données.
+
+        Returns
+        -------
+        Connection
+            Connexion avec le processus.
+        """
+        context = mp.get_context("spawn")
+        if self.transport == "process":
+            connection, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, self.finder_class, shard), daemon=True)
+            process.start()
+            child.close()
+        else:
+            authkey, (report, child) = os.urandom(16), context.Pipe(duplex=False)
+            process = context.Process(
+                target=serve,
+                args=(("localhost", 0), authkey, self.finder_class, shard, child),
+                daemon=True,
+            )
+            process.start()
+            connection = Client(report.recv(), authkey=authkey)
+        self.processes.append(process)
+        return connection
+
+    def _prepare(self, database: Mapping[str, ndarray]):
+        """
+        Découpage de la base et démarrage d'un processus par partie. Seuls les labels restent dans le coordinateur.
+
+        Parameters
+        ----------
+        database : Mapping[str, ndarray]
+            Dictionnaires des données et des labels.
+        """
+        self.close()
+        bounds = np.linspace(0, len(database["features"]), self.shards + 1).astype(np.int64)
+        self.offsets = bounds[:-1]
+        self.database, self.index = {"colors": database["colors"], "styles": database["styles"]}, None
+        self._index_labels()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            self.connections.append(self._start({key: value[start:end] for key, value in database.items()}))
+
+    def change_database(self, data_path: str):
+        """
+        Changement de la base des données caractéristiques, découpée entre les parties.
+
+        Les parties servent une base figée et ses données d'origine : la projection éventuellement enregistrée à côté
+        de la base n'est pas appliquée, et la base doit avoir été compactée.
+
+        Parameters
+        ----------
+        data_path : str
+            Chemin des données à charger.
+
+        Raises
+        ------
+        ValueError
+            Si la base a des segments ou des suppressions qui n'ont pas été fusionnés par `compact`.
+        """
+        segments, removed = load_segments(data_path)
+        if segments or removed.size:
+            raise ValueError(f"La base {data_path} a des modifications non fusionnées : elle doit être compactée.")
+        with self._lock:
+            self._prepare(load_database(data_path=data_path))
+            self.data_path = data_path
+
+    def _as_matrix(self, features: ndarray) -> ndarray:
+        """
+        Les requêtes sont converties par chaque partie.
+
+        Parameters
+        ----------
+        features : ndarray
+            Données caractéristiques.
+
+        Returns
+        -------
+        ndarray
+            Données caractéristiques inchangées.
+        """
+        return np.asarray(features)
+
+    def _broadcast(self, *command: Any) -> List[Any]:
+        """
+        Envoi d'une commande à toutes les parties, puis collecte des réponses.
+
+        Parameters
+        ----------
+        *command : Any
+            Nom et arguments de la commande.
+
+        Returns
+        -------
+        List[Any]
+            Réponse de chaque partie.
+        """
+        return self._dispatch([command] * len(self.connections))
+
+    def _dispatch(self, commands: Sequence[Tuple[Any, ...]]) -> List[Any]:
+        """
+        Envoi d'une commande propre à chaque partie, puis collecte des réponses.
+
+        Parameters
+        ----------
+        commands : Sequence[Tuple[Any, ...]]
+            Nom et arguments de la commande de chaque partie.
+
+        Returns
+        -------
+        List[Any]
+            Réponse de chaque partie.
+        """
+        if not self.connections:
+            raise RuntimeError("Aucune base de données n'a été fournie.")
+        with self._pipes:
+            for connection, command in zip(self.connections, commands):
+                connection.send(command)
+            replies = [connection.recv() for connection in self.connections]
+        results = []
+        for status, result in replies:
+            if status == "error":
+                raise RuntimeError(f"Une partie de la base a échoué : {result!r}.") from result
+            results.append(result)
+        return results
+
+    def _split(self, command: Tuple[Any, ...], rows: Optional[ndarray]) -> List[Tuple[Any, ...]]:
+        """
+        Commande de chaque partie, complétée par les lignes de la partie parmi celles demandées.
+
+        Parameters
+        ----------
+        command : Tuple[Any, ...]
+            Nom et premiers arguments de la commande.
+        rows : Optional[ndarray]
+            Indices des lignes de la base, dans l'ordre croissant, ou `None` pour toute la base.
+
+        Returns
+        -------
+        List[Tuple[Any, ...]]
+            Commande de chaque partie.
+        """
+        if rows is None:
+            return [(*command, None)] * len(self.connections)
+        # ##: Each shard receives its own rows, relative to its first row.
+        bounds = np.searchsorted(rows, np.append(self.offsets, len(self.database["colors"])))
+        return [
+            (*command, rows[start:end] - offset) for start, end, offset in zip(bounds[:-1], bounds[1:], self.offsets)
+        ]
+
+    def _search(self, vectors: ndarray, depth: int, rows: Optional[ndarray] = None) -> Tuple[ndarray, ndarray]:
+        """
+        Recherche dans toutes les parties et fusion des résultats.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        depth : int
+            Nombre de voisins à retourner par requête.
+        rows : ndarray, default: None
+            Indices des lignes de la base parmi lesquelles chercher. Par défaut, toute la base.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Scores et identifiants globaux des voisins. Les places vides ont l'identifiant `-1`.
+        """
+        results = self._dispatch(self._split(("search", vectors, depth), rows))
+        scores = [score for score, _ in results]
+        ids = [np.where(nearest >= 0, nearest + offset, -1) for (_, nearest), offset in zip(results, self.offsets)]
+        return distance.merge(scores, ids, depth, self.largest)
+
+    def _compute_distance(self, vectors: ndarray, rows: Optional[ndarray] = None) -> ndarray:
+        """
+        Calcul des distances dans toutes les parties, puis concaténation dans l'ordre des lignes de la base.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrice des vecteurs caractéristiques, de taille `(n_requêtes, dimension)`.
+        rows : ndarray, default: None
+            Indices des lignes de la base comparées, dans l'ordre croissant. Par défaut, toute la base.
+
+        Returns
+        -------
+        ndarray
+            Distances avec les éléments la base de données, de taille `(n_requêtes, n_lignes)`.
+        """
+        return np.hstack(self._dispatch(self._split(("distance", vectors), rows)))
+
+    def change_index(self, index: Index):
+        """
+        Un index construit sur la base entière ne peut pas être réparti entre les parties : chacune construit le
+        sien avec `build_index` ou le charge avec `load_index`.
+
+        Parameters
+        ----------
+        index : Index
+            Index construit sur la base de données.
+
+        Raises
+        ------
+        TypeError
+            Dans tous les cas.
+        """
+        raise TypeError(
+            "Chaque partie utilise son propre index, construit avec `build_index` ou chargé avec `load_index`."
+        )
+
+    def build_index(self, name: str, **params) -> None:
+        """
+        Construction d'un index dans chaque partie.
+
+        Parameters
+        ----------
+        name : str
+            Nom du type d'index.
+        **params
+            Paramètres de l'index.
+        """
+        self._broadcast("build_index", name, params)
+
+    def save_index(self, data_path: str, name: str):
+        """
+        Enregistrement de l'index de chaque partie, à côté de la base de données sous un nom propre à la partie.
+
+        Parameters
+        ----------
+        data_path : str
+            Chemin de la base de données.
+        name : str
+            Nom du type d'index.
+        """
+        self._dispatch(
+            [("save_index", shard_path(data_path, shard, self.shards), name) for shard in range(self.shards)]
+        )
+
+    def load_index(self, data_path: str, name: str):
+        """
+        Chargement de l'index de chaque partie, enregistré par `save_index` avec le même découpage.
+
+        Parameters
+        ----------
+        data_path : str
+            Chemin de la base de données.
+        name : str
+            Nom du type d'index.
+        """
+        self._dispatch(
+            [("load_index", shard_path(data_path, shard, self.shards), name) for shard in range(self.shards)]
+        )
+
+    def change_reducer(self, reducer: Optional[PCAReducer]):
+        """
+        Les parties servent les données d'origine : la base répartie ne peut pas être projetée.
+
+        Parameters
+        ----------
+        reducer : Optional[PCAReducer]
+            Seule la valeur `None`, sans projection, est acceptée.
+
+        Raises
+        ------
+        TypeError
+            Si une projection est fournie.
+        """
+        if reducer is not None:
+            raise TypeError("La base répartie ne peut pas être projetée.")
+
+    def add(self, wanted: Any, colors: Any, styles: Any) -> ndarray:
+        """
+        Les parties servent une base figée : la base répartie ne peut pas être modifiée en service.
+
+        Parameters
+        ----------
+        wanted : Any
+            Images à ajouter.
+        colors : Any
+            Couleurs des images.
+        styles : Any
+            Styles des images.
+
+        Raises
+        ------
+        TypeError
+            Dans tous les cas.
+        """
+        raise TypeError("La base répartie ne peut pas être modifiée en service.")
+
+    def remove(self, ids: Any):
+        """
+        Les parties servent une base figée : la base répartie ne peut pas être modifiée en service.
+
+        Parameters
+        ----------
+        ids : Any
+            Identifiants des images à supprimer.
+
+        Raises
+        ------
+        TypeError
+            Dans tous les cas.
+        """
+        raise TypeError("La base répartie ne peut pas être modifiée en service.")
+
+    def compact(self, background: bool = False) -> None:
+        """
+        Les parties servent une base figée, sans segment à fusionner.
+
+        Parameters
+        ----------
+        background : bool, default: False
+            Fusion dans un fil d'exécution séparé.
+
+        Raises
+        ------
+        TypeError
+            Dans tous les cas.
+        """
+        raise TypeError("La base répartie ne peut pas être modifiée en service.")
+
+    def close(self):
+        """
+        Arrêt des processus.
+        """
+        with self._pipes:
+            connections, processes = self.connections, self.processes
+            self.connections, self.processes = [], []
+        for connection in connections:
+            try:
+                connection.send(("close",))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in processes:
+            process.join(timeout=5)
+
+    def __enter__(self) -> "ShardedFinder":
+        return self
+
+    def __exit__(self, *exc: Any):
+        self.close()
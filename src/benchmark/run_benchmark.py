@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Script pour la mesure des performances de recherche sur des bases de données synthétiques.
+"""
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from numpy import ndarray
+from rich.console import Console
+from rich.table import Table
+
+from src.addons.finder import (
+    CosinusFinder,
+    EuclideanFinder,
+    Finder,
+    HammingFinder,
+    ManhattanFinder,
+)
+from src.addons.profiling import profiler
+
+# ##: Dimension and type of the vectors produced by each extractor.
+profiles = {
+    "descriptor": {"dimension": 64 * 32, "binary": False},
+    "descriptor_binary": {"dimension": 32 * 32, "binary": True},
+    "VGG": {"dimension": 4096, "binary": False},
+    "NasNet": {"dimension": 4032, "binary": False},
+    "EfficientNet": {"dimension": 2560, "binary": False},
+}
+finders = {"cosinus": CosinusFinder, "euclidean": EuclideanFinder, "manhattan": ManhattanFinder}
+binary_finders = {"hamming": HammingFinder}
+
+
+def synthetic_database(size: int, dimension: int, binary: bool = False, seed: int = 1331) -> Dict[str, ndarray]:
+    """
+    Génération d'une base de données caractéristiques synthétique.
+
+    Les vecteurs réels sont positifs et regroupés autour de centres, comme les sorties des réseaux de neurones après
+    activation ReLU ; les descripteurs binaires sont des octets aléatoires.
+
+    Parameters
+    ----------
+    size : int
+        Nombre de vecteurs.
+    dimension : int
+        Dimension des vecteurs, en octets pour les descripteurs binaires.
+    binary : bool, default: False
+        Génération de descripteurs binaires.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+
+    Returns
+    -------
+    Dict[str, ndarray]
+        Base de données au format de `load_database`.
+    """
+    generator = np.random.default_rng(seed)
+    labels = generator.integers(0, 32, size=size)
+    if binary:
+        features = generator.integers(0, 256, size=(size, dimension), dtype=np.uint8)
+    else:
+        centers = generator.standard_normal((32, dimension), dtype=np.float32)
+        features = np.empty((size, dimension), dtype=np.float32)
+        for start in range(0, size, 8192):
+            chunk = labels[start : start + 8192]
+            noise = generator.standard_normal((chunk.size, dimension), dtype=np.float32)
+            features[start : start + 8192] = np.abs(centers[chunk] + noise)
+    return {
+        "features": features,
+        "colors": np.array([f"color{label % 8}" for label in labels]),
+        "styles": np.array([f"style{label // 8}" for label in labels]),
+    }
+
+
+def _summary(latencies: Sequence[float], queries: int, elapsed: float) -> Dict[str, float]:
+    """
+    Résumé d'une série de mesures.
+
+    Parameters
+    ----------
+    latencies : Sequence[float]
+        Durées des appels, en secondes.
+    queries : int
+        Nombre total de requêtes traitées.
+    elapsed : float
+        Durée totale, en secondes.
+
+    Returns
+    -------
+    Dict[str, float]
+        Latences en millisecondes (moyenne, p50, p95, p99) et débit en requêtes par seconde.
+    """
+    latencies = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {"mean_ms": float(latencies.mean()), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "qps": queries / elapsed}
+
+
+def measure(finder: Finder, queries: ndarray, depth: int, batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Mesure des latences d'un moteur de recherche, requête par requête puis par lots.
+
+    Parameters
+    ----------
+    finder : Finder
+        Moteur de recherche, avec sa base de données.
+    queries : ndarray
+        Matrice des requêtes.
+    depth : int
+        Nombre d'images retournées par requête.
+    batch_size : int
+        Nombre de requêtes par lot.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Une mesure pour les requêtes isolées et une pour les lots.
+    """
+    # ##: Warm up caches and lazy imports.
+    finder.search_batch(queries[:1], depth=depth)
+
+    results = []
+    for mode, size in (("single", 1), ("batch", batch_size)):
+        latencies, start = [], time.perf_counter()
+        for offset in range(0, queries.shape[0], size):
+            begin = time.perf_counter()
+            finder.search_batch(queries[offset : offset + size], depth=depth)
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+        results.append({"mode": mode, "batch_size": size, **_summary(latencies, queries.shape[0], elapsed)})
+    return results
+
+
+def run_benchmark(
+    output_path: str,
+    sizes: Sequence[int] = (1_000, 10_000, 50_000),
+    depths: Sequence[int] = (1, 5, 20),
+    queries: int = 256,
+    batch_size: int = 64,
+    seed: int = 1331,
+    profile: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Mesure des performances de chaque moteur de recherche sur des bases synthétiques.
+
+    Les résultats sont enregistrés au format JSON dans `benchmark.json` et résumés dans un tableau.
+
+    Parameters
+    ----------
+    output_path : str
+        Répertoire où stocker les résultats.
+    sizes : Sequence[int], default: (1_000, 10_000, 50_000)
+        Tailles des bases de données.
+    depths : Sequence[int], default: (1, 5, 20)
+        Nombres d'images retournées par requête.
+    queries : int, default: 256
+        Nombre de requêtes par mesure.
+    batch_size : int, default: 64
+        Nombre de requêtes par lot.
+    seed : int, default: 1331
+        Graine du générateur aléatoire.
+    profile : bool, default: False
+        Mesure de la durée de chaque étape de la recherche, enregistrée sous la clé `stages` et affichée.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Une mesure par profil, moteur, taille, profondeur et mode.
+    """
+    if profile:
+        profiler.reset()
+        profiler.enable()
+
+    results = []
+    for name, config in profiles.items():
+        group = binary_finders if config["binary"] else finders
+        for size in sizes:
+            database = synthetic_database(size + queries, config["dimension"], config["binary"], seed)
+            wanted = database["features"][size:]
+            database = {key: value[:size] for key, value in database.items()}
+            for finder_method, finder_func in group.items():
+                finder = finder_func(None, database)
+                for depth in depths:
+                    for measurement in measure(finder, wanted, depth, batch_size):
+                        results.append(
+                            {
+                                "profile": name,
+                                "finder": finder_method,
+                                "size": size,
+                                "dimension": config["dimension"],
+                                "depth": depth,
+                                **measurement,
+                            }
+                        )
+
+    # ##: Machine-readable results.
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if profile:
+        report["stages"] = profiler.summary()
+    with open(os.path.join(output_path, "benchmark.json"), "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    # ##: Summary.
+    table = Table(title="Performances de recherche")
+    for column in ("profile", "finder", "size", "depth", "mode", "p50_ms", "p95_ms", "p99_ms", "qps"):
+        table.add_column(column, justify="left" if column in ("profile", "finder", "mode") else "right")
+    for result in results:
+        table.add_row(
+            result["profile"],
+            result["finder"],
+            str(result["size"]),
+            str(result["depth"]),
+            result["mode"],
+            *[f"{result[key]:.2f}" for key in ("p50_ms", "p95_ms", "p99_ms")],
+            f"{result['qps']:.0f}",
+        )
+    Console().print(table)
+    if profile:
+        Console().print(profiler.table())
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    required_vars = ["EVALUATION_PATH"]
+    missing = [var for var in required_vars if not os.environ.get(var, "").strip()]
+    if missing:
+        print(
+            f"Error: Missing required environment variable(s): {', '.join(missing)}\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set the variables in your .env file\n"
+            "  3. Export the variables in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    run_benchmark(
+        output_path=os.environ["EVALUATION_PATH"],
+        profile=os.environ.get("PROFILE", "").lower() in ("1", "true", "yes"),
+    )
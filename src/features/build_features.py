@@ -2,50 +2,252 @@
 """
 Script pour l'extraction des données caractéristiques des images.
 """
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from os.path import join
+from typing import Any, Callable, List, Mapping, Optional, Tuple
 
+import numpy as np
 import polars as pl
-from polars import DataFrame
 from rich.progress import Progress
 
-from src.addons.extraction.extractor import extractors
+from src.addons.data import DatabaseWriter
+from src.addons.extraction.extractor import binary_extractors, extractors
+from src.addons.extraction.image import read_image
 
+# ##: Extractor of a worker process, created once by `_init_worker`.
+_worker_extractor: Any = None
 
-def extract_features(input_path: str, output_path: str):
+
+def _init_worker(extractor_func: Callable):
+    """
+    Création de l'extracteur d'un processus de calcul.
+
+    Parameters
+    ----------
+    extractor_func : Callable
+        Constructeur de l'extracteur.
+    """
+    global _worker_extractor
+    _worker_extractor = extractor_func()
+
+
+def _extract_worker(image_path: str) -> Optional[np.ndarray]:
+    """
+    Extraction des données caractéristiques d'une image dans un processus de calcul.
+
+    Parameters
+    ----------
+    image_path : str
+        Chemin de l'image.
+
+    Returns
+    -------
+    ndarray
+        Données caractéristiques de l'image, ou `None`.
+    """
+    return _worker_extractor.extract(image_path=image_path)
+
+
+def extract_features(
+    input_path: str, output_path: str, batch_size: int = 32, chunk_size: int = 4096, workers: Optional[int] = None
+):
     """
     Extraction des données caractéristiques afin de constituer les bases de données.
 
+    Les images sont traitées par blocs de `chunk_size`, écrits sur disque dès qu'ils sont terminés : une extraction
+    interrompue reprend au premier bloc manquant et la mémoire utilisée reste bornée par la taille d'un bloc. Les
+    réseaux de neurones traitent les images par lots, les descripteurs sont répartis entre plusieurs processus.
+
     Parameters
     ----------
     input_path : str
         Répertoire contenant les données.
     output_path : str
         Répertoire où stocker les bases de données.
+    batch_size : int, default: 32
+        Nombre d'images par lot pour les réseaux de neurones.
+    chunk_size : int, default: 4096
+        Nombre d'images par bloc.
+    workers : int, default: None
+        Nombre de processus pour les descripteurs. Par défaut, le nombre de processeurs.
     """
     # ##: Prepare necessary.
     data = pl.read_parquet(join(input_path, "train.parquet"))
 
     # ##: Build database.
+    methods = {**extractors, **binary_extractors}
     with Progress() as progress:
-        overall_task = progress.add_task("[green]Création des base de données ...", total=len(extractors))
-        for method, extractor_func in extractors.items():
-            extract_task = progress.add_task(f"Extraction avec la méthode {method}", total=data.shape[0])
-
-            # ##: Build database.
-            database, extractor = [], extractor_func()
-            for content in data.to_dicts():
-                feature = extractor.extract(image_path=content["path"])
-                if feature is not None:
-                    color, style = content["label"].split("_")
-                    database.append({"feature": list(feature), "color": color, "style": style})
-                progress.advance(extract_task)
+        overall_task = progress.add_task("[green]Création des base de données ...", total=len(methods))
+        for method, extractor_func in methods.items():
+            writer = DatabaseWriter(join(output_path, f"{method}_db.parquet"), chunk_size, total=data.shape[0])
+            pending = writer.pending()
+            remaining = sum(min(chunk_size, data.shape[0] - chunk * chunk_size) for chunk in pending)
+            extract_task = progress.add_task(
+                f"Extraction avec la méthode {method}", total=data.shape[0], completed=data.shape[0] - remaining
+            )
+
+            # ##: Descriptors are spread over worker processes, each building its own extractor.
+            extractor, pool = extractor_func(), None
+            if not hasattr(extractor, "extract_batch"):
+                pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(extractor_func,))
+            try:
+                for chunk in pending:
+                    features, colors, styles = [], [], []
+                    contents = data.slice(chunk * chunk_size, chunk_size).to_dicts()
+                    paths = [content["path"] for content in contents]
+                    if pool is None:
+                        found = extractor.extract_batch(paths, batch_size=batch_size)
+                    else:
+                        found = pool.map(_extract_worker, paths, chunksize=max(1, len(paths) // 64))
+
+                    for content, feature in zip(contents, found):
+                        if feature is not None:
+                            color, style = content["label"].split("_")
+                            features.append(feature)
+                            colors.append(color)
+                            styles.append(style)
+                        progress.advance(extract_task)
+
+                    # ##: Save chunk.
+                    writer.write(chunk, np.stack(features) if features else np.empty((0, 0)), colors, styles)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
 
             # ##: Save database.
-            database = DataFrame(database)
-            database.write_parquet(join(output_path, f"{method}_db.parquet"))
+            writer.finalize()
             progress.advance(overall_task)
 
 
+def _decode_size(methods: Mapping[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    Taille minimale de décodage des images, suffisante pour tous les extracteurs.
+
+    Parameters
+    ----------
+    methods : Mapping[str, Any]
+        Extracteurs par méthode.
+
+    Returns
+    -------
+    Optional[Tuple[int, int]]
+        Hauteur et largeur minimales des images décodées, ou `None` pour la pleine résolution.
+    """
+    sides = []
+    for extractor in methods.values():
+        if hasattr(extractor, "image_size"):
+            if extractor.image_size is None:
+                return None
+            sides.append(extractor.image_size)
+        else:
+            sides.extend((extractor.height, extractor.width))
+    return (max(sides), max(sides)) if sides else None
+
+
+def _write_chunk(writer: DatabaseWriter, chunk: int, features: List[np.ndarray], colors: List[str], styles: List[str]):
+    """
+    Écriture d'un bloc d'une base de données.
+
+    Parameters
+    ----------
+    writer : DatabaseWriter
+        Écriture de la base de données.
+    chunk : int
+        Numéro du bloc.
+    features : List[ndarray]
+        Données caractéristiques des images du bloc.
+    colors : List[str]
+        Couleurs des images du bloc.
+    styles : List[str]
+        Styles des images du bloc.
+    """
+    writer.write(chunk, np.stack(features) if features else np.empty((0, 0)), colors, styles)
+
+
+def extract_features_once(
+    input_path: str,
+    output_path: str,
+    batch_size: int = 32,
+    chunk_size: int = 4096,
+    workers: Optional[int] = None,
+    methods: Optional[Mapping[str, Callable]] = None,
+):
+    """
+    Extraction des données caractéristiques de toutes les méthodes en une seule lecture des images.
+
+    Chaque image est lue et décodée une seule fois, à la plus petite résolution suffisante pour tous les extracteurs,
+    puis transmise à chacun d'eux. Les extracteurs travaillent en parallèle, chacun dans son fil d'exécution, pendant
+    la lecture du lot suivant ; les blocs de chaque base sont écrits en parallèle. Les bases restent reprenables
+    comme avec `extract_features`.
+
+    Parameters
+    ----------
+    input_path : str
+        Répertoire contenant les données.
+    output_path : str
+        Répertoire où stocker les bases de données.
+    batch_size : int, default: 32
+        Nombre d'images décodées ensemble.
+    chunk_size : int, default: 4096
+        Nombre d'images par bloc.
+    workers : int, default: None
+        Nombre de fils d'exécution pour la lecture des images. Par défaut, choisi par `ThreadPoolExecutor`.
+    methods : Mapping[str, Callable], default: None
+        Constructeurs des extracteurs par méthode. Par défaut, tous les extracteurs enregistrés.
+    """
+    data = pl.read_parquet(join(input_path, "train.parquet"))
+    methods = methods if methods is not None else {**extractors, **binary_extractors}
+    writers = {
+        method: DatabaseWriter(join(output_path, f"{method}_db.parquet"), chunk_size, total=data.shape[0])
+        for method in methods
+    }
+    pending = {method: set(writer.pending()) for method, writer in writers.items()}
+    chunks = sorted(set().union(*pending.values()))
+    instances = {method: extractor_func() for method, extractor_func in methods.items()}
+    target = _decode_size(instances)
+
+    with Progress() as progress, ThreadPoolExecutor(workers) as readers, ThreadPoolExecutor(len(methods)) as fan:
+        remaining = sum(min(chunk_size, data.shape[0] - chunk * chunk_size) for chunk in chunks)
+        extract_task = progress.add_task(
+            "[green]Extraction avec toutes les méthodes", total=data.shape[0], completed=data.shape[0] - remaining
+        )
+        for chunk in chunks:
+            contents = data.slice(chunk * chunk_size, chunk_size).to_dicts()
+            active = [method for method in methods if chunk in pending[method]]
+            results = {method: ([], [], []) for method in active}
+
+            # ##: The next batch is read while the extractors work on the current one.
+            batches = [contents[start : start + batch_size] for start in range(0, len(contents), batch_size)]
+            loading = readers.map(partial(read_image, target=target), [content["path"] for content in batches[0]])
+            for index, batch in enumerate(batches):
+                images = list(loading)
+                if index + 1 < len(batches):
+                    paths = [content["path"] for content in batches[index + 1]]
+                    loading = readers.map(partial(read_image, target=target), paths)
+
+                kept = [(content, image) for content, image in zip(batch, images) if image is not None]
+                decoded = [image for _, image in kept]
+                found = {method: fan.submit(instances[method].extract_images, decoded) for method in active}
+                for method in active:
+                    features, colors, styles = results[method]
+                    for (content, _), feature in zip(kept, found[method].result()):
+                        if feature is not None:
+                            color, style = content["label"].split("_")
+                            features.append(feature)
+                            colors.append(color)
+                            styles.append(style)
+                progress.advance(extract_task, len(batch))
+
+            # ##: Save chunk of every database.
+            saving = [fan.submit(_write_chunk, writers[method], chunk, *results[method]) for method in active]
+            for future in saving:
+                future.result()
+
+        # ##: Save databases.
+        list(fan.map(DatabaseWriter.finalize, writers.values()))
+
+
 if __name__ == "__main__":
     import os
     import sys
@@ -67,7 +269,7 @@ if __name__ == "__main__":
         )
         sys.exit(1)
 
-    extract_features(
-        input_path=os.environ["INPUT_PATH"],
-        output_path=os.environ["FEATURE_PATH"],
-    )
+    build = extract_features
+    if os.environ.get("FEATURES_SINGLE_PASS", "").lower() in ("1", "true", "yes"):
+        build = extract_features_once
+    build(input_path=os.environ["INPUT_PATH"], output_path=os.environ["FEATURE_PATH"])
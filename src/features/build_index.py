@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Script pour la construction des index de recherche approximative.
+"""
+from os.path import exists, join
+
+from rich.progress import track
+
+from src.addons.data import load_database
+from src.addons.extraction.extractor import extractors
+from src.addons.finder import CosinusFinder, EuclideanFinder, ManhattanFinder
+from src.addons.indexing.index import index_path, indexes
+from src.addons.reduction import saved_reducer
+
+
+def build_indexes(feature_path: str, name: str = "ivf", **params):
+    """
+    Construction et enregistrement d'un index par base de données et par métrique.
+
+    Les index sont enregistrés à côté des bases de données, sous le nom `{method}_db_{name}_{metric}.npz`. Les
+    métriques non supportées par le type d'index sont ignorées. Les index sont construits dans l'espace de la
+    projection enregistrée à côté de la base, s'il y en a une, comme les recherches de `Finder.change_database`.
+
+    Parameters
+    ----------
+    feature_path : str
+        Répertoire contenant les bases de données caractéristiques.
+    name : str, default: "ivf"
+        Nom du type d'index.
+    **params
+        Paramètres de l'index.
+    """
+    for method in track(list(extractors), description="Construction des index ..."):
+        data_path = join(feature_path, f"{method}_db.parquet")
+        if not exists(data_path):
+            continue
+
+        database, reducer = load_database(data_path), saved_reducer(data_path)
+        for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+            if finder_class.metric not in indexes[name].metrics:
+                continue
+            finder = finder_class(None, database, reducer=reducer)
+            index = finder.build_index(name, **params)
+            index.save(index_path(data_path, name=name, metric=finder.metric))
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    if not os.environ.get("FEATURE_PATH", "").strip():
+        print(
+            "Error: FEATURE_PATH environment variable is not set or is empty.\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set FEATURE_PATH in your .env file\n"
+            "  3. Export FEATURE_PATH in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    build_indexes(feature_path=os.environ["FEATURE_PATH"], name=os.environ.get("INDEX_TYPE", "ivf"))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Script pour l'apprentissage des projections de réduction de dimension.
+"""
+from os.path import exists, join
+
+from rich.progress import track
+
+from src.addons.data import load_database
+from src.addons.distance import largests
+from src.addons.extraction.extractor import extractors
+from src.addons.indexing.index import remove_indexes
+from src.addons.reduction import PCAReducer, reducer_path
+
+
+def build_reducers(feature_path: str, dimension: int = 256, whiten: bool = False):
+    """
+    Apprentissage et enregistrement d'une projection par base de données.
+
+    Les projections sont enregistrées à côté des bases de données, sous le nom `{method}_db_pca.npz`, et chargées
+    automatiquement avec leur base par `Finder.change_database` et par `make_prediction`. Les bases dont la dimension
+    ne dépasse pas `dimension` sont ignorées. Les index enregistrés à côté d'une base projetée, construits dans
+    l'ancien espace, sont supprimés : ils doivent être reconstruits avec `make index`.
+
+    Parameters
+    ----------
+    feature_path : str
+        Répertoire contenant les bases de données caractéristiques.
+    dimension : int, default: 256
+        Nombre de composantes retenues.
+    whiten : bool, default: False
+        Division de chaque composante par son écart type.
+    """
+    for method in track(list(extractors), description="Apprentissage des projections ..."):
+        data_path = join(feature_path, f"{method}_db.parquet")
+        if not exists(data_path):
+            continue
+
+        features = load_database(data_path)["features"]
+        if features.shape[1] <= dimension:
+            continue
+        reducer = PCAReducer.fit(features, dimension, whiten=whiten)
+        reducer.save(reducer_path(data_path))
+        remove_indexes(data_path, largests)
+        print(f"{method} : {features.shape[1]} -> {dimension} dimensions, {reducer.explained:.1%} de la variance.")
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    if not os.environ.get("FEATURE_PATH", "").strip():
+        print(
+            "Error: FEATURE_PATH environment variable is not set or is empty.\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set FEATURE_PATH in your .env file\n"
+            "  3. Export FEATURE_PATH in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    build_reducers(
+        feature_path=os.environ["FEATURE_PATH"],
+        dimension=int(os.environ.get("REDUCER_DIMENSION", 256)),
+        whiten=os.environ.get("REDUCER_WHITEN", "").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Script pour la construction des bases de données en sac de mots visuels.
+"""
+from functools import partial
+from os.path import join
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+import polars as pl
+from numpy import ndarray
+from rich.progress import Progress
+
+from src.addons.data import save_database
+from src.addons.extraction.descriptor import (
+    AKAZEDescriptor,
+    Descriptor,
+    ORBDescriptor,
+    SIFTDescriptor,
+)
+from src.addons.extraction.vocabulary import VisualVocabulary
+from src.addons.indexing.index import index_path
+from src.addons.indexing.inverted import InvertedIndex
+
+descriptors = {"AKAZE": AKAZEDescriptor, "ORB": ORBDescriptor, "SIFT": SIFTDescriptor}
+
+
+def describe(descriptor: Descriptor, paths: Sequence[str], advance: Callable) -> Iterator[ndarray]:
+    """
+    Flux des descripteurs des points clés de chaque image.
+
+    Parameters
+    ----------
+    descriptor : Descriptor
+        Descripteur utilisé.
+    paths : Sequence[str]
+        Chemins des images.
+    advance : Callable
+        Fonction appelée après chaque image.
+
+    Yields
+    ------
+    ndarray
+        Descripteurs des points clés d'une image.
+    """
+    for path in paths:
+        found = descriptor.describe(image_path=path)
+        advance()
+        if found is not None:
+            yield found
+
+
+def build_vocabularies(input_path: str, output_path: str, size: int = 2048, sample_size: int = 2000):
+    """
+    Apprentissage des vocabulaires visuels, puis création des bases de vecteurs TF-IDF et de leurs index inversés.
+
+    Pour chaque descripteur, les fichiers suivants sont créés :
+
+    * `{method}_vocabulary.npz` : vocabulaire visuel et fréquences documentaires inverses de ses mots ;
+    * `{method}_bovw_db.parquet` et `{method}_bovw_db.npy` : base des vecteurs TF-IDF normalisés ;
+    * `{method}_bovw_db_inverted_cosine.npz` : index inversé TF-IDF.
+
+    Les requêtes sont pondérées de la même façon par `BagOfWordsExtractor` : la recherche exhaustive, la recherche
+    filtrée et l'index inversé donnent les mêmes similarités cosinus TF-IDF.
+
+    Parameters
+    ----------
+    input_path : str
+        Répertoire contenant les données.
+    output_path : str
+        Répertoire où stocker les bases de données.
+    size : int, default: 2048
+        Nombre de mots visuels.
+    sample_size : int, default: 2000
+        Nombre d'images utilisées pour l'apprentissage des vocabulaires.
+    """
+    data = pl.read_parquet(join(input_path, "train.parquet"))
+    sample = data.sample(n=min(sample_size, data.shape[0]), seed=1331)
+
+    with Progress() as progress:
+        overall_task = progress.add_task("[green]Création des vocabulaires ...", total=len(descriptors))
+        for method, descriptor_func in descriptors.items():
+            descriptor = descriptor_func()
+
+            # ##: Vocabulary trained on a sample of images.
+            vocabulary_task = progress.add_task(f"Vocabulaire {method}", total=sample.shape[0])
+            vocabulary = VisualVocabulary(size=size)
+            vocabulary.fit(
+                describe(descriptor, sample.get_column("path").to_list(), partial(progress.advance, vocabulary_task))
+            )
+
+            # ##: Histograms of every image.
+            extract_task = progress.add_task(f"Histogrammes {method}", total=data.shape[0])
+            histograms, colors, styles = [], [], []
+            for content in data.to_dicts():
+                found = descriptor.describe(image_path=content["path"])
+                if found is not None:
+                    color, style = content["label"].split("_")
+                    histograms.append(vocabulary.histogram(found))
+                    colors.append(color)
+                    styles.append(style)
+                progress.advance(extract_task)
+
+            # ##: Inverse document frequencies learned on the database, shared with the queries.
+            histograms = np.stack(histograms)
+            vocabulary.fit_idf(histograms)
+            vocabulary.save(join(output_path, f"{method}_vocabulary.npz"))
+
+            # ##: Save database and inverted index.
+            data_path = join(output_path, f"{method}_bovw_db.parquet")
+            features = vocabulary.weight(histograms)
+            save_database(data_path, features, colors, styles)
+            index = InvertedIndex()
+            index.build(features)
+            index.save(index_path(data_path, name="inverted", metric=index.metric))
+            progress.advance(overall_task)
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    required_vars = ["INPUT_PATH", "FEATURE_PATH"]
+    missing = [var for var in required_vars if not os.environ.get(var, "").strip()]
+    if missing:
+        print(
+            f"Error: Missing required environment variable(s): {', '.join(missing)}\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set the variables in your .env file\n"
+            "  3. Export the variables in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    build_vocabularies(
+        input_path=os.environ["INPUT_PATH"],
+        output_path=os.environ["FEATURE_PATH"],
+    )
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Script pour l'export des réseaux de neurones au format TensorFlow Lite.
+"""
+from os.path import join
+from typing import Any, Dict, List, Optional
+
+import polars as pl
+from rich.console import Console
+from rich.table import Table
+
+from src.addons.extraction.extractor import extractors
+from src.addons.extraction.lite import LiteCompressor, compare, export_lite
+
+# ##: Extractors backed by a neural network.
+networks = ("VGG", "NasNet", "EfficientNet")
+
+
+def export_models(
+    input_path: str,
+    output_path: str,
+    quantization: Optional[str] = None,
+    samples: int = 64,
+    tolerance: float = 0.01,
+) -> List[Dict[str, Any]]:
+    """
+    Export de chaque réseau de neurones et vérification des données caractéristiques obtenues.
+
+    Les modèles sont enregistrés sous le nom `{method}.tflite`, ou `{method}_{quantization}.tflite`, et utilisables
+    avec `LiteCompressor`. Les données caractéristiques du modèle exporté sont comparées à celles du réseau d'origine
+    sur les premières images d'entraînement, qui servent aussi à calibrer la quantification `int8`.
+
+    Parameters
+    ----------
+    input_path : str
+        Répertoire contenant les données brutes.
+    output_path : str
+        Répertoire où stocker les modèles.
+    quantization : str, default: None
+        Quantification après apprentissage : `dynamic`, `float16` ou `int8`.
+    samples : int, default: 64
+        Nombre d'images utilisées pour la vérification et la calibration.
+    tolerance : float, default: 0.01
+        Écart maximal toléré entre 1 et la similarité cosinus des données caractéristiques d'une même image.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Résultat de la vérification de chaque modèle.
+    """
+    paths = pl.read_parquet(join(input_path, "train.parquet")).get_column("path").head(samples).to_list()
+
+    reports = []
+    for method in networks:
+        compressor = extractors[method]()
+        name = method if quantization is None else f"{method}_{quantization}"
+        model_path = export_lite(compressor, join(output_path, f"{name}.tflite"), quantization, representative=paths)
+        reports.append({"model": name, **compare(compressor, LiteCompressor(model_path), paths, tolerance)})
+
+    table = Table(title="Vérification des modèles exportés")
+    for column in ("model", "min_cosine", "max_norm_gap", "within_tolerance"):
+        table.add_column(column, justify="left" if column == "model" else "right")
+    for report in reports:
+        table.add_row(
+            report["model"],
+            f"{report['min_cosine']:.5f}",
+            f"{report['max_norm_gap']:.5f}",
+            str(report["within_tolerance"]),
+        )
+    Console().print(table)
+    return reports
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    required_vars = ["INPUT_PATH", "FEATURE_PATH"]
+    missing = [var for var in required_vars if not os.environ.get(var, "").strip()]
+    if missing:
+        print(
+            f"Error: Missing required environment variable(s): {', '.join(missing)}\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set the variables in your .env file\n"
+            "  3. Export the variables in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    results = export_models(
+        input_path=os.environ["INPUT_PATH"],
+        output_path=os.environ["FEATURE_PATH"],
+        quantization=os.environ.get("LITE_QUANTIZATION") or None,
+    )
+    if not all(result["within_tolerance"] for result in results):
+        sys.exit(1)
@@ -2,23 +2,78 @@
 """
 Script pour la recherche d'image par similarité.
 """
-from itertools import product
+import time
 from os.path import join
+from typing import Any, List, Tuple
 
+import numpy as np
 import polars as pl
+from numpy import ndarray
+from rich.console import Console
 from rich.progress import Progress
 
 from src.addons.data import load_database
-from src.addons.extraction.extractor import extractors
-from src.addons.finder import CosinusFinder, EuclideanFinder, Finder, ManhattanFinder
+from src.addons.extraction.extractor import binary_extractors, extractors
+from src.addons.finder import (
+    CosinusFinder,
+    EuclideanFinder,
+    Finder,
+    HammingFinder,
+    ManhattanFinder,
+)
+from src.addons.profiling import profiler
+from src.addons.reduction import saved_reducer
 
 finders = {"cosinus": CosinusFinder, "euclidean": EuclideanFinder, "manhattan": ManhattanFinder}
+binary_finders = {"hamming": HammingFinder}
 
 
-def inference(input_path: str, feature_path: str, output_path: str):
+def extract_queries(extractor: Any, paths: List[str], batch_size: int = 32) -> Tuple[ndarray, ndarray, float]:
+    """
+    Extraction, une seule fois, des données caractéristiques des images requêtes.
+
+    Le résultat est partagé par toutes les mesures de distance d'un même extracteur. Il n'est pas conservé entre deux
+    exécutions : les vecteurs et la durée d'extraction correspondent toujours à l'extracteur et aux images courants.
+
+    Parameters
+    ----------
+    extractor : Any
+        Extracteur de données caractéristiques.
+    paths : List[str]
+        Chemins des images requêtes.
+    batch_size : int, default: 32
+        Nombre d'images par lot pour les réseaux de neurones.
+
+    Returns
+    -------
+    Tuple[ndarray, ndarray, float]
+        Vecteurs caractéristiques trouvés, indices des images correspondantes et durée moyenne d'extraction par
+        image.
+    """
+    start_time = time.perf_counter()
+    if hasattr(extractor, "extract_batch"):
+        found = extractor.extract_batch(paths, batch_size=batch_size)
+    else:
+        found = map(lambda path: extractor.extract(image_path=path), paths)
+    features, rows = [], []
+    for row, feature in enumerate(found):
+        if feature is not None:
+            features.append(feature)
+            rows.append(row)
+    duration = (time.perf_counter() - start_time) / max(len(paths), 1)
+
+    features = np.stack(features) if features else np.empty((0, 0), dtype=np.float32)
+    return features, np.asarray(rows, dtype=np.int64), duration
+
+
+def inference(input_path: str, feature_path: str, output_path: str, batch_size: int = 256, profile: bool = False):
     """
     Élaboration et enregistrement de prédictions.
 
+    Chaque extracteur est construit une seule fois et les requêtes ne sont extraites qu'une fois : toutes les
+    mesures de distance sont évaluées sur les mêmes vecteurs. La durée d'une recherche inclut la durée moyenne
+    d'extraction d'une requête.
+
     Parameters
     ----------
     input_path : str
@@ -27,35 +82,65 @@ def inference(input_path: str, feature_path: str, output_path: str):
         Répertoire contenant les données caractéristiques.
     output_path : str
         Répertoire où stocker les prédictions.
+    batch_size : int, default: 256
+        Nombre de requêtes traitées ensemble par `Finder.search_batch`.
+    profile : bool, default: False
+        Mesure de la durée de chaque étape de l'extraction et de la recherche, affichée à la fin des prédictions.
     """
+    if profile:
+        profiler.enable()
+
     # ##: Get data.
     data = pl.read_parquet(join(input_path, "test.parquet"))
+    contents = data.to_dicts()
+    paths = [content["path"] for content in contents]
 
-    # ##: Loop over finder and extractors.
+    # ##: Loop over extractors, then finders.
     with Progress() as progress:
-        combinations = list(product(extractors.items(), finders.items()))
-
-        tasks = progress.add_task("[green]Réalisation des prédictions ...", total=len(combinations))
-        for [(extract_method, extract_func), (finder_method, finder_func)] in combinations:
-            task = progress.add_task(f"[red]Prédiction avec {extract_method} et {finder_method}", total=data.shape[0])
-            finder: Finder = finder_func(
-                extract_func(), load_database(join(feature_path, f"{extract_method}_db.parquet"))
-            )
-
-            # ##: Make predictions.
-            prediction = []
-            for content in data.to_dicts():
-                color, style = content["label"].split("_")
-                res = {"ground_truth": content["label"], "gt_color": color, "gt_style": style}
-                res.update(finder.search(wanted=content["path"], depth=5))
-
-                prediction.append(res)
-                progress.advance(task)
-
-            # ##: Store.
-            prediction = pl.DataFrame(prediction)
-            prediction.write_parquet(join(output_path, f"{extract_method}_{finder_method}_evaluation.parquet"))
-            progress.advance(tasks)
+        groups = [(extractors, finders), (binary_extractors, binary_finders)]
+        total = sum(len(extractor_group) * len(finder_group) for extractor_group, finder_group in groups)
+        tasks = progress.add_task("[green]Réalisation des prédictions ...", total=total)
+        for extractor_group, finder_group in groups:
+            for extract_method, extract_func in extractor_group.items():
+                extractor = extract_func()
+                data_path = join(feature_path, f"{extract_method}_db.parquet")
+                database, reducer = load_database(data_path), saved_reducer(data_path)
+                vectors, rows, extraction = extract_queries(extractor, paths)
+
+                for finder_method, finder_func in finder_group.items():
+                    task = progress.add_task(
+                        f"[red]Prédiction avec {extract_method} et {finder_method}", total=data.shape[0]
+                    )
+                    finder: Finder = finder_func(extractor, database, reducer=reducer)
+
+                    # ##: Images without features have no prediction.
+                    results = [
+                        {"input": path, "colors": [], "styles": [], "returns": [], "distance": [], "duration": 0.0}
+                        for path in paths
+                    ]
+
+                    # ##: Make predictions by batch of queries.
+                    for start in range(0, rows.size, batch_size):
+                        batch = rows[start : start + batch_size]
+                        for row, result in zip(batch, finder.search_batch(vectors[start : start + batch_size], 5)):
+                            result.update({"input": paths[row], "duration": result["duration"] + extraction})
+                            results[row] = result
+                        progress.advance(task, advance=len(batch))
+
+                    # ##: Store.
+                    prediction = []
+                    for content, result in zip(contents, results):
+                        color, style = content["label"].split("_")
+                        res = {"ground_truth": content["label"], "gt_color": color, "gt_style": style}
+                        res.update(result)
+                        prediction.append(res)
+                    prediction = pl.DataFrame(prediction)
+                    prediction.write_parquet(join(output_path, f"{extract_method}_{finder_method}_evaluation.parquet"))
+                    progress.update(task, completed=data.shape[0])
+                    progress.advance(tasks)
+
+    if profile:
+        Console().print(profiler.table())
 
 
 if __name__ == "__main__":
@@ -83,4 +168,5 @@ if __name__ == "__main__":
         input_path=os.environ["INPUT_PATH"],
         feature_path=os.environ["FEATURE_PATH"],
         output_path=os.environ["EVALUATION_PATH"],
+        profile=os.environ.get("PROFILE", "").lower() in ("1", "true", "yes"),
     )
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Regroupement en lots des requêtes concurrentes.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """
+    Regroupement des requêtes concurrentes en lots traités en un seul appel.
+
+    Un lot est fermé dès qu'il contient `max_batch_size` requêtes, ou `max_wait` secondes après l'arrivée de sa
+    première requête. Les lots sont traités l'un après l'autre dans un fil dédié : pendant le traitement d'un lot, les
+    requêtes suivantes s'accumulent et forment le lot suivant, dont la taille s'adapte ainsi à la charge.
+
+    Attributes
+    ----------
+    handler : Callable[[List[Any]], Sequence[Any]]
+        Traitement d'un lot, qui renvoie un résultat par requête, dans l'ordre. Un résultat qui est une exception
+        est levé dans la requête correspondante uniquement.
+    max_batch_size : int, default: 32
+        Nombre maximal de requêtes par lot.
+    max_wait : float, default: 0.005
+        Durée maximale d'attente, en secondes, avant de traiter un lot incomplet.
+
+    Methods
+    -------
+    start()
+        Démarrage du regroupement dans la boucle d'événements courante.
+    submit(item: Any)
+        Soumission d'une requête et attente de son résultat.
+    close()
+        Arrêt du regroupement.
+    """
+
+    def __init__(
+        self, handler: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32, max_wait: float = 0.005
+    ):
+        if max_batch_size < 1:
+            raise ValueError("La taille maximale d'un lot doit être positive.")
+        self.handler, self.max_batch_size, self.max_wait = handler, max_batch_size, max_wait
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = self.items = 0
+
+    def start(self):
+        """
+        Démarrage du regroupement dans la boucle d'événements courante.
+        """
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Soumission d'une requête et attente de son résultat.
+
+        Parameters
+        ----------
+        item : Any
+            Requête.
+
+        Returns
+        -------
+        Any
+            Résultat de la requête.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Any]:
+        """
+        Constitution d'un lot à partir de la file d'attente.
+
+        Returns
+        -------
+        List[Any]
+            Requêtes et futurs du lot.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # ##: Requests already waiting join the batch without delay.
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """
+        Boucle de traitement des lots.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items, futures = [item for item, _ in batch], [future for _, future in batch]
+            self.batches, self.items = self.batches + 1, self.items + len(items)
+            try:
+                results = await loop.run_in_executor(self.executor, self.handler, items)
+            except asyncio.CancelledError:
+                for future in futures:
+                    future.cancel()
+                raise
+            except Exception as error:  # pylint: disable=broad-except
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for future, result in zip(futures, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self):
+        """
+        Arrêt du regroupement. Les requêtes en attente sont annulées.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            while not self.queue.empty():
+                _, future = self.queue.get_nowait()
+                future.cancel()
+            self.task = None
+        self.executor.shutdown(wait=True)
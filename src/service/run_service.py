@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+Service HTTP local de recherche d'images similaires.
+
+Le service charge une seule fois un extracteur et un moteur de recherche, puis répond sur `POST /search` :
+
+- corps JSON `{"path": "...", "depth": 5}` : recherche d'une image présente sur la machine ;
+- tout autre corps : image envoyée telle quelle, la profondeur étant donnée par le paramètre `?depth=5`.
+
+Les résultats peuvent être restreints par les champs ou paramètres `colors` et `styles`, une valeur, une liste ou des
+valeurs séparées par des virgules.
+
+La réponse est le dictionnaire renvoyé par `Finder.search`, au format JSON. `GET /health` renvoie l'état du service
+et `GET /profile` la durée de chaque étape, lorsque les mesures sont activées.
+
+Les requêtes concurrentes sont regroupées en lots, d'abord pour l'extraction (inférence du réseau de neurones par
+lot), puis pour le calcul des distances (une seule passe sur la base pour les requêtes d'un lot ayant les mêmes
+filtres).
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import suppress
+from http import HTTPStatus
+from os.path import exists, join
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from numpy import ndarray
+
+from src.addons.extraction.extractor import binary_extractors, extractors
+from src.addons.finder import Finder
+from src.addons.profiling import profiler
+from src.models.make_prediction import binary_finders, finders
+from src.service.batching import MicroBatcher
+
+# ##: Accepted colors and styles of a query, `None` accepting every value.
+Filters = Tuple[Optional[Tuple[str, ...]], Optional[Tuple[str, ...]]]
+
+
+class HTTPError(Exception):
+    """
+    Erreur renvoyée au client avec son code HTTP.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchService:
+    """
+    Service HTTP de recherche, avec regroupement des requêtes concurrentes en lots.
+
+    Attributes
+    ----------
+    extractor : Any
+        Extracteur de données caractéristiques des requêtes.
+    finder : Finder
+        Moteur de recherche, avec sa base de données.
+    max_batch_size : int, default: 32
+        Nombre maximal de requêtes par lot.
+    max_wait : float, default: 0.005
+        Durée maximale d'attente, en secondes, avant de traiter un lot incomplet.
+    max_depth : int, default: 100
+        Nombre maximal d'images retournées par requête.
+    max_body : int, default: 32 Mio
+        Taille maximale du corps d'une requête, en octets.
+
+    Methods
+    -------
+    query(path: str, depth: int)
+        Recherche des images similaires à une image.
+    start(host: str, port: int)
+        Démarrage du serveur.
+    close()
+        Arrêt du regroupement des requêtes.
+    """
+
+    def __init__(
+        self,
+        extractor: Any,
+        finder: Finder,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        max_depth: int = 100,
+        max_body: int = 32 * 1024 * 1024,
+    ):
+        self.extractor, self.finder = extractor, finder
+        self.max_depth, self.max_body = max_depth, max_body
+        self.extraction = MicroBatcher(self._extract, max_batch_size, max_wait)
+        self.searching = MicroBatcher(self._search, max_batch_size, max_wait)
+
+    def _extract(self, paths: List[str]) -> List[Optional[ndarray]]:
+        """
+        Extraction des données caractéristiques d'un lot d'images.
+
+        Parameters
+        ----------
+        paths : List[str]
+            Chemins des images.
+
+        Returns
+        -------
+        List[Optional[ndarray]]
+            Données caractéristiques de chaque image, `None` si l'extraction n'a rien donné, ou l'erreur rencontrée.
+        """
+        if hasattr(self.extractor, "extract_batch"):
+            try:
+                return list(self.extractor.extract_batch(paths, batch_size=len(paths)))
+            except Exception:  # pylint: disable=broad-except
+                # ##: An unreadable image must not fail the other requests of its batch.
+                pass
+        results = []
+        for path in paths:
+            try:
+                results.append(self.extractor.extract(image_path=path))
+            except Exception as error:  # pylint: disable=broad-except
+                results.append(HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, f"Image illisible : {error!r}."))
+        return results
+
+    def _search(self, queries: List[Tuple[ndarray, int, Filters]]) -> List[Dict[str, Any]]:
+        """
+        Recherche des images similaires pour un lot de vecteurs.
+
+        Parameters
+        ----------
+        queries : List[Tuple[ndarray, int, Filters]]
+            Vecteur caractéristique, profondeur et filtres de couleur et de style de chaque requête.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Résultat de chaque requête.
+        """
+        # ##: Queries sharing the same filters are searched together.
+        groups: Dict[Filters, List[int]] = {}
+        for position, (_, _, filters) in enumerate(queries):
+            groups.setdefault(filters, []).append(position)
+
+        results: List[Dict[str, Any]] = [{} for _ in queries]
+        for (colors, styles), positions in groups.items():
+            vectors = np.stack([queries[position][0] for position in positions])
+            depth = max(queries[position][1] for position in positions)
+            found = self.finder.search_batch(vectors, depth=depth, colors=colors, styles=styles)
+            for position, result in zip(positions, found):
+                results[position] = result
+
+        # ##: Each group is searched at its largest depth, then cut for each query.
+        for result, (_, depth, _) in zip(results, queries):
+            for key in ("colors", "styles", "returns", "distance"):
+                result[key] = result[key][:depth]
+        return results
+
+    async def query(self, path: str, depth: int, filters: Filters = (None, None)) -> Dict[str, Any]:
+        """
+        Recherche des images similaires à une image.
+
+        Parameters
+        ----------
+        path : str
+            Chemin de l'image.
+        depth : int
+            Le nombre d'images à retourner.
+        filters : Filters, default: (None, None)
+            Couleurs et styles acceptés. `None` accepte toutes les valeurs.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Dictionnaire des informations trouvées dans la base, au format de `Finder.search`.
+        """
+        start_time = time.perf_counter()
+        feature = await self.extraction.submit(path)
+        if feature is None:
+            result = {"colors": [], "styles": [], "returns": [], "distance": []}
+        else:
+            result = await self.searching.submit((feature, depth, filters))
+        result.update({"input": path, "duration": time.perf_counter() - start_time})
+        return result
+
+    def _depth(self, value: Any) -> int:
+        """
+        Validation de la profondeur demandée.
+
+        Parameters
+        ----------
+        value : Any
+            Profondeur reçue.
+
+        Returns
+        -------
+        int
+            Profondeur.
+        """
+        try:
+            depth = int(value)
+        except (TypeError, ValueError) as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "La profondeur doit être un entier.") from error
+        if not 1 <= depth <= self.max_depth:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"La profondeur doit être comprise entre 1 et {self.max_depth}.")
+        return depth
+
+    @staticmethod
+    def _filter(value: Any) -> Optional[Tuple[str, ...]]:
+        """
+        Validation d'un filtre de couleur ou de style.
+
+        Parameters
+        ----------
+        value : Any
+            Valeur reçue : une chaîne, éventuellement de valeurs séparées par des virgules, ou une liste de chaînes.
+
+        Returns
+        -------
+        Optional[Tuple[str, ...]]
+            Valeurs acceptées, triées, ou `None` en l'absence de filtre.
+        """
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.split(",")
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Un filtre doit être une chaîne ou une liste de chaînes.")
+        return tuple(sorted({item.strip() for item in value}))
+
+    async def _route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        """
+        Traitement d'une requête HTTP.
+
+        Parameters
+        ----------
+        method : str
+            Méthode HTTP.
+        target : str
+            Chemin et paramètres de la requête.
+        headers : Dict[str, str]
+            En-têtes, par nom en minuscules.
+        body : bytes
+            Corps de la requête.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Réponse.
+        """
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Seule la méthode GET est acceptée.")
+            return {
+                "status": "ok",
+                "finder": type(self.finder).__name__,
+                "batches": {
+                    name: {"count": batcher.batches, "mean_size": batcher.items / max(batcher.batches, 1)}
+                    for name, batcher in (("extraction", self.extraction), ("search", self.searching))
+                },
+            }
+        if url.path == "/profile":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Seule la méthode GET est acceptée.")
+            return {"enabled": profiler.enabled, **profiler.summary()}
+        if url.path != "/search":
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Chemin inconnu : {url.path}.")
+        if method != "POST":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Seule la méthode POST est acceptée.")
+
+        # ##: Path of an image already on the machine.
+        if headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            try:
+                request = json.loads(body)
+                path = request["path"]
+            except (ValueError, TypeError, KeyError) as error:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Le corps doit contenir le champ `path`.") from error
+            if not isinstance(path, str) or not exists(path):
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Image introuvable : {path}.")
+            filters = (
+                self._filter(request.get("colors", params.get("colors"))),
+                self._filter(request.get("styles", params.get("styles"))),
+            )
+            return await self.query(path, self._depth(request.get("depth", params.get("depth", 1))), filters)
+
+        # ##: Uploaded image, stored in a temporary file for the extractors.
+        if not body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Aucune image n'a été envoyée.")
+        depth = self._depth(params.get("depth", 1))
+        filters = (self._filter(params.get("colors")), self._filter(params.get("styles")))
+        descriptor, path = tempfile.mkstemp(suffix=".jpg")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(body)
+            result = await self.query(path, depth, filters)
+        finally:
+            os.remove(path)
+        result["input"] = params.get("name", "upload")
+        return result
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Traitement des requêtes HTTP d'une connexion, jusqu'à sa fermeture.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            Flux entrant.
+        writer : asyncio.StreamWriter
+            Flux sortant.
+        """
+        try:
+            keep_alive = True
+            while keep_alive:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()).strip():
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    length = int(headers.get("content-length", 0))
+                    if length > self.max_body:
+                        keep_alive = False
+                        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Le corps de la requête est trop grand.")
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = HTTPStatus.OK, await self._route(method, target, headers, body)
+                except HTTPError as error:
+                    status, response = error.status, {"error": str(error)}
+                except ValueError:
+                    status, response, keep_alive = HTTPStatus.BAD_REQUEST, {"error": "Requête invalide."}, False
+                except Exception as error:  # pylint: disable=broad-except
+                    status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(error)}
+
+                content = json.dumps(response).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + content
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.Server:
+        """
+        Démarrage du serveur.
+
+        Parameters
+        ----------
+        host : str, default: "127.0.0.1"
+            Adresse d'écoute.
+        port : int, default: 8000
+            Port d'écoute. Le port `0` laisse le système choisir un port libre.
+
+        Returns
+        -------
+        asyncio.Server
+            Serveur démarré.
+        """
+        self.extraction.start()
+        self.searching.start()
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def close(self):
+        """
+        Arrêt du regroupement des requêtes.
+        """
+        await self.extraction.close()
+        await self.searching.close()
+
+
+def run_service(
+    feature_path: str,
+    extract_method: str = "EfficientNet",
+    finder_method: str = "euclidean",
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    max_batch_size: int = 32,
+    max_wait: float = 0.005,
+    lite_model: Optional[str] = None,
+    profile: bool = False,
+):
+    """
+    Chargement de l'extracteur et de la base de données, puis service des requêtes jusqu'à l'interruption.
+
+    Parameters
+    ----------
+    feature_path : str
+        Répertoire contenant les données caractéristiques.
+    extract_method : str, default: "EfficientNet"
+        Nom de l'extracteur.
+    finder_method : str, default: "euclidean"
+        Nom du moteur de recherche.
+    host : str, default: "127.0.0.1"
+        Adresse d'écoute.
+    port : int, default: 8000
+        Port d'écoute.
+    max_batch_size : int, default: 32
+        Nombre maximal de requêtes par lot.
+    max_wait : float, default: 0.005
+        Durée maximale d'attente, en secondes, avant de traiter un lot incomplet.
+    lite_model : str, default: None
+        Chemin d'un modèle exporté par `export_lite` à utiliser à la place du réseau de `extract_method`.
+    profile : bool, default: False
+        Mesure de la durée de chaque étape de l'extraction et de la recherche, consultable sur `GET /profile`.
+    """
+    if profile:
+        profiler.enable()
+    extractor_group, finder_group = (
+        (binary_extractors, binary_finders) if extract_method in binary_extractors else (extractors, finders)
+    )
+    if lite_model is not None:
+        # ##: Imported on demand, like the extractors, to avoid loading TensorFlow otherwise.
+        # pylint: disable-next=import-outside-toplevel
+        from src.addons.extraction.lite import LiteCompressor
+
+        extractor = LiteCompressor(lite_model)
+    else:
+        extractor = extractor_group[extract_method]()
+    finder: Finder = finder_group[finder_method](None)
+    finder.change_database(join(feature_path, f"{extract_method}_db.parquet"))
+
+    async def main():
+        service = SearchService(extractor, finder, max_batch_size=max_batch_size, max_wait=max_wait)
+        server = await service.start(host, port)
+        print(f"Service de recherche {extract_method}/{finder_method} sur http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await service.close()
+
+    with suppress(KeyboardInterrupt):
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    import sys
+
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+    required_vars = ["FEATURE_PATH"]
+    missing = [var for var in required_vars if not os.environ.get(var, "").strip()]
+    if missing:
+        print(
+            f"Error: Missing required environment variable(s): {', '.join(missing)}\n\n"
+            "Please do one of the following:\n"
+            "  1. Run 'make prepare' to create the .env file with required variables\n"
+            "  2. Manually set the variables in your .env file\n"
+            "  3. Export the variables in your shell",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    run_service(
+        feature_path=os.environ["FEATURE_PATH"],
+        extract_method=os.environ.get("SERVICE_EXTRACTOR", "EfficientNet"),
+        finder_method=os.environ.get("SERVICE_FINDER", "euclidean"),
+        port=int(os.environ.get("SERVICE_PORT", 8000)),
+        lite_model=os.environ.get("SERVICE_LITE_MODEL") or None,
+        profile=os.environ.get("PROFILE", "").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la mesure des performances de recherche.
+"""
+import json
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+
+from src.addons.profiling import profiler
+from src.benchmark import run_benchmark
+
+
+class TestBenchmark(TestCase):
+    """
+    Tests unitaires du banc d'essai.
+    """
+
+    def test_synthetic_database(self):
+        database = run_benchmark.synthetic_database(10, 16)
+        self.assertEqual((10, 16), database["features"].shape)
+        self.assertEqual(np.float32, database["features"].dtype)
+        self.assertEqual(10, database["colors"].size)
+        self.assertEqual(np.uint8, run_benchmark.synthetic_database(10, 16, binary=True)["features"].dtype)
+
+    def test_report(self):
+        profiles = {"small": {"dimension": 8, "binary": False}, "small_binary": {"dimension": 8, "binary": True}}
+        with TemporaryDirectory() as directory, patch.object(run_benchmark, "profiles", profiles):
+            results = run_benchmark.run_benchmark(directory, sizes=(50,), depths=(1, 3), queries=8, batch_size=4)
+            with open(join(directory, "benchmark.json"), encoding="utf-8") as file:
+                report = json.load(file)
+
+        # ##: Two modes per profile, finder and depth.
+        self.assertEqual(2 * (3 + 1) * 2, len(results))
+        self.assertEqual(results, report["results"])
+        for result in results:
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["qps"], 0)
+        self.assertNotIn("stages", report)
+
+    def test_profiled_report(self):
+        profiles = {"small": {"dimension": 8, "binary": False}}
+        with TemporaryDirectory() as directory, patch.object(run_benchmark, "profiles", profiles):
+            try:
+                run_benchmark.run_benchmark(directory, sizes=(50,), depths=(1,), queries=8, batch_size=4, profile=True)
+            finally:
+                profiler.disable()
+                profiler.reset()
+            with open(join(directory, "benchmark.json"), encoding="utf-8") as file:
+                report = json.load(file)
+        self.assertIn("EuclideanFinder.distance", report["stages"]["timers"])
+
+
+if __name__ == "__main__":
+    main()
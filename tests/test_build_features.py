@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la construction des bases de données en une seule lecture des images.
+"""
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import cv2 as cv
+import numpy as np
+import polars as pl
+
+from src.addons.data import load_database
+from src.addons.extraction.descriptor import ORBDescriptor
+from src.features.build_features import extract_features_once
+from tests.test_compressor import TinyCompressor
+
+
+class TestExtractFeaturesOnce(TestCase):
+    """
+    Tests unitaires de la construction en une seule lecture.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        generator = np.random.default_rng(1331)
+        paths, labels = [], []
+        for index in range(7):
+            image = cv.GaussianBlur(generator.integers(0, 256, size=(120, 160, 3), dtype=np.uint8), (5, 5), 1)
+            paths.append(join(self.directory.name, f"{index}.jpg"))
+            cv.imwrite(paths[-1], image)
+            labels.append(f"color{index % 2}_style{index % 3}")
+        paths.append(join(self.directory.name, "missing.jpg"))
+        labels.append("color0_style0")
+        self.paths, self.labels = paths, labels
+        pl.DataFrame({"path": paths, "label": labels}).write_parquet(join(self.directory.name, "train.parquet"))
+        self.compressor = TinyCompressor()
+        self.methods = {"ORB": lambda: ORBDescriptor(size=8), "Tiny": lambda: self.compressor}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_separate_extraction(self):
+        extract_features_once(
+            self.directory.name, self.directory.name, batch_size=3, chunk_size=5, methods=self.methods
+        )
+
+        database = load_database(join(self.directory.name, "Tiny_db.parquet"), mmap=False)
+        expected = np.stack(list(self.compressor.extract_batch(self.paths[:-1])))
+        # ##: The shared decode keeps the resolution needed by ORB, so resizing starts from a larger image.
+        np.testing.assert_allclose(expected, database["features"], atol=1e-2)
+        self.assertListEqual([label.split("_")[0] for label in self.labels[:-1]], list(database["colors"]))
+
+        descriptor = ORBDescriptor(size=8)
+        database = load_database(join(self.directory.name, "ORB_db.parquet"), mmap=False)
+        expected = [descriptor.extract(path) for path in self.paths[:-1]]
+        expected = np.stack([feature for feature in expected if feature is not None])
+        self.assertTupleEqual(expected.shape, database["features"].shape)
+
+
+if __name__ == "__main__":
+    main()
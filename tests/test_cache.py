@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur le cache des données caractéristiques.
+"""
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from src.addons.extraction.cache import CachedExtractor
+
+
+class CountingExtractor:
+    """
+    Extracteur factice comptant ses appels.
+    """
+
+    extractor = None
+
+    def __init__(self, size: int = 4):
+        self.vector_size, self.calls = size, 0
+
+    def preprocess(self, image_path: str) -> str:
+        return image_path
+
+    def extract(self, image_path: str):
+        self.calls += 1
+        with open(image_path, "rb") as file:
+            content = file.read()
+        return None if content == b"empty" else np.full(self.vector_size, len(content), dtype=np.float32)
+
+
+class TestCache(TestCase):
+    """
+    Tests unitaires du cache adressé par le contenu.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.paths = []
+        for name, content in [("a", b"abc"), ("b", b"abc"), ("c", b"abcdef"), ("d", b"empty")]:
+            self.paths.append(join(self.directory.name, f"{name}.jpg"))
+            with open(self.paths[-1], "wb") as file:
+                file.write(content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_memory(self):
+        cached = CachedExtractor(CountingExtractor(), capacity=2)
+        results = list(cached.extract_batch(self.paths))
+        self.assertIsNone(results[3])
+        np.testing.assert_array_equal(results[0], results[1])
+
+        # ##: Same bytes under another name are a hit.
+        self.assertEqual(3, cached.extractor.calls)
+        self.assertEqual(
+            {"hits": 1, "disk_hits": 0, "misses": 3}, {k: cached.stats[k] for k in ("hits", "disk_hits", "misses")}
+        )
+
+        # ##: Capacity 2: the first image was evicted.
+        cached.extract(self.paths[0])
+        self.assertEqual(4, cached.extractor.calls)
+
+    def test_disk(self):
+        store = join(self.directory.name, "cache")
+        list(CachedExtractor(CountingExtractor(), directory=store).extract_batch(self.paths))
+
+        cached = CachedExtractor(CountingExtractor(), directory=store)
+        self.assertIsNone(cached.extract(self.paths[3]))
+        np.testing.assert_array_equal(np.full(4, 6), cached.extract(self.paths[2]))
+        self.assertEqual(0, cached.extractor.calls)
+        self.assertEqual(2, cached.stats["disk_hits"])
+
+    def test_identity(self):
+        store = join(self.directory.name, "cache")
+        CachedExtractor(CountingExtractor(size=4), directory=store).extract(self.paths[0])
+        cached = CachedExtractor(CountingExtractor(size=8), directory=store)
+        self.assertEqual(8, cached.extract(self.paths[0]).size)
+
+
+if __name__ == "__main__":
+    main()
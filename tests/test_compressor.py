@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur l'extraction des données caractéristiques par réseau de neurones.
+"""
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+import tensorflow as tf
+
+from src.addons.extraction.compressor import Compressor
+from src.addons.extraction.lite import LiteCompressor, compare, export_lite
+
+
+class TinyCompressor(Compressor):
+    """
+    Réseau de neurones minimal, sans poids pré-entraînés.
+    """
+
+    def __init__(self, height: int = 32, width: int = 32):
+        super().__init__(height=height, width=width)
+        self.preprocessor = lambda image: image / 255.0
+        inputs = tf.keras.Input(shape=(height, width, 3))
+        outputs = tf.keras.layers.Dense(4)(tf.keras.layers.GlobalAveragePooling2D()(inputs))
+        self.extractor = tf.keras.models.Model(inputs=inputs, outputs=outputs)
+
+
+class TestCompressor(TestCase):
+    """
+    Tests unitaires de l'extraction par lots.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        generator = np.random.default_rng(1331)
+        self.paths = []
+        for index in range(5):
+            channels = 1 if index == 2 else 3
+            image = generator.integers(0, 256, size=(40 + index, 50, channels), dtype=np.uint8)
+            path = join(self.directory.name, f"{index}.jpg")
+            tf.io.write_file(path, tf.io.encode_jpeg(image))
+            self.paths.append(path)
+        self.compressor = TinyCompressor()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_extract_batch_matches_extract(self):
+        batch = list(self.compressor.extract_batch(self.paths, batch_size=2))
+        self.assertEqual(len(self.paths), len(batch))
+        for path, feature in zip(self.paths, batch):
+            np.testing.assert_allclose(self.compressor.extract(image_path=path), feature, rtol=1e-5, atol=1e-6)
+
+    def test_extract_matches_predict(self):
+        expected = self.compressor.extractor.predict(self.compressor.preprocess(self.paths[0]), verbose=0)[0]
+        np.testing.assert_allclose(expected, self.compressor.extract(image_path=self.paths[0]), rtol=1e-5)
+
+    def test_extract_batch_unreadable(self):
+        path = join(self.directory.name, "broken.jpg")
+        with open(path, "wb") as file:
+            file.write(b"not an image")
+
+        # ##: An unreadable image doesn't abort the batch it belongs to.
+        batch = list(self.compressor.extract_batch([self.paths[0], path, self.paths[1]], batch_size=3))
+        self.assertIsNone(batch[1])
+        for expected, feature in zip(self.compressor.extract_batch(self.paths[:2]), (batch[0], batch[2])):
+            np.testing.assert_allclose(expected, feature, rtol=1e-5, atol=1e-6)
+        with self.assertRaises(ValueError):
+            self.compressor.extract(image_path=path)
+
+    def test_extract_batch_empty(self):
+        self.assertEqual([], list(self.compressor.extract_batch([])))
+
+
+class TestLiteCompressor(TestCase):
+    """
+    Tests unitaires de l'export au format TensorFlow Lite.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        generator = np.random.default_rng(1331)
+        self.paths = []
+        for index in range(4):
+            image = generator.integers(0, 256, size=(40, 50, 3), dtype=np.uint8)
+            self.paths.append(join(self.directory.name, f"{index}.jpg"))
+            tf.io.write_file(self.paths[-1], tf.io.encode_jpeg(image))
+        self.compressor = TinyCompressor()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_export_matches_keras(self):
+        lite = LiteCompressor(export_lite(self.compressor, join(self.directory.name, "tiny.tflite")))
+        self.assertTupleEqual((32, 32), (lite.height, lite.width))
+        expected = np.stack(list(self.compressor.extract_batch(self.paths)))
+        np.testing.assert_allclose(expected, np.stack(list(lite.extract_batch(self.paths, batch_size=3))), rtol=1e-4)
+        np.testing.assert_allclose(expected[0], lite.extract(image_path=self.paths[0]), rtol=1e-4)
+
+    def test_quantization_tolerance(self):
+        path = join(self.directory.name, "tiny_dynamic.tflite")
+        lite = LiteCompressor(export_lite(self.compressor, path, "dynamic"))
+        report = compare(self.compressor, lite, self.paths, tolerance=0.01)
+        self.assertTrue(report["within_tolerance"], report)
+
+        # ##: Embeddings of another network are out of tolerance.
+        other = TinyCompressor()
+        other.extractor.set_weights([-weights for weights in self.compressor.extractor.get_weights()])
+        report = compare(other, lite, self.paths, tolerance=0.01)
+        self.assertFalse(report["within_tolerance"], report)
+
+    def test_int8_quantization(self):
+        path = join(self.directory.name, "tiny_int8.tflite")
+        lite = LiteCompressor(export_lite(self.compressor, path, "int8", representative=self.paths))
+        self.assertTupleEqual((len(self.paths), 4), np.stack(list(lite.extract_batch(self.paths))).shape)
+
+    def test_int8_requires_images(self):
+        with self.assertRaises(ValueError):
+            export_lite(self.compressor, join(self.directory.name, "tiny.tflite"), "int8")
+
+
+if __name__ == "__main__":
+    main()
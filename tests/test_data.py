@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur le chargement des bases de données caractéristiques.
+"""
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+import polars as pl
+
+from src.addons.data import DatabaseWriter, features_path, load_database, save_database
+
+
+class TestData(TestCase):
+    """
+    Tests unitaires de l'enregistrement et du chargement des bases.
+    """
+
+    def setUp(self):
+        self.features = np.arange(12, dtype=np.float64).reshape(4, 3)
+        self.colors, self.styles = ["black", "blue", "red", "red"], ["dress", "pants", "shirt", "dress"]
+
+    def test_round_trip(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            save_database(data_path, self.features, self.colors, self.styles)
+            self.assertTrue(exists(features_path(data_path)))
+
+            database = load_database(data_path)
+            self.assertIsInstance(database["features"], np.memmap)
+            self.assertEqual(np.float32, database["features"].dtype)
+            np.testing.assert_array_equal(self.features, database["features"])
+            self.assertEqual(self.colors, database["colors"].tolist())
+            self.assertEqual(self.styles, database["styles"].tolist())
+
+    def test_legacy_database(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "ORB_db.parquet")
+            pl.DataFrame(
+                {"feature": self.features.tolist(), "color": self.colors, "style": self.styles}
+            ).write_parquet(data_path)
+
+            database = load_database(data_path)
+            np.testing.assert_array_equal(self.features, database["features"])
+            self.assertEqual(self.colors, database["colors"].tolist())
+
+    def test_resumable_writer(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "ORB_db.parquet")
+            writer = DatabaseWriter(data_path, chunk_size=3, total=7)
+            writer.write(1, self.features[:3], self.colors[:3], self.styles[:3])
+            self.assertEqual([0, 2], writer.pending())
+
+            # ##: A restarted build only processes the missing chunks.
+            writer = DatabaseWriter(data_path, chunk_size=3, total=7)
+            self.assertEqual([0, 2], writer.pending())
+            writer.write(0, self.features[3:], self.colors[3:], self.styles[3:])
+            writer.write(2, np.empty((0, 0)), [], [])
+            writer.finalize()
+            self.assertFalse(exists(writer.directory))
+            self.assertFalse(exists(f"{data_path}.tmp"))
+
+            database = load_database(data_path)
+            np.testing.assert_array_equal(np.concatenate([self.features[3:], self.features[:3]]), database["features"])
+            self.assertEqual(self.colors[3:] + self.colors[:3], database["colors"].tolist())
+
+    def test_incompatible_writer(self):
+        with TemporaryDirectory() as directory:
+            DatabaseWriter(join(directory, "ORB_db.parquet"), chunk_size=3, total=7)
+            with self.assertRaises(ValueError):
+                DatabaseWriter(join(directory, "ORB_db.parquet"), chunk_size=4, total=7)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la recherche d'images similaires.
+"""
+import threading
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
+
+from src.addons.data import save_database
+from src.addons.distance import top_k
+from src.addons.finder import (
+    CosinusFinder,
+    EuclideanFinder,
+    HammingFinder,
+    ManhattanFinder,
+)
+from src.addons.indexing.index import index_path
+from src.addons.reduction import PCAReducer
+
+
+class FakeExtractor:
+    """
+    Extracteur renvoyant des vecteurs pré-calculés à partir du chemin de l'image.
+    """
+
+    extractor = None
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def preprocess(self, image_path: str):
+        return image_path
+
+    def extract(self, image_path: str):
+        return self.vectors.get(image_path)
+
+
+class TestFinder(TestCase):
+    """
+    Tests unitaires des classes de recherche.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        self.features = generator.normal(size=(50, 16))
+        self.database = {
+            "features": self.features,
+            "colors": np.array([f"color{index % 3}" for index in range(50)]),
+            "styles": np.array([f"style{index % 4}" for index in range(50)]),
+        }
+        self.queries = {f"image{index}.jpg": self.features[index] + 0.01 for index in range(5)}
+        self.extractor = FakeExtractor(self.queries)
+
+    def test_search_batch_matches_search(self):
+        for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+            finder = finder_class(self.extractor, self.database)
+            batch = finder.search_batch(wanted=list(self.queries), depth=5)
+            for path, result in zip(self.queries, batch):
+                single = finder.search(wanted=path, depth=5)
+                self.assertEqual(single["input"], result["input"])
+                self.assertEqual(single["returns"], result["returns"])
+                np.testing.assert_allclose(single["distance"], result["distance"], rtol=1e-4, atol=1e-4)
+
+    def test_search_batch_with_vectors(self):
+        finder = EuclideanFinder(self.extractor, self.database)
+        results = finder.search_batch(wanted=self.features[:3], depth=1)
+        self.assertEqual([0, 1, 2], [result["input"] for result in results])
+        self.assertEqual(
+            [f"color{index % 3}_style{index % 4}" for index in range(3)], [result["returns"][0] for result in results]
+        )
+
+    def test_search_without_features(self):
+        finder = EuclideanFinder(self.extractor, self.database)
+        results = finder.search_batch(wanted=["unknown.jpg", "image0.jpg"], depth=3)
+        self.assertEqual([], results[0]["returns"])
+        self.assertEqual(3, len(results[1]["returns"]))
+        self.assertIn("duration", results[0])
+
+    def test_euclidean_matches_brute_force(self):
+        finder = EuclideanFinder(self.extractor, self.database)
+        result = finder.search(wanted="image3.jpg", depth=5)
+        expected = euclidean_distances(self.queries["image3.jpg"].reshape(1, -1), self.features)[0]
+        np.testing.assert_allclose(np.sort(expected)[:5], result["distance"], rtol=1e-4, atol=1e-4)
+
+    def test_cosine_returns_most_similar_first(self):
+        finder = CosinusFinder(self.extractor, self.database)
+        result = finder.search(wanted="image3.jpg", depth=5)
+        expected = cosine_similarity(self.queries["image3.jpg"].reshape(1, -1), self.features)[0]
+        np.testing.assert_allclose(np.sort(expected)[::-1][:5], result["distance"], rtol=1e-5)
+        self.assertEqual("color0_style3", result["returns"][0])
+
+    def test_hamming(self):
+        generator = np.random.default_rng(1331)
+        features = generator.integers(0, 256, size=(50, 61), dtype=np.uint8)
+        database = {"features": features, "colors": self.database["colors"], "styles": self.database["styles"]}
+        finder = HammingFinder(self.extractor, database)
+        self.assertEqual(np.uint64, finder.database["features"].dtype)
+
+        queries = features[:4].copy()
+        queries[:, 0] ^= 0b101
+        results = finder.search_batch(wanted=queries, depth=3)
+        expected = np.unpackbits(queries[:, None, :] ^ features[None, :, :], axis=-1).sum(axis=-1)
+        for row, result in enumerate(results):
+            self.assertEqual(2.0, result["distance"][0])
+            np.testing.assert_array_equal(np.sort(expected[row])[:3], result["distance"])
+
+        finder.change_reducer(None)
+        with self.assertRaises(TypeError):
+            finder.change_reducer(PCAReducer.fit(self.features, 6))
+
+    def test_filtered_search(self):
+        rows = np.flatnonzero(
+            (self.database["colors"] == "color1") & np.isin(self.database["styles"], ["style0", "style2"])
+        )
+        subset = {key: value[rows] for key, value in self.database.items()}
+        for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+            finder = finder_class(self.extractor, self.database)
+            expected = finder_class(self.extractor, subset).search_batch(wanted=list(self.queries), depth=3)
+            results = finder.search_batch(
+                wanted=list(self.queries), depth=3, colors="color1", styles=["style0", "style2"]
+            )
+            for result, reference in zip(results, expected):
+                self.assertListEqual(["color1"] * 3, result["colors"])
+                self.assertListEqual(reference["returns"], result["returns"])
+                np.testing.assert_allclose(reference["distance"], result["distance"], rtol=1e-5)
+
+        # ##: Filtered searches are exhaustive on the matching rows, even with an index.
+        finder = EuclideanFinder(self.extractor, self.database)
+        finder.build_index("ivf", nlist=4, nprobe=1)
+        result = finder.search(wanted="image0.jpg", depth=10, colors=["color0", "color2"], styles="style1")
+        self.assertEqual(8, len(result["returns"]))
+        self.assertTrue(all(style == "style1" for style in result["styles"]))
+        self.assertListEqual([], finder.search(wanted="image0.jpg", depth=3, colors="unknown")["returns"])
+
+    def test_top_k(self):
+        scores = np.array([[0.3, 0.1, 0.9, 0.5], [4.0, 3.0, 2.0, 1.0]])
+        np.testing.assert_array_equal([[1, 0], [3, 2]], top_k(scores, depth=2))
+        np.testing.assert_array_equal([[2, 3], [0, 1]], top_k(scores, depth=2, largest=True))
+        np.testing.assert_array_equal([[2, 3, 0, 1], [0, 1, 2, 3]], top_k(scores, depth=10, largest=True))
+
+
+class TestLiveDatabase(TestCase):
+    """
+    Tests unitaires des ajouts, suppressions et fusions de la base en service.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        self.features = generator.normal(size=(60, 8)).astype(np.float32)
+        self.colors = np.array([f"color{index}" for index in range(60)])
+        self.styles = np.array(["dress"] * 60)
+
+    def expected(self, rows, queries, depth):
+        finder = EuclideanFinder(
+            None, {"features": self.features[rows], "colors": self.colors[rows], "styles": self.styles[rows]}
+        )
+        return [result["colors"] for result in finder.search_batch(queries, depth=depth)]
+
+    def test_add_into_index(self):
+        finder = EuclideanFinder(
+            None, {"features": self.features[:40], "colors": self.colors[:40], "styles": self.styles[:40]}
+        )
+        index = finder.build_index("hnsw", M=8, ef_construction=60, ef_search=60)
+        finder.add(self.features[40:50], self.colors[40:50], self.styles[40:50])
+        finder.add(self.features[50:], self.colors[50:], self.styles[50:])
+        finder.remove([3, 45])
+        # ##: Insertions go into a copy, searches in progress keep the previous index.
+        self.assertEqual(40, index.size)
+        self.assertEqual(60, finder.index.size)
+        self.assertListEqual(finder.segments, finder.indexed)
+
+        rows = [row for row in range(60) if row not in (3, 45)]
+        queries = self.features[[3, 10, 45, 55]] + 0.01
+        self.assertEqual(
+            self.expected(rows, queries, 6), [result["colors"] for result in finder.search_batch(queries, 6)]
+        )
+        colors = [f"color{index}" for index in range(0, 60, 3)]
+        self.assertEqual(
+            [[color for color in result if color in colors] for result in self.expected(rows, queries, 60)],
+            [result["colors"] for result in finder.search_batch(queries, 60, colors=colors)],
+        )
+
+        # ##: Compaction abandons the enriched index.
+        finder.compact()
+        self.assertIsNone(finder.index)
+        self.assertEqual(
+            self.expected(rows, queries, 6), [result["colors"] for result in finder.search_batch(queries, 6)]
+        )
+
+    def test_add_remove_compact(self):
+        finder = EuclideanFinder(
+            None, {"features": self.features[:40], "colors": self.colors[:40], "styles": self.styles[:40]}
+        )
+        ids = finder.add(self.features[40:50], self.colors[40:50], self.styles[40:50])
+        np.testing.assert_array_equal(np.arange(40, 50), ids)
+        finder.add(self.features[50:], self.colors[50:], self.styles[50:])
+        finder.remove([3, 45, 59])
+
+        rows = [row for row in range(60) if row not in (3, 45, 59)]
+        queries = self.features[[3, 10, 45, 55]] + 0.01
+        self.assertEqual(
+            self.expected(rows, queries, 6), [result["colors"] for result in finder.search_batch(queries, 6)]
+        )
+
+        # ##: Filters apply to the segments, without the removed images.
+        results = finder.search_batch(queries, 6, colors=["color3", "color10", "color45", "color46", "color47"])
+        self.assertEqual(["color10", "color46", "color47"], sorted(results[0]["colors"]))
+
+        finder.compact(background=True).join()
+        self.assertEqual([], finder.segments)
+        self.assertEqual(0, finder.removed.size)
+        self.assertEqual(
+            self.expected(rows, queries, 6), [result["colors"] for result in finder.search_batch(queries, 6)]
+        )
+
+        # ##: Identifiers stay stable after a compaction.
+        finder.remove([55])
+        self.assertNotIn("color55", finder.search_batch(self.features[55:56], 3)[0]["colors"])
+        self.assertEqual(60, finder.add(self.features[:1], ["new"], ["dress"])[0])
+
+    def test_updates_during_search(self):
+        finder = EuclideanFinder(
+            None, {"features": self.features[:40], "colors": self.colors[:40], "styles": self.styles[:40]}
+        )
+        started, release, results = threading.Event(), threading.Event(), []
+
+        def blocking(*args, **kwargs):
+            started.set()
+            release.wait(timeout=10)
+            return top_k(*args, **kwargs)
+
+        def update():
+            finder.remove([0])
+            finder.add(self.features[:1], ["new"], ["dress"])
+
+        with patch("src.addons.distance.top_k", side_effect=blocking):
+            search = threading.Thread(target=lambda: results.extend(finder.search_batch(self.features[:1], 2)))
+            search.start()
+            self.assertTrue(started.wait(timeout=10))
+            # ##: Updates don't wait for the search in progress.
+            updater = threading.Thread(target=update)
+            updater.start()
+            updater.join(timeout=5)
+            self.assertFalse(updater.is_alive())
+            release.set()
+            search.join()
+
+        # ##: The search keeps the database it started with.
+        self.assertEqual("color0", results[0]["colors"][0])
+        self.assertEqual(["new"], finder.search_batch(self.features[:1], 1)[0]["colors"])
+
+    def test_persistence(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            save_database(data_path, self.features[:40], self.colors[:40], self.styles[:40])
+            finder = EuclideanFinder(None)
+            finder.change_database(data_path)
+            finder.add(self.features[40:], self.colors[40:], self.styles[40:])
+            finder.remove([0, 41])
+
+            rows = [row for row in range(60) if row not in (0, 41)]
+            queries = self.features[[0, 41, 50]]
+            reloaded = EuclideanFinder(None)
+            reloaded.change_database(data_path)
+            self.assertEqual(
+                self.expected(rows, queries, 4), [result["colors"] for result in reloaded.search_batch(queries, 4)]
+            )
+
+            reloaded.compact()
+            compacted = EuclideanFinder(None)
+            compacted.change_database(data_path)
+            self.assertEqual([], compacted.segments)
+            self.assertEqual(58, compacted.database["features"].shape[0])
+            self.assertEqual(
+                self.expected(rows, queries, 4), [result["colors"] for result in compacted.search_batch(queries, 4)]
+            )
+
+    def test_persistence_with_index(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            save_database(data_path, self.features, self.colors, self.styles)
+            finder = EuclideanFinder(None)
+            finder.change_database(data_path)
+            finder.build_index("ivf", nlist=4).save(index_path(data_path, "ivf", "euclidean"))
+            finder.remove(range(30))
+            finder.compact()
+            self.assertFalse(exists(index_path(data_path, "ivf", "euclidean")))
+
+            # ##: An index built on another version of the database is rejected.
+            stale = EuclideanFinder(
+                None, {"features": self.features[:50], "colors": self.colors[:50], "styles": self.styles[:50]}
+            )
+            stale.build_index("ivf", nlist=4).save(index_path(data_path, "ivf", "euclidean"))
+            reloaded = EuclideanFinder(None)
+            reloaded.change_database(data_path)
+            with self.assertRaises(ValueError):
+                reloaded.load_index(data_path, "ivf")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la lecture des images à résolution réduite.
+"""
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import cv2 as cv
+import numpy as np
+
+from src.addons.extraction.image import jpeg_size, read_image, reduction
+
+
+class TestImage(TestCase):
+    """
+    Tests unitaires de la lecture des images.
+    """
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        # ##: Smooth gradients, so that reduced decoding and resizing agree.
+        rows, columns = np.mgrid[0:480, 0:640]
+        self.image = np.stack([rows * 255 // 480, columns * 255 // 640, (rows + columns) * 255 // 1120], axis=-1)
+        self.image = self.image.astype(np.uint8)
+        self.paths = {}
+        for name, image in (("color.jpg", self.image), ("gray.jpg", self.image[..., 0]), ("color.png", self.image)):
+            self.paths[name] = join(self.directory.name, name)
+            cv.imwrite(self.paths[name], image)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_jpeg_size(self):
+        with open(self.paths["color.jpg"], "rb") as file:
+            self.assertTupleEqual((480, 640), jpeg_size(file.read()))
+        with open(self.paths["color.png"], "rb") as file:
+            self.assertIsNone(jpeg_size(file.read()))
+
+    def test_reduction(self):
+        self.assertEqual(1, reduction((480, 640), None))
+        self.assertEqual(2, reduction((480, 640), (224, 224)))
+        self.assertEqual(4, reduction((480, 640), (100, 120)))
+        self.assertEqual(8, reduction((4000, 6000), (331, 331)))
+        self.assertEqual(1, reduction((480, 640), (300, 100)))
+
+    def test_read_reduced(self):
+        full = read_image(self.paths["color.jpg"])
+        reduced = read_image(self.paths["color.jpg"], target=(100, 100))
+        self.assertTupleEqual((480, 640, 3), full.shape)
+        self.assertTupleEqual((120, 160, 3), reduced.shape)
+        resized = cv.resize(full, (160, 120), interpolation=cv.INTER_AREA)
+        self.assertLess(np.abs(reduced.astype(int) - resized).mean(), 2)
+        # ##: Channels are returned in RGB order.
+        self.assertLess(np.abs(full.astype(int) - self.image[..., ::-1]).mean(), 2)
+
+    def test_read_consistent_channels(self):
+        self.assertTupleEqual((240, 320, 3), read_image(self.paths["gray.jpg"], target=(224, 224)).shape)
+        self.assertTupleEqual((480, 640, 3), read_image(self.paths["color.png"], target=(224, 224)).shape)
+        self.assertTupleEqual((240, 320), read_image(self.paths["color.jpg"], target=(224, 224), grayscale=True).shape)
+        self.assertIsNone(read_image(join(self.directory.name, "missing.jpg")))
+
+
+if __name__ == "__main__":
+    main()
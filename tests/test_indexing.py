@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur les index de recherche des plus proches voisins.
+"""
+from os.path import join
+from tempfile import TemporaryDirectory
+from typing import Any, Tuple
+from unittest import TestCase, main
+
+import numpy as np
+
+from src.addons.data import save_database
+from src.addons.extraction.vocabulary import VisualVocabulary
+from src.addons.finder import CosinusFinder, EuclideanFinder, Finder, ManhattanFinder
+from src.addons.indexing.hnsw import HNSWIndex
+from src.addons.indexing.index import index_path
+from src.addons.indexing.pq import PQIndex
+from src.addons.indexing.sq import SQIndex
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return np.mean([len(set(row) & set(truth)) / len(truth) for row, truth in zip(found, expected)])
+
+
+def search(finder: Finder, queries: np.ndarray, depth: int, **filters: Any) -> Tuple[np.ndarray, np.ndarray]:
+    # ##: Each image has its row as color, so that the results give back the rows.
+    results = finder.search_batch(queries, depth, **filters)
+    scores = np.array([result["distance"] for result in results])
+    return scores, np.array([[int(color) for color in result["colors"]] for result in results])
+
+
+class TestIndexing(TestCase):
+    """
+    Tests unitaires des index, comparés à la recherche exhaustive.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        centers = generator.normal(scale=4.0, size=(20, 32))
+        self.features = (centers[generator.integers(0, 20, size=2000)] + generator.normal(size=(2000, 32))).astype(
+            np.float32
+        )
+        self.database = {
+            "features": self.features,
+            "colors": np.arange(2000).astype(str),
+            "styles": np.array(["dress"] * 2000),
+        }
+        self.queries = self.features[:50] + generator.normal(scale=0.1, size=(50, 32)).astype(np.float32)
+
+    def exact(self, finder_class):
+        finder = finder_class(None, self.database)
+        return search(finder, self.queries, 10)
+
+    def test_ivf_exhaustive_probe_is_exact(self):
+        for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+            _, expected = self.exact(finder_class)
+            finder = finder_class(None, self.database)
+            finder.build_index("ivf", nlist=16, nprobe=16)
+            _, found = search(finder, self.queries, 10)
+            self.assertGreaterEqual(recall(found, expected), 0.99)
+
+    def test_ivf_recall(self):
+        _, expected = self.exact(EuclideanFinder)
+        finder = EuclideanFinder(None, self.database)
+        finder.build_index("ivf", nlist=32, nprobe=4)
+        _, found = search(finder, self.queries, 10)
+        self.assertGreaterEqual(recall(found, expected), 0.9)
+
+    def test_ivf_save_and_load(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            finder = EuclideanFinder(None, self.database)
+            finder.build_index("ivf", nlist=32, nprobe=4).save(index_path(data_path, "ivf", "euclidean"))
+            scores, found = search(finder, self.queries, 10)
+
+            loaded = EuclideanFinder(None, self.database)
+            loaded.load_index(data_path, "ivf")
+            loaded_scores, loaded_found = search(loaded, self.queries, 10)
+            np.testing.assert_array_equal(found, loaded_found)
+            np.testing.assert_allclose(scores, loaded_scores)
+
+    def test_pq_recall(self):
+        for finder_class in (CosinusFinder, EuclideanFinder):
+            _, expected = self.exact(finder_class)
+            finder = finder_class(None, self.database)
+            index = finder.build_index("pq", m=8, nbits=6)
+            self.assertEqual((2000, 8), index.codes.shape)
+            _, approximate = search(finder, self.queries, 10)
+            index.shortlist = 100
+            _, reranked = search(finder, self.queries, 10)
+            self.assertGreaterEqual(recall(approximate, expected), 0.3)
+            self.assertGreaterEqual(recall(reranked, expected), 0.95)
+
+    def test_pq_save_and_load(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "index.npz")
+            finder = EuclideanFinder(None, self.database)
+            finder.build_index("pq", m=8, nbits=6, shortlist=50).save(path)
+            scores, found = search(finder, self.queries, 10)
+
+            finder.change_index(PQIndex.load(path, finder.database["features"]))
+            loaded_scores, loaded_found = search(finder, self.queries, 10)
+            np.testing.assert_array_equal(found, loaded_found)
+            np.testing.assert_allclose(scores, loaded_scores)
+
+    def test_sq_recall(self):
+        for dtype, itemsize in (("int8", 1), ("float16", 2)):
+            for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+                expected_scores, expected = self.exact(finder_class)
+                finder = finder_class(None, self.database)
+                index = finder.build_index("sq", dtype=dtype, shortlist=50, chunk_size=512)
+                self.assertEqual(itemsize, index.codes.itemsize)
+                scores, found = search(finder, self.queries, 10)
+                self.assertGreaterEqual(recall(found, expected), 0.99)
+                np.testing.assert_allclose(expected_scores, scores, rtol=1e-3, atol=1e-3)
+
+    def test_sq_save_and_load(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "index.npz")
+            finder = EuclideanFinder(None, self.database)
+            finder.build_index("sq", shortlist=0).save(path)
+            scores, found = search(finder, self.queries, 10)
+
+            finder.change_index(SQIndex.load(path, finder.database["features"]))
+            loaded_scores, loaded_found = search(finder, self.queries, 10)
+            np.testing.assert_array_equal(found, loaded_found)
+            np.testing.assert_allclose(scores, loaded_scores)
+
+    def test_sq_resident_memory(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG16_db.parquet")
+            styles = np.array(["dress", "shirt"] * 1000)
+            save_database(data_path, self.features, self.database["colors"], styles)
+            finder = CosinusFinder(None)
+            finder.change_database(data_path)
+            self.assertIsNotNone(finder.normalized)
+            index = finder.build_index("sq", shortlist=50)
+
+            # ##: Only the int8 codes and per-row or per-dimension vectors stay in memory.
+            features = finder.database["features"]
+            self.assertIsInstance(finder.source, np.memmap)
+            self.assertTrue(np.shares_memory(features, finder.source))
+            self.assertIsNone(finder.normalized)
+            resident = sum(array.nbytes for array in (index.codes, index.norms, index.scale, index.offset))
+            self.assertLess(resident, features.nbytes / 3)
+
+            # ##: Filtered searches still compare the matching rows exactly.
+            rows = np.flatnonzero(styles == "shirt")
+            expected = search(
+                CosinusFinder(None, {key: value[rows] for key, value in self.database.items()}), self.queries, 5
+            )
+            scores, found = search(finder, self.queries, 5, styles="shirt")
+            np.testing.assert_array_equal(expected[1], found)
+            np.testing.assert_allclose(expected[0], scores, rtol=1e-5)
+
+    def test_hnsw_recall(self):
+        for finder_class in (CosinusFinder, EuclideanFinder, ManhattanFinder):
+            _, expected = self.exact(finder_class)
+            finder = finder_class(None, self.database)
+            finder.build_index("hnsw", M=8, ef_construction=40, ef_search=40)
+            _, found = search(finder, self.queries, 10)
+            self.assertGreaterEqual(recall(found, expected), 0.9)
+
+    def test_hnsw_incremental_save_and_load(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, "index.npz")
+            index = HNSWIndex(M=8, ef_construction=40, ef_search=40)
+            index.build(self.features[:1500])
+            np.testing.assert_array_equal(np.arange(1500, 2000), index.add(self.features[1500:]))
+            index.save(path)
+
+            loaded = HNSWIndex.load(path)
+            self.assertEqual(2000, loaded.size)
+            scores, found = index.search(self.queries, 10)
+            loaded_scores, loaded_found = loaded.search(self.queries, 10)
+            np.testing.assert_array_equal(found, loaded_found)
+            np.testing.assert_allclose(scores, loaded_scores)
+
+    def test_inverted_matches_tfidf_cosine(self):
+        generator = np.random.default_rng(1331)
+        counts = generator.poisson(0.05, size=(500, 256)).astype(np.float32)
+        vocabulary = VisualVocabulary(size=256)
+        vocabulary.fit_idf(counts)
+        features = vocabulary.weight(counts)
+        labels = {"colors": np.array(["black", "white"] * 250), "styles": np.array(["dress"] * 500)}
+        exact = CosinusFinder(None, {"features": features, **labels})
+        finder = CosinusFinder(None, {"features": features, **labels})
+        finder.build_index("inverted")
+
+        weights = counts * vocabulary.idf
+        weights /= np.maximum(np.linalg.norm(weights, axis=1, keepdims=True), 1e-12)
+        expected = weights[:20] @ weights.T
+        results = finder.search_batch(features[:20], depth=5)
+        for row, (result, reference) in enumerate(zip(results, exact.search_batch(features[:20], depth=5))):
+            np.testing.assert_allclose(np.sort(expected[row])[::-1][:5], result["distance"], rtol=1e-5, atol=1e-6)
+            np.testing.assert_allclose(reference["distance"], result["distance"], rtol=1e-5, atol=1e-6)
+
+        # ##: Filtered searches are exhaustive, on the same scale as the index.
+        for result, reference in zip(
+            finder.search_batch(features[:20], depth=5, colors="white"),
+            exact.search_batch(features[:20], depth=5, colors="white"),
+        ):
+            np.testing.assert_allclose(reference["distance"], result["distance"], rtol=1e-5, atol=1e-6)
+
+    def test_visual_vocabulary(self):
+        generator = np.random.default_rng(1331)
+        centers = generator.integers(0, 256, size=(4, 32), dtype=np.uint8)
+        descriptors = [np.repeat(centers, 50, axis=0) for _ in range(3)]
+        vocabulary = VisualVocabulary(size=4, batch_size=100)
+        vocabulary.fit(descriptors)
+
+        words = vocabulary.quantize(centers)
+        self.assertEqual(4, len(set(words.tolist())))
+        np.testing.assert_array_equal(np.full(4, 50), vocabulary.histogram(descriptors[0])[words])
+
+        vocabulary.fit_idf(np.stack([vocabulary.histogram(descriptors[0]), np.zeros(4, dtype=np.float32)]))
+        with TemporaryDirectory() as directory:
+            path = join(directory, "vocabulary.npz")
+            vocabulary.save(path)
+            loaded = VisualVocabulary.load(path)
+        np.testing.assert_allclose(vocabulary.weight(np.eye(4)), loaded.weight(np.eye(4)))
+        self.assertAlmostEqual(1.0, float(np.linalg.norm(loaded.weight(np.ones(4))[0])), places=5)
+
+    def test_index_metric_mismatch(self):
+        finder = EuclideanFinder(None, self.database)
+        index = CosinusFinder(None, self.database).build_index("ivf", nlist=8)
+        with self.assertRaises(ValueError):
+            finder.change_index(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,21 @@ Tests unitaires sur les fonctions d'évaluation.
 from statistics import mean
 from unittest import TestCase, main
 
+import numpy as np
+
 from src.addons.metrics import (
     average_precision,
+    average_precision_at_k,
     first_rank_accuracy,
+    first_rank_accuracy_at_k,
     mean_average_precision,
+    mean_average_precision_at_k,
     mean_reciprocal_rank,
+    mean_reciprocal_rank_at_k,
+    precision_at_k,
+    recall_at_k,
     reciprocal_rank,
+    relevance_matrix,
 )
 
 
@@ -50,5 +59,48 @@ class TestMetric(TestCase):
         self.assertEqual(0.5, first_ranks)
 
 
+class TestVectorizedMetric(TestCase):
+    """
+    Tests unitaires des métriques calculées sur une matrice de pertinence.
+    """
+
+    def setUp(self):
+        self.retrievals = [["one", "two", "one", "one", "two"], ["one", "two", "one"], []]
+        self.labels = ["one", "two", "two"]
+        self.relevance = relevance_matrix(self.retrievals, self.labels)
+
+    def test_relevance_matrix(self):
+        expected = [[1, 0, 1, 1, 0], [0, 1, 0, 0, 0], [0, 0, 0, 0, 0]]
+        np.testing.assert_array_equal(np.array(expected, dtype=bool), self.relevance)
+        encoded = relevance_matrix(np.array([[3, 1, 3], [2, 2, 1]]), np.array([3, 1]), depth=2)
+        np.testing.assert_array_equal([[True, False], [False, False]], encoded)
+
+    def test_average_precision_at_k(self):
+        np.testing.assert_allclose([mean([1, 2 / 3, 3 / 4]), 1 / 2, 0], average_precision_at_k(self.relevance))
+        np.testing.assert_allclose([1, 1 / 2, 0], average_precision_at_k(self.relevance, k=2))
+
+    def test_same_values(self):
+        self.assertEqual(
+            mean_average_precision(self.retrievals, self.labels), mean_average_precision_at_k(self.relevance)
+        )
+        self.assertEqual(mean_reciprocal_rank(self.retrievals, self.labels), mean_reciprocal_rank_at_k(self.relevance))
+        self.assertEqual(first_rank_accuracy(self.retrievals, self.labels), first_rank_accuracy_at_k(self.relevance))
+        self.assertEqual(mean([1, 1 / 2, 0]), mean_reciprocal_rank_at_k(self.relevance))
+
+    def test_reference_values(self):
+        # ##: Values of the list-based implementation, which must be reproduced bit for bit.
+        retrievals = [list("baadddbaa"), list("cabbacb"), list("ddadaad"), list("abc")]
+        labels = ["a", "b", "a", "d"]
+        expected = [0.4965277777777778, 0.42063492063492064, 0.41111111111111115, 0.0]
+        self.assertListEqual(expected, [average_precision(found, truth) for found, truth in zip(retrievals, labels)])
+        self.assertEqual(0.3320684523809524, mean_average_precision(retrievals, labels))
+        self.assertEqual(0.29166666666666663, mean_reciprocal_rank(retrievals, labels))
+
+    def test_precision_recall_at_k(self):
+        self.assertAlmostEqual(mean([3 / 5, 1 / 5, 0]), precision_at_k(self.relevance))
+        self.assertAlmostEqual(mean([1 / 2, 1 / 2, 0]), precision_at_k(self.relevance, k=2))
+        self.assertAlmostEqual(mean([1 / 4, 1 / 2, 0]), recall_at_k(self.relevance, [4, 2, 0], k=2))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la mesure de la durée des étapes.
+"""
+from unittest import TestCase, main
+
+import numpy as np
+
+from src.addons.finder import EuclideanFinder
+from src.addons.profiling import BUCKETS_MS, Profiler, profiler
+
+
+class TestProfiling(TestCase):
+    """
+    Tests unitaires des chronomètres et des compteurs.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        self.database = {
+            "features": generator.random((20, 4), dtype=np.float32),
+            "colors": np.array(["red"] * 20),
+            "styles": np.array(["dress"] * 20),
+        }
+        profiler.reset()
+
+    def tearDown(self):
+        profiler.disable()
+        profiler.reset()
+
+    def test_disabled(self):
+        EuclideanFinder(None, self.database).search_batch(self.database["features"][:3], depth=2)
+        self.assertEqual({"timers": {}, "counters": {}}, profiler.summary())
+
+    def test_finder_stages(self):
+        profiler.enable()
+        finder = EuclideanFinder(None, self.database)
+        for _ in range(3):
+            finder.search_batch(self.database["features"][:4], depth=2)
+
+        summary = profiler.summary()
+        for stage in ("distance", "top_k", "labels", "search"):
+            timer = summary["timers"][f"EuclideanFinder.{stage}"]
+            self.assertEqual(3, timer["calls"])
+            self.assertLessEqual(timer["p50_ms"], timer["max_ms"])
+            self.assertEqual(3, sum(timer["histogram"]["counts"]))
+        self.assertEqual({"EuclideanFinder.queries": 12}, summary["counters"])
+
+    def test_aggregated_timings(self):
+        local = Profiler(enabled=True)
+        durations = np.random.default_rng(1331).lognormal(0, 1, size=10_000)
+        for duration in durations:
+            local.timings["search"].add(duration)
+
+        # ##: Only the histogram is kept, whatever the number of durations.
+        timer = local.summary()["timers"]["search"]
+        self.assertEqual(BUCKETS_MS.size - 1, len(timer["histogram"]["counts"]))
+        self.assertEqual(10_000, timer["calls"])
+        self.assertAlmostEqual(durations.mean(), timer["mean_ms"])
+        self.assertEqual(durations.max(), timer["max_ms"])
+        # ##: Percentiles are estimated within one bucket.
+        for rank in (50, 95, 99):
+            ratio = timer[f"p{rank}_ms"] / np.percentile(durations, rank)
+            self.assertLess(abs(np.log(ratio)), np.log(BUCKETS_MS[1] / BUCKETS_MS[0]))
+
+    def test_table(self):
+        local = Profiler(enabled=True)
+        with local.timer("decode"):
+            pass
+        local.count("images", value=2)
+        self.assertEqual(2, local.table().row_count)
+
+
+if __name__ == "__main__":
+    main()
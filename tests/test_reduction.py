@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la réduction de dimension.
+"""
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from src.addons.data import save_database
+from src.addons.finder import EuclideanFinder
+from src.addons.indexing.index import index_path
+from src.addons.reduction import PCAReducer, reducer_path, saved_reducer
+from src.features.build_index import build_indexes
+from src.features.build_reduction import build_reducers
+
+
+class TestReduction(TestCase):
+    """
+    Tests unitaires de la projection sur les composantes principales.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        basis = generator.normal(size=(6, 32))
+        self.features = (generator.normal(size=(300, 6)) @ basis + 0.01 * generator.normal(size=(300, 32))).astype(
+            np.float32
+        )
+        self.database = {
+            "features": self.features,
+            "colors": np.array([f"color{index % 3}" for index in range(300)]),
+            "styles": np.array([f"style{index % 4}" for index in range(300)]),
+        }
+
+    def test_same_as_sklearn(self):
+        for whiten in (False, True):
+            reducer = PCAReducer.fit(self.features, 6, whiten=whiten, chunk_size=64)
+            expected = PCA(n_components=6, whiten=whiten).fit(self.features.astype(np.float64))
+            reduced, projected = reducer.transform(self.features), expected.transform(self.features)
+
+            # ##: Components are defined up to their sign.
+            signs = np.sign(np.sum(reduced * projected, axis=0))
+            np.testing.assert_allclose(projected, reduced * signs, rtol=1e-3, atol=1e-3)
+            self.assertAlmostEqual(expected.explained_variance_ratio_.sum(), reducer.explained, places=4)
+
+    def test_finder(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            save_database(data_path, **self.database)
+            finder = EuclideanFinder(None)
+            finder.change_database(data_path)
+            finder.build_reducer(6).save(reducer_path(data_path))
+
+            # ##: Queries are projected like the database, with almost no change to the results.
+            exact = EuclideanFinder(None, self.database).search_batch(self.features[:10], depth=5)
+            results = finder.search_batch(self.features[:10], depth=5)
+            self.assertEqual(6, finder.database["features"].shape[1])
+            self.assertListEqual(
+                [result["returns"][0] for result in exact], [result["returns"][0] for result in results]
+            )
+
+            # ##: Original vectors are stored on compaction, then projected again.
+            reloaded = EuclideanFinder(None)
+            reloaded.change_database(data_path)
+            reloaded.add(self.features[:2] + 0.001, ["new", "new"], ["item", "item"])
+            reloaded.remove([0, 1])
+            reloaded.compact()
+            self.assertTupleEqual((300, 6), reloaded.database["features"].shape)
+            self.assertEqual(32, reloaded.source.shape[1])
+            self.assertListEqual(["new_item"], reloaded.search_batch(self.features[:1] + 0.001, depth=1)[0]["returns"])
+
+    def test_build_reducers(self):
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG_db.parquet")
+            save_database(data_path, **self.database)
+            build_indexes(directory, "ivf", nlist=4)
+            path = index_path(data_path, name="ivf", metric="euclidean")
+            build_reducers(directory, dimension=6)
+            # ##: Indexes built in the original space are dropped with the new projection.
+            self.assertFalse(exists(path))
+
+            # ##: The saved projection is picked up with the database, and applied to the queries.
+            finder = EuclideanFinder(None)
+            finder.change_database(data_path)
+            self.assertEqual(6, finder.reducer.dimension)
+            self.assertEqual(6, finder.database["features"].shape[1])
+            expected = EuclideanFinder(None, self.database, reducer=saved_reducer(data_path))
+            self.assertListEqual(
+                [result["returns"] for result in expected.search_batch(self.features[:5], depth=3)],
+                [result["returns"] for result in finder.search_batch(self.features[:5], depth=3)],
+            )
+            self.assertIsNone(saved_reducer(join(directory, "NasNet_db.parquet")))
+
+            # ##: Indexes are built in the projected space, and indexes of another dimension are rejected.
+            EuclideanFinder(None, self.database).build_index("ivf", nlist=4).save(path)
+            with self.assertRaises(ValueError):
+                finder.load_index(data_path, "ivf")
+            build_indexes(directory, "ivf", nlist=4, nprobe=4)
+            finder.load_index(data_path, "ivf")
+            self.assertListEqual(
+                [result["returns"] for result in expected.search_batch(self.features[:5], depth=3)],
+                [result["returns"] for result in finder.search_batch(self.features[:5], depth=3)],
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur les registres résolus à la demande.
+"""
+import subprocess
+import sys
+from operator import getitem
+from unittest import TestCase, main
+
+from src.addons.registry import LazyRegistry
+
+
+class TestRegistry(TestCase):
+    """
+    Tests unitaires du registre paresseux.
+    """
+
+    def test_resolution(self):
+        registry = LazyRegistry({"ordered": "collections:OrderedDict", "counter": "collections:Counter"})
+        self.assertEqual(["ordered", "counter"], list(registry))
+        self.assertEqual(2, len(registry))
+        self.assertIs(registry["ordered"], registry["ordered"])
+        self.assertRaises(KeyError, getitem, registry, "missing")
+
+    def test_defaults(self):
+        registry = LazyRegistry({"integer": "builtins:int"}, base=2)
+        self.assertEqual(5, registry["integer"]("101"))
+
+    def test_search_without_heavy_imports(self):
+        code = (
+            "import sys; import src.addons.finder, src.addons.extraction.extractor; "
+            "print(any(name in sys.modules for name in ('tensorflow', 'cv2', 'sklearn')))"
+        )
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual("False", output.strip())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur le service HTTP de recherche.
+"""
+import asyncio
+import json
+import time
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from src.addons.finder import EuclideanFinder
+from src.service.batching import MicroBatcher
+from src.service.run_service import SearchService
+
+
+class ContentExtractor:
+    """
+    Extracteur renvoyant le vecteur associé au contenu du fichier image.
+    """
+
+    extractor = None
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def preprocess(self, image_path: str):
+        return image_path
+
+    def extract(self, image_path: str):
+        with open(image_path, "rb") as file:
+            return self.vectors.get(file.read())
+
+
+class TestMicroBatcher(TestCase):
+    """
+    Tests unitaires du regroupement des requêtes en lots.
+    """
+
+    def test_coalesce(self):
+        sizes = []
+
+        def handler(items):
+            sizes.append(len(items))
+            time.sleep(0.01)
+            return [item * 2 for item in items]
+
+        async def scenario():
+            batcher = MicroBatcher(handler, max_batch_size=4, max_wait=0.05)
+            results = await asyncio.gather(*[batcher.submit(item) for item in range(10)])
+            await batcher.close()
+            return results
+
+        self.assertListEqual([item * 2 for item in range(10)], asyncio.run(scenario()))
+        self.assertListEqual([4, 4, 2], sizes)
+
+    def test_errors(self):
+        def handler(items):
+            return [ValueError(item) if item % 2 else item for item in items]
+
+        async def scenario():
+            batcher = MicroBatcher(handler, max_batch_size=8)
+            results = await asyncio.gather(*[batcher.submit(item) for item in range(4)], return_exceptions=True)
+            await batcher.close()
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertListEqual([0, 2], [results[0], results[2]])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsInstance(results[3], ValueError)
+
+
+class TestSearchService(TestCase):
+    """
+    Tests unitaires du service HTTP de recherche.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        self.features = generator.normal(size=(40, 8))
+        self.database = {
+            "features": self.features,
+            "colors": np.array([f"color{index % 3}" for index in range(40)]),
+            "styles": np.array([f"style{index % 4}" for index in range(40)]),
+        }
+        self.contents = [f"image{index}".encode() for index in range(8)]
+        self.extractor = ContentExtractor(
+            {content: self.features[index] for index, content in enumerate(self.contents)}
+        )
+        self.finder = EuclideanFinder(None, self.database)
+
+    @staticmethod
+    def _request(url: str, body: bytes = None, content_type: str = "image/jpeg"):
+        request = Request(url, data=body, headers={"Content-Type": content_type})
+        try:
+            with urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    def test_concurrent_requests(self):
+        with TemporaryDirectory() as directory:
+            paths = []
+            for index, content in enumerate(self.contents):
+                paths.append(join(directory, f"image{index}.jpg"))
+                with open(paths[-1], "wb") as file:
+                    file.write(content)
+
+            async def scenario():
+                service = SearchService(self.extractor, self.finder, max_batch_size=8, max_wait=0.05)
+                server = await service.start("127.0.0.1", 0)
+                url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+                loop = asyncio.get_running_loop()
+                calls = [
+                    (f"{url}/search", json.dumps({"path": path, "depth": 3}).encode(), "application/json")
+                    for path in paths
+                ]
+                calls += [(f"{url}/search?depth=2", content, "image/jpeg") for content in self.contents]
+                calls += [
+                    (
+                        f"{url}/search",
+                        json.dumps({"path": join(directory, "missing.jpg")}).encode(),
+                        "application/json",
+                    ),
+                    (f"{url}/search?depth=0", self.contents[0], "image/jpeg"),
+                    (f"{url}/search?depth=4&colors=color1,color2&styles=style3", self.contents[1], "image/jpeg"),
+                    (
+                        f"{url}/search",
+                        json.dumps({"path": paths[2], "depth": 2, "colors": "color0"}).encode(),
+                        "application/json",
+                    ),
+                    (f"{url}/health", None, "application/json"),
+                    (f"{url}/profile", None, "application/json"),
+                ]
+                responses = await asyncio.gather(*[loop.run_in_executor(None, self._request, *call) for call in calls])
+                server.close()
+                await server.wait_closed()
+                await service.close()
+                return responses
+
+            responses = asyncio.run(scenario())
+
+        for index, (status, result) in enumerate(responses[:16]):
+            depth = 3 if index < 8 else 2
+            expected = self.finder.search_batch(self.features[index % 8], depth=depth)[0]
+            self.assertEqual(200, status)
+            self.assertListEqual(expected["returns"], result["returns"])
+            np.testing.assert_allclose(expected["distance"], result["distance"], atol=5e-3)
+        self.assertEqual(paths[0], responses[0][1]["input"])
+        self.assertEqual("upload", responses[8][1]["input"])
+        self.assertListEqual([404, 400, 200, 200, 200, 200], [status for status, _ in responses[16:]])
+        filtered = self.finder.search_batch(self.features[1], depth=4, colors=["color1", "color2"], styles="style3")
+        self.assertListEqual(filtered[0]["returns"], responses[18][1]["returns"])
+        self.assertListEqual(["color0", "color0"], responses[19][1]["colors"])
+        self.assertLess(responses[20][1]["batches"]["search"]["count"], 16)
+        self.assertEqual({"enabled": False, "timers": {}, "counters": {}}, responses[21][1])
+
+
+if __name__ == "__main__":
+    main()
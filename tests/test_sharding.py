@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires sur la recherche répartie.
+"""
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+import numpy as np
+
+from src.addons.data import save_database
+from src.addons.distance import merge
+from src.addons.finder import EuclideanFinder, HammingFinder
+from src.addons.indexing.index import index_path
+from src.addons.sharding import ShardedFinder, shard_path
+
+
+class TestSharding(TestCase):
+    """
+    Tests unitaires de la recherche répartie entre plusieurs processus.
+    """
+
+    def setUp(self):
+        generator = np.random.default_rng(1331)
+        self.labels = {"colors": np.array([f"color{i}" for i in range(101)]), "styles": np.array(["dress"] * 101)}
+        self.features = generator.random((101, 8), dtype=np.float32)
+        self.binary = generator.integers(0, 256, size=(101, 16), dtype=np.uint8)
+
+    def test_merge(self):
+        scores, ids = merge(
+            [np.array([[0.1, 0.5]]), np.array([[0.3, np.inf]])], [np.array([[4, 2]]), np.array([[7, -1]])], depth=4
+        )
+        np.testing.assert_array_equal([[4, 7, 2, -1]], ids)
+        np.testing.assert_allclose([[0.1, 0.3, 0.5, np.inf]], scores)
+
+    def test_same_results(self):
+        for finder_class, features, transport in [
+            (EuclideanFinder, self.features, "process"),
+            (HammingFinder, self.binary, "socket"),
+        ]:
+            database = {"features": features, **self.labels}
+            exact = finder_class(None, database).search_batch(features[:5], depth=7)
+            with ShardedFinder(finder_class, None, database, shards=3, transport=transport) as sharded:
+                results = sharded.search_batch(features[:5], depth=7)
+            # ##: Integer Hamming distances have ties, ordered differently.
+            for result, expected in zip(results, exact):
+                if finder_class is EuclideanFinder:
+                    self.assertEqual(expected["colors"], result["colors"])
+                np.testing.assert_allclose(expected["distance"], result["distance"], rtol=1e-5, atol=1e-5)
+
+    def test_filtered_search(self):
+        database = {"features": self.features, **self.labels}
+        colors = [f"color{index}" for index in range(0, 101, 7)]
+        exact = EuclideanFinder(None, database).search_batch(self.features[:5], depth=4, colors=colors)
+        with ShardedFinder(EuclideanFinder, None, database, shards=3) as sharded:
+            results = sharded.search_batch(self.features[:5], depth=4, colors=colors)
+        for result, expected in zip(results, exact):
+            self.assertEqual(expected["colors"], result["colors"])
+            self.assertTrue(set(result["colors"]) <= set(colors))
+
+    def test_change_database(self):
+        database = {"features": self.features, **self.labels}
+        exact = EuclideanFinder(None, database).search_batch(self.features[:5], depth=4)
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG16_db.parquet")
+            save_database(data_path, self.features, self.labels["colors"], self.labels["styles"])
+            with ShardedFinder(EuclideanFinder, None, shards=3) as sharded:
+                sharded.change_database(data_path)
+                results = sharded.search_batch(self.features[:5], depth=4)
+            for result, expected in zip(results, exact):
+                self.assertEqual(expected["colors"], result["colors"])
+
+            finder = EuclideanFinder(None)
+            finder.change_database(data_path)
+            finder.remove([0])
+            with ShardedFinder(EuclideanFinder, None, shards=3) as sharded, self.assertRaises(ValueError):
+                sharded.change_database(data_path)
+
+    def test_distances(self):
+        database = {"features": self.features, **self.labels}
+        finder = EuclideanFinder(None, database)
+        rows = np.arange(3, 101, 4)
+        with ShardedFinder(EuclideanFinder, None, database, shards=3) as sharded:
+            for subset in (None, rows):
+                np.testing.assert_allclose(
+                    finder._compute_distance(self.features[:5], subset),  # pylint: disable=protected-access
+                    sharded._compute_distance(self.features[:5], subset),  # pylint: disable=protected-access
+                    rtol=1e-5,
+                    atol=1e-5,
+                )
+            with self.assertRaises(TypeError):
+                sharded.change_index(finder.build_index("ivf", nlist=4))
+            with self.assertRaises(TypeError):
+                sharded.remove([0])
+
+    def test_saved_indexes(self):
+        database = {"features": self.features, **self.labels}
+        with TemporaryDirectory() as directory:
+            data_path = join(directory, "VGG16_db.parquet")
+            with ShardedFinder(EuclideanFinder, None, database, shards=3) as sharded:
+                sharded.build_index("ivf", nlist=4, nprobe=4)
+                expected = sharded.search_batch(self.features[:5], depth=4)
+                sharded.save_index(data_path, "ivf")
+            for shard in range(3):
+                self.assertTrue(exists(index_path(shard_path(data_path, shard, 3), name="ivf", metric="euclidean")))
+
+            with ShardedFinder(EuclideanFinder, None, database, shards=3) as sharded:
+                sharded.load_index(data_path, "ivf")
+                for result, reference in zip(sharded.search_batch(self.features[:5], depth=4), expected):
+                    self.assertEqual(reference["colors"], result["colors"])
+            with ShardedFinder(EuclideanFinder, None, database, shards=2) as sharded, self.assertRaises(RuntimeError):
+                sharded.load_index(data_path, "ivf")
+
+
+if __name__ == "__main__":
+    main()